@@ -0,0 +1,225 @@
+"""Offline benchmarks of the downloader against a local stand-in of the digipathos website.
+
+The stand-in (tests/stub_server.py) serves synthetic ZIP-files with a configurable latency, bandwidth and
+failure rate, so the numbers are reproducible and need no network access. Run it from the repository root:
+
+    python benchmarks/run_benchmarks.py --count 32 --size 1048576 --workers 1 2 4 8 --output results.json
+
+and later compare a new run against a saved one, which exits with status 1 on regressions:
+
+    python benchmarks/run_benchmarks.py --baseline results.json --tolerance 0.2
+"""
+import argparse
+import json
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import time
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+sys.path.insert(0, os.path.join(ROOT_DIR, 'tests'))
+
+from digipathos_downloader.download import download_zips, fetch_zips_table, get_dataset, unpack_zips  # noqa: E402
+from digipathos_downloader.session import RetryPolicy  # noqa: E402
+from stub_server import StubServer, make_zip  # noqa: E402
+
+
+def make_archives(count: int, size: int, n_members: int = 8) -> dict:
+    """Build count synthetic samples of about size bytes each.
+
+    Args:
+        count (int): how many ZIP-files.
+        size (int): the size of each one, in bytes (members are random, so barely compressible).
+        n_members (int, optional): how many "images" per ZIP-file. Defaults to 8.
+
+    Returns:
+        archives (dict): maps each ZIP-file name to its contents.
+    """
+    return {f"Bench {index:03d} (Bench) - Disease (Bench) - 1.zip":
+            make_zip(n_members=n_members, member_size=max(1, size // n_members), seed=index)
+            for index in range(count)}
+
+
+def bench_table_fetch(server: StubServer, repeats: int = 3, page_size: int = 1000) -> dict:
+    """Time fetch_zips_table, best of repeats.
+
+    Returns:
+        (dict): the best time in seconds ('table_fetch').
+    """
+    best = None
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fetch_zips_table('all', verbose=False, base_url=server.base_url, list_url=server.list_url,
+                         page_size=page_size)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return {'table_fetch': best}
+
+
+def bench_download(server: StubServer, workers: list, work_dir: str, retry_policy: RetryPolicy) -> dict:
+    """Time download_zips for every concurrency level.
+
+    Returns:
+        (dict): the time in seconds per level ('download/workers=<n>').
+    """
+    timings = {}
+    for max_workers in workers:
+        tmp_dir = tempfile.mkdtemp(dir=work_dir)
+        start = time.perf_counter()
+        download_zips(server.zips_table, tmp_dir, verbose=False, base_url=server.base_url,
+                      max_workers=max_workers, retry_policy=retry_policy)
+        timings[f'download/workers={max_workers}'] = time.perf_counter() - start
+        shutil.rmtree(tmp_dir)
+    return timings
+
+
+def bench_extraction(archives: dict, workers: list, work_dir: str) -> dict:
+    """Time unpack_zips for every number of worker processes.
+
+    Returns:
+        (dict): the time in seconds per level ('extract/workers=<n>').
+    """
+    zip_dir = tempfile.mkdtemp(dir=work_dir)
+    for name, contents in archives.items():
+        with open(os.path.join(zip_dir, name), "wb") as zip_file:
+            zip_file.write(contents)
+    timings = {}
+    for max_workers in workers:
+        data_dir = tempfile.mkdtemp(dir=work_dir)
+        start = time.perf_counter()
+        unpack_zips(zip_dir, data_dir, verbose=False, max_workers=max_workers)
+        timings[f'extract/workers={max_workers}'] = time.perf_counter() - start
+        shutil.rmtree(data_dir)
+    shutil.rmtree(zip_dir)
+    return timings
+
+
+def bench_end_to_end(server: StubServer, max_workers: int, work_dir: str, retry_policy: RetryPolicy) -> dict:
+    """Time get_dataset in the phased, pipelined and direct modes.
+
+    Returns:
+        (dict): the time in seconds per mode ('get_dataset/<mode>').
+    """
+    timings = {}
+    for mode in ('phased', 'pipelined', 'direct'):
+        run_dir = tempfile.mkdtemp(dir=work_dir)
+        start = time.perf_counter()
+        get_dataset(os.path.join(run_dir, 'dataset'), os.path.join(run_dir, 'tmp'), name_filter='all',
+                    verbose=False, base_url=server.base_url, list_url=server.list_url, max_workers=max_workers,
+                    retry_policy=retry_policy, pipelined=mode == 'pipelined', direct=mode == 'direct',
+                    extract_workers=max_workers if mode == 'pipelined' else 1)
+        timings[f'get_dataset/{mode}'] = time.perf_counter() - start
+        shutil.rmtree(run_dir)
+    return timings
+
+
+def run_benchmarks(count: int = 16,
+                   size: int = 256 * 1024,
+                   latency: float = 0.0,
+                   bandwidth: float = None,
+                   failure_rate: float = 0.0,
+                   workers: list = (1, 2, 4),
+                   repeats: int = 3) -> dict:
+    """Run the whole suite against a fresh stand-in server.
+
+    Args:
+        count (int, optional): how many synthetic ZIP-files. Defaults to 16.
+        size (int, optional): the size of each one, in bytes. Defaults to 256 kiB.
+        latency (float, optional): seconds the server waits before each answer. Defaults to 0.
+        bandwidth (float, optional): bytes per second of each response. Defaults to None (unlimited).
+        failure_rate (float, optional): probability of a bitstream request failing with a 503. Defaults to 0.
+        workers (list, optional): the concurrency levels measured. Defaults to (1, 2, 4).
+        repeats (int, optional): how many times the table fetch is timed. Defaults to 3.
+
+    Returns:
+        results (dict): the configuration, the environment, the timings in seconds ('timings') and the
+            throughputs in bytes per second derived from them ('throughputs').
+    """
+    archives = make_archives(count, size)
+    total_bytes = sum(len(contents) for contents in archives.values())
+    # retried failures are part of what is measured, so do not back off
+    retry_policy = RetryPolicy(max_attempts=10, backoff_factor=0, jitter=0)
+    timings = {}
+    work_dir = tempfile.mkdtemp(prefix='digipathos-bench-')
+    try:
+        with StubServer(archives, latency=latency, bandwidth=bandwidth, failure_rate=failure_rate) as server:
+            timings.update(bench_table_fetch(server, repeats))
+            timings.update(bench_download(server, workers, work_dir, retry_policy))
+            timings.update(bench_extraction(archives, workers, work_dir))
+            timings.update(bench_end_to_end(server, max(workers), work_dir, retry_policy))
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+    return {
+        'config': {'count': count, 'size': size, 'latency': latency, 'bandwidth': bandwidth,
+                   'failure_rate': failure_rate, 'workers': list(workers), 'repeats': repeats},
+        'environment': {'python': platform.python_version(), 'platform': platform.platform(),
+                        'cpu_count': os.cpu_count(), 'time': time.time()},
+        'total_bytes': total_bytes,
+        'timings': timings,
+        'throughputs': {name: total_bytes / seconds for name, seconds in timings.items()
+                        if name != 'table_fetch' and seconds > 0}
+    }
+
+
+def compare_results(results: dict, baseline: dict, tolerance: float = 0.2) -> list:
+    """Find the benchmarks that got slower than a previous run.
+
+    Args:
+        results (dict): the new run (see run_benchmarks).
+        baseline (dict): a previous run, with the same configuration.
+        tolerance (float, optional): the accepted slowdown, as a fraction of the baseline time. Defaults to 0.2.
+
+    Returns:
+        regressions (list): one message per benchmark slower than baseline * (1 + tolerance).
+    """
+    regressions = []
+    for name, seconds in results['timings'].items():
+        reference = baseline['timings'].get(name)
+        if reference is not None and seconds > reference * (1 + tolerance):
+            regressions.append(f"{name}: {seconds:.3f}s vs {reference:.3f}s (+{seconds / reference - 1:.0%})")
+    return regressions
+
+
+def main(argv: list = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--count', type=int, default=16, help='number of synthetic ZIP-files')
+    parser.add_argument('--size', type=int, default=256 * 1024, help='size of each ZIP-file, in bytes')
+    parser.add_argument('--latency', type=float, default=0.0, help='server latency, in seconds')
+    parser.add_argument('--bandwidth', type=float, default=None, help='bandwidth per response, in bytes per second')
+    parser.add_argument('--failure-rate', type=float, default=0.0, help='probability of a bitstream request failing')
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4], help='concurrency levels')
+    parser.add_argument('--repeats', type=int, default=3, help='repetitions of the table fetch')
+    parser.add_argument('--output', help='where to write the results (JSON)')
+    parser.add_argument('--baseline', help='previous results to compare against (JSON)')
+    parser.add_argument('--tolerance', type=float, default=0.2, help='accepted slowdown against the baseline')
+    args = parser.parse_args(argv)
+
+    baseline = None
+    if args.baseline is not None:
+        with open(args.baseline, "r") as baseline_file:
+            baseline = json.load(baseline_file)
+    results = run_benchmarks(args.count, args.size, args.latency, args.bandwidth, args.failure_rate,
+                             args.workers, args.repeats)
+    for name, seconds in results['timings'].items():
+        throughput = results['throughputs'].get(name)
+        rate = f"{throughput / 1024 ** 2:8.2f} MiB/s" if throughput is not None else ""
+        print(f"{name:<24} {seconds:8.3f} s {rate}")
+    if args.output is not None:
+        with open(args.output, "w") as output_file:
+            json.dump(results, output_file, indent=2)
+    if baseline is not None:
+        if baseline.get('config') != results['config']:
+            print("WARNING: the baseline was run with a different configuration.")
+        regressions = compare_results(results, baseline, args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        if regressions:
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,539 @@
+import asyncio
+import functools
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from digipathos_downloader import download
+from digipathos_downloader.integrity import expected_checksum, verify_zip
+from digipathos_downloader.manifest import DownloadManifest
+from digipathos_downloader.metrics import MetricsRecorder, emit, emit_download_end, emit_download_retry
+from digipathos_downloader.session import RetryPolicy
+from digipathos_downloader.sync import default_catalog_path, load_local_catalog, save_local_catalog
+from digipathos_downloader.table_cache import is_fresh, load_cached_table, save_cached_table
+
+try:
+    import aiohttp
+    from yarl import URL
+except ImportError:
+    # the async API is an optional extra: pip install 'digipathos-downloader[async]'
+    aiohttp = None
+
+
+def _require_aiohttp() -> None:
+    if aiohttp is None:
+        raise ImportError("The async API needs aiohttp. Install it with: pip install 'digipathos-downloader[async]'")
+
+
+def _client_timeout(retry_policy: RetryPolicy):
+    """Translate the (connect, read) timeouts of a RetryPolicy for aiohttp."""
+    connect, read = retry_policy.timeout
+    return aiohttp.ClientTimeout(total=None, sock_connect=connect, sock_read=read)
+
+
+def create_async_session(max_concurrency: int = 100):
+    """Create an aiohttp session whose connections are kept alive and reused across requests.
+
+    Args:
+        max_concurrency (int, optional): how many connections may be open at once. Defaults to 100.
+
+    Returns:
+        session (aiohttp.ClientSession): the session. It must be closed (e.g., used with 'async with').
+    """
+    _require_aiohttp()
+    return aiohttp.ClientSession(connector=aiohttp.TCPConnector(limit=max_concurrency))
+
+
+async def _get_json_with_retries(session, url: str, retry_policy: RetryPolicy, params: dict, headers: dict) -> tuple:
+    """Send a GET request for a JSON document, retrying like get_with_retries.
+
+    Returns:
+        (tuple): the status, the headers and the decoded body (None for a 304).
+
+    Raises:
+        ClientError: raised when the last attempt fails, or on a non retryable error status.
+    """
+    attempt = 1
+    while True:
+        try:
+            async with session.get(url, params=params, headers=headers,
+                                   timeout=_client_timeout(retry_policy)) as response:
+                body = await response.json(content_type=None) if response.status == 200 else None
+        except (aiohttp.ClientError, asyncio.TimeoutError):
+            if attempt >= retry_policy.max_attempts:
+                raise
+            await asyncio.sleep(retry_policy.delay(attempt))
+        else:
+            if response.status not in retry_policy.retry_statuses or attempt >= retry_policy.max_attempts:
+                if response.status != 304:
+                    response.raise_for_status()
+                return response.status, response.headers, body
+            await asyncio.sleep(retry_policy.delay(attempt, response))
+        attempt += 1
+
+
+async def afetch_zips_table(name_filter: str = "cropped",
+                            verbose: bool = False,
+                            base_url: str = "https://www.digipathos-rep.cnptia.embrapa.br",
+                            list_url: str = "/jspui/zipsincollection/123456789/3",
+                            session=None,
+                            retry_policy: RetryPolicy = None,
+                            page_size: int = 1000,
+                            page_workers: int = 1,
+                            cache_dir: str = None,
+                            cache_ttl: float = 3600) -> list:
+    """Async counterpart of fetch_zips_table: same paging, caching and filtering.
+
+    Unlike fetch_zips_table, a table that can be neither fetched nor read from the cache raises instead of
+    exiting the process, as the event loop may be running other jobs.
+
+    Args:
+        name_filter (str, optional): which images to download: cropped only, original only, or all. Defaults to 'cropped'.
+        verbose (bool, optional): notify about the process. Defaults to False.
+        base_url (str, optional): digipathos base url. Defaults to "https://www.digipathos-rep.cnptia.embrapa.br".
+        list_url (str, optional): digipathos list url. Defaults to "/jspui/zipsincollection/123456789/3".
+        session (aiohttp.ClientSession, optional): the session used for the requests. Defaults to None, in which
+            case a session is opened for this call.
+        retry_policy (RetryPolicy, optional): how the requests are retried. Defaults to RetryPolicy().
+        page_size (int, optional): how many entries are requested at a time. Defaults to 1000.
+        page_workers (int, optional): how many pages are requested at the same time. Defaults to 1.
+        cache_dir (str, optional): the directory where the table is cached. Defaults to None (no cache).
+        cache_ttl (float, optional): how long a cached table is used without revalidation, in seconds. Defaults to 3600.
+
+    Returns:
+        zips_table (list): a list containing the images' metadata.
+
+    Raises:
+        ClientError: raised when the table cannot be fetched (or the server ignores the offset) and there is no
+            cached one.
+    """
+    _require_aiohttp()
+    if session is None:
+        async with create_async_session() as session:
+            return await afetch_zips_table(name_filter, verbose, base_url, list_url, session, retry_policy,
+                                           page_size, page_workers, cache_dir, cache_ttl)
+    if retry_policy is None:
+        retry_policy = RetryPolicy()
+    url = base_url + list_url
+    cached = load_cached_table(cache_dir, url) if cache_dir is not None else None
+    if is_fresh(cached, cache_ttl):
+        if verbose:
+            print("Using cached table containing remote image DB information...")
+        return download.filter_zips_table(cached['bitstreams'], name_filter, verbose)
+    if verbose:
+        print("Downloading table containing remote image DB information...")
+
+    async def get_page(offset: int, headers: dict = None) -> tuple:
+        return await _get_json_with_retries(session, url, retry_policy, {"offset": offset, "limit": page_size}, headers)
+
+    headers = {}
+    if cached is not None and cached.get('etag'):
+        headers["If-None-Match"] = cached['etag']
+    if cached is not None and cached.get('last_modified'):
+        headers["If-Modified-Since"] = cached['last_modified']
+    try:
+        status, first_headers, body = await get_page(0, headers)
+        if status == 304:
+            bitstreams = cached['bitstreams']
+        else:
+            bitstreams = body["bitstreams"]
+            seen_links = {entry["bsLink"] for entry in bitstreams}
+            last_page = bitstreams
+            offset = page_size
+            while len(last_page) == page_size:
+                offsets = [offset + index * page_size for index in range(page_workers)]
+                pages = await asyncio.gather(*(get_page(page_offset) for page_offset in offsets))
+                for page_offset, (_, _, page_body) in zip(offsets, pages):
+                    if not download.page_adds_entries(page_body["bitstreams"], seen_links):
+                        raise aiohttp.ClientError(f"{url} sent the same entries again at offset {page_offset}; "
+                                                  "it seems to ignore the offset.")
+                    bitstreams.extend(page_body["bitstreams"])
+                    last_page = page_body["bitstreams"]
+                    if len(last_page) < page_size:
+                        break
+                offset = offsets[-1] + page_size
+    except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+        if cached is None:
+            raise
+        print(f"{e}\nUnable to fetch ZIP's table from {url}. Using the cached one instead.")
+        bitstreams = cached['bitstreams']
+    else:
+        if cache_dir is not None:
+            save_cached_table(cache_dir, url, bitstreams, first_headers.get("ETag"), first_headers.get("Last-Modified"))
+    return download.filter_zips_table(bitstreams, name_filter, verbose)
+
+
+async def _save_manifest(manifest: DownloadManifest, relative_url: str, **fields) -> None:
+    """Update a manifest entry and write the manifest to disk, in the default executor of the loop."""
+    await asyncio.get_running_loop().run_in_executor(None, functools.partial(manifest.update, relative_url,
+                                                                             save=True, **fields))
+
+
+async def adownload_zip(remote_zip_info: dict,
+                        tmp_dir: str = '.',
+                        base_url: str = "https://www.digipathos-rep.cnptia.embrapa.br",
+                        chunk_size: int = 1024 * 1024,
+                        manifest: DownloadManifest = None,
+                        session=None,
+                        retry_policy: RetryPolicy = None,
+                        on_event=None):
+    """Async counterpart of download_zip: a '.part' file resumed with Range requests, checked and renamed.
+
+    The disk work (writing the chunks, hashing them, saving the manifest) runs in the default executor of the
+    loop, so that the other downloads keep being served while it goes on.
+
+    If the task is cancelled (e.g., by a timeout), the '.part' file is kept and recorded as partial in the
+    manifest, so a later run resumes it.
+
+    Args:
+        remote_zip_info (dict): the sample metadata (an entry of the zips table).
+        tmp_dir (str, optional): where the zip file will be downloaded to. Defaults to '.'.
+        base_url (str, optional): digipathos base url. Defaults to "https://www.digipathos-rep.cnptia.embrapa.br".
+        chunk_size (int, optional): how many bytes are written to disk at a time. Defaults to 1 MiB.
+        manifest (DownloadManifest, optional): where the download progress is recorded. Defaults to None.
+        session (aiohttp.ClientSession): the session used for the requests.
+        retry_policy (RetryPolicy, optional): how many attempts are made and how long to wait between them.
+            Defaults to RetryPolicy().
+        on_event (callable, optional): receives the download events (see MetricsRecorder). Defaults to None.
+
+    Returns:
+        url_not_downloaded (str): the url of a failed download. If download is successful, returns None.
+    """
+    if retry_policy is None:
+        retry_policy = RetryPolicy()
+    loop = asyncio.get_running_loop()
+    relative_url, zip_name = remote_zip_info["bsLink"], remote_zip_info["name"]
+    checksum = expected_checksum(remote_zip_info)
+    filename = tmp_dir + '/' + zip_name
+    part_filename = filename + '.part'
+    url_not_downloaded = base_url + '/' + relative_url
+    if manifest is not None:
+        manifest.update(relative_url, name=zip_name)
+    emit(on_event, 'download_start', name=zip_name, url=relative_url)
+
+    def write_chunk(part_file, file_hash, chunk: bytes, bytes_received: int) -> None:
+        part_file.write(chunk)
+        if file_hash is not None:
+            file_hash.update(chunk)
+        if manifest is not None:
+            manifest.update(relative_url, bytes_received=bytes_received)
+
+    started = time.monotonic()
+    n_transferred = 0
+    bytes_received = 0
+    attempts = 0
+    failed_response = None
+    failure = None
+    try:
+        while attempts < retry_policy.max_attempts:
+            if attempts > 0:
+                emit_download_retry(on_event, zip_name, attempts, failure)
+                await asyncio.sleep(retry_policy.delay(attempts, failed_response))
+                failed_response = None
+            offset = os.path.getsize(part_filename) if os.path.exists(part_filename) else 0
+            headers = {"Range": f"bytes={offset}-"} if offset > 0 else {}
+            try:
+                # the links are already percent-encoded, and must be requested as they are
+                async with session.get(URL(base_url + relative_url, encoded=True), headers=headers,
+                                       timeout=_client_timeout(retry_policy)) as response:
+                    if response.status == 416:
+                        # the partial file does not match the remote one anymore
+                        await loop.run_in_executor(None, download.remove_part_file, part_filename)
+                        failure = ('http', 416)
+                        attempts += 1
+                        continue
+                    if response.status >= 400:
+                        failure = ('http', response.status)
+                        if response.status not in retry_policy.retry_statuses:
+                            break
+                        print(f"Error while downloading {zip_name}.\nRetrying...")
+                        failed_response = response
+                        attempts += 1
+                        continue
+                    if response.status != 206:
+                        offset = 0
+                    expected_size = download.content_size(response, offset)
+                    bytes_received = offset
+                    if manifest is not None:
+                        await _save_manifest(manifest, relative_url, status='partial', bytes_received=bytes_received,
+                                             expected_size=expected_size)
+                    file_hash = await loop.run_in_executor(None, download.hash_part_file, part_filename, offset,
+                                                           checksum)
+                    part_file = await loop.run_in_executor(None, open, part_filename, "ab" if offset > 0 else "wb")
+                    try:
+                        async for chunk in response.content.iter_chunked(chunk_size):
+                            bytes_received += len(chunk)
+                            n_transferred += len(chunk)
+                            await loop.run_in_executor(None, write_chunk, part_file, file_hash, chunk, bytes_received)
+                            emit(on_event, 'download_progress', name=zip_name, bytes=len(chunk))
+                    finally:
+                        await loop.run_in_executor(None, part_file.close)
+            except (aiohttp.ClientError, asyncio.TimeoutError):
+                print(f"Error while downloading {zip_name}.\nRetrying...")
+                failure = ('network', None)
+                attempts += 1
+                continue
+            if expected_size is not None and bytes_received != expected_size:
+                print(f"Incomplete download of {zip_name} ({bytes_received}/{expected_size} bytes).\nRetrying...")
+                failure = ('incomplete', None)
+                attempts += 1
+                continue
+            if file_hash is not None and file_hash.hexdigest() != checksum[1]:
+                print(f"Checksum mismatch for {zip_name}.\nRetrying...")
+                await loop.run_in_executor(None, download.remove_part_file, part_filename)
+                failure = ('checksum', None)
+                attempts += 1
+                continue
+            await loop.run_in_executor(None, os.replace, part_filename, filename)
+            if manifest is not None:
+                await _save_manifest(manifest, relative_url, status='complete', bytes_received=bytes_received,
+                                     expected_size=bytes_received)
+            emit_download_end(on_event, zip_name, 'complete', n_transferred, started, attempts)
+            return None
+    except asyncio.CancelledError:
+        # the task may not wait for the executor anymore: this last save is made on the loop
+        if manifest is not None:
+            manifest.update(relative_url, status='partial', bytes_received=bytes_received, save=True)
+        raise
+    except OSError as e:
+        await loop.run_in_executor(None, download.remove_part_file, part_filename)
+        if manifest is not None:
+            await _save_manifest(manifest, relative_url, status='failed', bytes_received=0)
+        print(f"{e}\nFailed to write {zip_name} to {tmp_dir}\n"
+              f"Please try to download it manually: {url_not_downloaded}")
+        emit_download_end(on_event, zip_name, 'failed', n_transferred, started, attempts, ('disk', None))
+        return url_not_downloaded
+
+    # the '.part' file is kept, so a later run can resume it
+    if manifest is not None:
+        await _save_manifest(manifest, relative_url, status='failed')
+    print(f"\nFailed to download {zip_name}\n"
+          f"Please try to download it manually: {url_not_downloaded}")
+    emit_download_end(on_event, zip_name, 'failed', n_transferred, started, attempts, failure)
+    return url_not_downloaded
+
+
+async def adownload_zips(zips_tbl: list,
+                         tmp_dir: str = '.',
+                         verbose: bool = True,
+                         base_url: str = "https://www.digipathos-rep.cnptia.embrapa.br",
+                         max_concurrency: int = 16,
+                         chunk_size: int = 1024 * 1024,
+                         manifest: DownloadManifest = None,
+                         session=None,
+                         retry_policy: RetryPolicy = None,
+                         on_event=None):
+    """Async counterpart of download_zips: every sample is a task, at most max_concurrency in flight.
+
+    Args:
+        zips_tbl (list): the samples metadata (i.e., generated by afetch_zips_table).
+        tmp_dir (str, optional): the directory where the zipped files are downloaded to. Defaults to '.'.
+        verbose (bool, optional): notify the user about the progress. Defaults to True.
+        base_url (str, optional): digipathos base url. Defaults to "https://www.digipathos-rep.cnptia.embrapa.br".
+        max_concurrency (int, optional): how many samples are downloaded at the same time. Defaults to 16.
+        chunk_size (int, optional): how many bytes are written to disk at a time. Defaults to 1 MiB.
+        manifest (DownloadManifest, optional): where the download progress is recorded. Samples it marks as
+            complete are skipped. Defaults to None.
+        session (aiohttp.ClientSession, optional): the session shared by all downloads. Defaults to None, in
+            which case a session with max_concurrency connections is opened for this call.
+        retry_policy (RetryPolicy, optional): how each download is retried. Defaults to RetryPolicy().
+        on_event (callable, optional): receives the download events (see MetricsRecorder). Defaults to None.
+
+    Returns:
+        not_downloaded (list): the failed downloads' urls, in table order. None if successful.
+    """
+    _require_aiohttp()
+    if max_concurrency < 1:
+        raise ValueError('max_concurrency must be at least 1.')
+    if session is None:
+        async with create_async_session(max_concurrency) as session:
+            return await adownload_zips(zips_tbl, tmp_dir, verbose, base_url, max_concurrency, chunk_size,
+                                        manifest, session, retry_policy, on_event)
+    if manifest is not None:
+        pending = [entry for entry in zips_tbl if not manifest.is_complete(entry["bsLink"], tmp_dir)]
+        if verbose and len(pending) < len(zips_tbl):
+            print(f"Skipping {len(zips_tbl) - len(pending)} ZIP-files already downloaded...")
+        zips_tbl = pending
+    semaphore = asyncio.Semaphore(max_concurrency)
+    n_done = 0
+
+    async def bounded_download(remote_zip_info: dict):
+        nonlocal n_done
+        async with semaphore:
+            fail_download = await adownload_zip(remote_zip_info, tmp_dir, base_url, chunk_size, manifest,
+                                                session, retry_policy, on_event)
+        n_done += 1
+        if verbose:
+            print(f"Downloaded ZIP-file {n_done}/{len(zips_tbl)}...")
+        return fail_download
+
+    results = await asyncio.gather(*(bounded_download(entry) for entry in zips_tbl))
+    not_downloaded = [fail_download for fail_download in results if fail_download is not None]
+    if len(not_downloaded) > 0:
+        return not_downloaded
+
+
+async def aget_dataset(data_dir: str,
+                       tmp_dir: str,
+                       name_filter: str = "cropped",
+                       verbose: bool = True,
+                       base_url: str = "https://www.digipathos-rep.cnptia.embrapa.br",
+                       list_url: str = "/jspui/zipsincollection/12345678",
+                       max_concurrency: int = 16,
+                       chunk_size: int = 1024 * 1024,
+                       resume: bool = False,
+                       session=None,
+                       retry_policy: RetryPolicy = None,
+                       extract_workers: int = 1,
+                       executor=None,
+                       verify_rounds: int = 2,
+                       cache_dir: str = None,
+                       timeout: float = None,
+                       metrics_path: str = None,
+                       on_event=None) -> dict:
+    """Async counterpart of get_dataset, running as the pipelined mode does.
+
+    Every sample is downloaded on the event loop, then verified and extracted in an executor, then deleted.
+    The chunks are written, hashed and the manifest saved in the default executor (see adownload_zip), so the
+    loop only waits on the network and stays free for other jobs. Several aget_dataset calls can share one loop,
+    and one session if given.
+
+    The whole job can be bounded by timeout, in seconds, and cancelled like any other task. Either way the
+    downloads in flight are stopped, their '.part' files are kept and the manifest in tmp_dir is saved, so
+    calling aget_dataset again with resume=True continues where it stopped.
+
+    Args:
+        data_dir (str): the name of the directory where the images will be downloaded to.
+        tmp_dir (str): the name of the directory where temporary files are kept. Cannot be equal to data_dir.
+        name_filter (str, optional): which images to download: cropped only, original only, or all. Defaults to 'cropped'.
+        verbose (bool, optional): notify the user about the progress. Defaults to True.
+        base_url (str, optional): digipathos base url. Defaults to "https://www.digipathos-rep.cnptia.embrapa.br".
+        list_url (str, optional): digipathos list url. Defaults to "/jspui/zipsincollection/12345678".
+        max_concurrency (int, optional): how many samples are downloaded at the same time. Defaults to 16.
+        chunk_size (int, optional): how many bytes of a sample are written to disk at a time. Defaults to 1 MiB.
+        resume (bool, optional): continue an interrupted run instead of starting from scratch. Defaults to False.
+        session (aiohttp.ClientSession, optional): the session used for every request. Defaults to None, in
+            which case one with max_concurrency connections is opened for the job.
+        retry_policy (RetryPolicy, optional): how failed requests are retried. Defaults to RetryPolicy().
+        extract_workers (int, optional): how many archives are verified and extracted at the same time, by a
+            ThreadPoolExecutor of that many threads created for the job (and shut down at its end). Ignored when
+            an executor is given. Defaults to 1.
+        executor (concurrent.futures.Executor, optional): where verification and extraction run. Defaults to
+            None, in which case the job creates its own pool of extract_workers threads.
+        verify_rounds (int, optional): how many times corrupt samples are downloaded again. Defaults to 2.
+        cache_dir (str, optional): the directory where the zips table is cached. Defaults to None (no cache).
+        timeout (float, optional): the longest the job may take, in seconds. Defaults to None (no limit).
+        metrics_path (str, optional): a JSON-lines file for the download events. Defaults to None (no file).
+        on_event (callable, optional): receives every download event as a dict. Defaults to None.
+
+    Raises:
+        TimeoutError: raised (as asyncio.TimeoutError) when the job takes longer than timeout.
+
+    Returns:
+        info (dict): information regarding the download process, as in get_dataset.
+    """
+    _require_aiohttp()
+    return await asyncio.wait_for(_aget_dataset(data_dir, tmp_dir, name_filter, verbose, base_url, list_url,
+                                                max_concurrency, chunk_size, resume, session, retry_policy,
+                                                extract_workers, executor, verify_rounds, cache_dir,
+                                                metrics_path, on_event),
+                                  timeout)
+
+
+async def _aget_dataset(data_dir, tmp_dir, name_filter, verbose, base_url, list_url, max_concurrency, chunk_size,
+                        resume, session, retry_policy, extract_workers, executor, verify_rounds, cache_dir,
+                        metrics_path, on_event) -> dict:
+    """The body of aget_dataset, without the timeout."""
+    if max_concurrency < 1 or extract_workers < 1:
+        raise ValueError('max_concurrency and extract_workers must be at least 1.')
+    recorder = MetricsRecorder(metrics_path, on_event)
+    if verbose:
+        print("Setting up basic folder structure...")
+    download.create_dir(data_dir, exist_ok=resume)
+    download.create_dir(tmp_dir, exist_ok=resume)
+    loop = asyncio.get_running_loop()
+    manifest = await loop.run_in_executor(None, DownloadManifest, tmp_dir)
+    owns_session = session is None
+    if owns_session:
+        session = create_async_session(max_concurrency)
+    owns_executor = executor is None
+    if owns_executor:
+        executor = ThreadPoolExecutor(max_workers=extract_workers)
+    semaphore = asyncio.Semaphore(max_concurrency)
+
+    async def process(remote_zip_info: dict) -> tuple:
+        filename = remote_zip_info["name"]
+        zip_path = tmp_dir + '/' + filename
+        for verify_round in range(verify_rounds + 1):
+            if not manifest.is_complete(remote_zip_info["bsLink"], tmp_dir):
+                async with semaphore:
+                    fail_download = await adownload_zip(remote_zip_info, tmp_dir, base_url, chunk_size, manifest,
+                                                        session, retry_policy, recorder)
+                if fail_download is not None:
+                    return 'not_downloaded', fail_download
+            problem = await loop.run_in_executor(executor, verify_zip, zip_path, remote_zip_info.get("size"),
+                                                 expected_checksum(remote_zip_info))
+            if problem is None:
+                break
+            print(f"WARNING: ZIP-file {filename} is corrupt: {problem}.")
+            await loop.run_in_executor(None, os.remove, zip_path)
+            await _save_manifest(manifest, remote_zip_info["bsLink"], status='pending', bytes_received=0)
+        else:
+            return 'corrupt', filename
+        started = time.monotonic()
+        failed_unzip = await loop.run_in_executor(executor, download.unpack_zip, filename, data_dir, tmp_dir, resume)
+        if failed_unzip is not None:
+            emit(recorder, 'extract_end', name=filename, status='failed', elapsed=time.monotonic() - started)
+            return 'failed_unzip', filename
+        await loop.run_in_executor(None, os.remove, zip_path)
+        await _save_manifest(manifest, remote_zip_info["bsLink"], status='extracted')
+        emit(recorder, 'extract_end', name=filename, status='complete', elapsed=time.monotonic() - started)
+        if verbose:
+            print(f"Extracted {filename}...")
+        return 'extracted', filename
+
+    try:
+        with recorder.phase('fetch_table'):
+            zips_table = await afetch_zips_table(name_filter, verbose, base_url, list_url, session, retry_policy,
+                                                 cache_dir=cache_dir)
+        # samples extracted by an interrupted run are still cataloged below
+        already_extracted = {entry["name"] for entry in zips_table
+                             if (manifest.get(entry["bsLink"]) or {}).get('status') == 'extracted'}
+        pending = [entry for entry in zips_table if entry["name"] not in already_extracted]
+        if verbose and len(pending) < len(zips_table):
+            print(f"Skipping {len(zips_table) - len(pending)} ZIP-files already extracted...")
+        with recorder.phase('pipeline'):
+            outcomes = await asyncio.gather(*(process(entry) for entry in pending))
+    finally:
+        if owns_session:
+            await session.close()
+        if owns_executor:
+            # do not block the loop on extractions left running by a cancellation
+            executor.shutdown(wait=False, cancel_futures=True)
+    results = {'not_downloaded': [], 'corrupt': [], 'failed_unzip': [], 'extracted': []}
+    for outcome, value in outcomes:
+        results[outcome].append(value)
+    with recorder.phase('cleanup'):
+        await loop.run_in_executor(None, download.remove_tmp_dir, tmp_dir)
+    extracted = set(results['extracted']) | already_extracted
+
+    def update_catalog() -> None:
+        catalog_path = default_catalog_path(data_dir)
+        catalog = load_local_catalog(catalog_path) if resume else {}
+        for entry in zips_table:
+            if entry["name"] in extracted:
+                catalog[entry["bsLink"]] = entry
+        save_local_catalog(catalog_path, list(catalog.values()))
+
+    await loop.run_in_executor(None, update_catalog)
+    return {
+        'zips_table': zips_table,
+        'not_downloaded': results['not_downloaded'] or None,
+        'validation': {
+            'n_zips_in_tmp': len(results['extracted']) + len(results['failed_unzip']),
+            'zero_size_files': [],
+            'corrupt_files': results['corrupt']
+        },
+        'failed_unzips_list': results['failed_unzip'] or None,
+        'metrics': recorder.summary()
+    }
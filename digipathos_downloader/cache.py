@@ -0,0 +1,158 @@
+import hashlib
+import json
+import os
+import shutil
+import threading
+
+from digipathos_downloader.integrity import verify_zip
+
+
+class ZipCache:
+    """Content-addressed store of downloaded samples, shared by every dataset directory on a machine.
+
+    Each verified archive is kept once under 'blobs/<sha256>.zip', and 'links/<sha256 of bsLink>.json'
+    maps a bitstream link to the hash of its contents. Samples are handed out as hardlinks when the
+    destination is on the same filesystem, or as copies otherwise. Every hit refreshes the blob's
+    modification time, so when max_size is exceeded the least recently used blobs are evicted first.
+    All writes are atomic renames, so several processes can share the same cache directory.
+
+    Args:
+        cache_dir (str): the cache directory. It is created if needed.
+        max_size (int, optional): the largest total size of the blobs, in bytes. Defaults to None (unbounded).
+    """
+
+    def __init__(self, cache_dir: str, max_size: int = None):
+        self.cache_dir = cache_dir
+        self.max_size = max_size
+        self._lock = threading.Lock()
+        os.makedirs(self._blob_dir, exist_ok=True)
+        os.makedirs(self._link_dir, exist_ok=True)
+
+    @property
+    def _blob_dir(self) -> str:
+        return os.path.join(self.cache_dir, 'blobs')
+
+    @property
+    def _link_dir(self) -> str:
+        return os.path.join(self.cache_dir, 'links')
+
+    def _link_path(self, relative_url: str) -> str:
+        return os.path.join(self._link_dir, hashlib.sha256(relative_url.encode()).hexdigest() + '.json')
+
+    def _blob_path(self, digest: str) -> str:
+        return os.path.join(self._blob_dir, digest + '.zip')
+
+    def lookup(self, relative_url: str) -> str:
+        """Find the cached blob of a bitstream.
+
+        Args:
+            relative_url (str): the sample url (i.e., 'bsLink').
+
+        Returns:
+            blob_path (str): path for the cached archive. None on a cache miss.
+        """
+        try:
+            with open(self._link_path(relative_url), "r") as link_file:
+                link = json.load(link_file)
+            blob_path = self._blob_path(link["sha256"])
+            if os.path.getsize(blob_path) != link["size"]:
+                return None
+        except (OSError, ValueError, KeyError):
+            return None
+        return blob_path
+
+    def fetch(self, relative_url: str, destination: str) -> bool:
+        """Place the cached archive of a bitstream at destination.
+
+        Args:
+            relative_url (str): the sample url (i.e., 'bsLink').
+            destination (str): where the archive should be (e.g., '<tmp_dir>/<name>').
+
+        Returns:
+            (bool): True on a cache hit, False on a miss.
+        """
+        blob_path = self.lookup(relative_url)
+        if blob_path is None:
+            return False
+        tmp_path = destination + '.cache'
+        try:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            try:
+                os.link(blob_path, tmp_path)
+            except OSError:
+                shutil.copyfile(blob_path, tmp_path)
+            os.replace(tmp_path, destination)
+            os.utime(blob_path)
+        except OSError:
+            # the blob was evicted in the meantime
+            return False
+        return True
+
+    def store(self, relative_url: str, path: str, size: str = None) -> str:
+        """Add a downloaded archive to the cache, if it passes verification (see verify_zip).
+
+        Args:
+            relative_url (str): the sample url (i.e., 'bsLink').
+            path (str): path for the downloaded archive.
+            size (str, optional): the size shown on the website (e.g., '20.45 MB'). Defaults to None.
+
+        Returns:
+            digest (str): the sha256 of the archive. None if it was not stored.
+        """
+        if verify_zip(path, size) is not None:
+            return None
+        file_hash = hashlib.sha256()
+        with open(path, "rb") as zip_file:
+            for block in iter(lambda: zip_file.read(1024 * 1024), b""):
+                file_hash.update(block)
+        digest = file_hash.hexdigest()
+        blob_path = self._blob_path(digest)
+        if not os.path.exists(blob_path):
+            tmp_blob = f"{blob_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            try:
+                os.link(path, tmp_blob)
+            except OSError:
+                shutil.copyfile(path, tmp_blob)
+            os.replace(tmp_blob, blob_path)
+        os.utime(blob_path)
+        link_path = self._link_path(relative_url)
+        tmp_link = f"{link_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_link, "w") as link_file:
+            json.dump({"bsLink": relative_url, "sha256": digest, "size": os.path.getsize(blob_path)}, link_file)
+        os.replace(tmp_link, link_path)
+        self.evict()
+        return digest
+
+    def size(self) -> int:
+        """Total size of the cached blobs, in bytes."""
+        return sum(entry.stat().st_size for entry in os.scandir(self._blob_dir) if entry.name.endswith('.zip'))
+
+    def evict(self) -> list:
+        """Delete the least recently used blobs until the cache fits in max_size.
+
+        Links to evicted blobs are left behind; lookup treats them as misses.
+
+        Returns:
+            evicted (list): the paths of the deleted blobs.
+        """
+        if self.max_size is None:
+            return []
+        with self._lock:
+            blobs = []
+            for entry in os.scandir(self._blob_dir):
+                if entry.name.endswith('.zip'):
+                    stat = entry.stat()
+                    blobs.append((stat.st_mtime, entry.path, stat.st_size))
+            total = sum(size for _, _, size in blobs)
+            evicted = []
+            for _, path, size in sorted(blobs):
+                if total <= self.max_size:
+                    break
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+                total -= size
+                evicted.append(path)
+            return evicted
@@ -0,0 +1,280 @@
+import argparse
+import sys
+
+
+BASE_URL = "https://www.digipathos-rep.cnptia.embrapa.br"
+LIST_URL = "/jspui/zipsincollection/123456789/3"
+
+
+def _byte_count(value: str) -> int:
+    """Parse a number of bytes given as a plain integer or a size such as '10 MB' (binary units)."""
+    try:
+        return int(value)
+    except ValueError:
+        pass
+    from digipathos_downloader.integrity import parse_size
+    n_bytes = parse_size(value)
+    if n_bytes is None:
+        raise argparse.ArgumentTypeError(f"invalid size: {value!r}")
+    return int(n_bytes)
+
+
+def _query(args: argparse.Namespace) -> dict:
+    """The query_metadata_catalog arguments given on the command line. None if there are none."""
+    query = {key: getattr(args, key) for key in ('crop', 'disease', 'part', 'max_bytes')
+             if getattr(args, key) is not None}
+    return query or None
+
+
+def _select(zips_table: list, args: argparse.Namespace) -> list:
+    """Apply the --filter and query options to a zips table."""
+    from contextlib import closing
+
+    from digipathos_downloader.metadata import build_metadata_catalog, filter_zips_table, query_metadata_catalog
+    zips_table = filter_zips_table(zips_table, args.filter)
+    query = _query(args)
+    if query is None:
+        return zips_table
+    with closing(build_metadata_catalog(zips_table)) as connection:
+        return query_metadata_catalog(connection, **query)
+
+
+def _print_table(zips_table: list, as_json: bool) -> None:
+    if as_json:
+        import json
+        json.dump(zips_table, sys.stdout, indent=1)
+        print()
+        return
+    for entry in zips_table:
+        print(f"{entry['size']}\t{entry['name']}")
+
+
+def list_command(args: argparse.Namespace) -> int:
+    """Print the samples, one '<size>\\t<name>' line each (or a JSON list).
+
+    With --cached, the table kept in --cache-dir is read and the network is never touched.
+    """
+    if args.cached:
+        if args.cache_dir is None:
+            print("--cached needs --cache-dir", file=sys.stderr)
+            return 2
+        from digipathos_downloader.table_cache import load_cached_table
+        cached = load_cached_table(args.cache_dir, args.base_url + args.list_url)
+        if cached is None:
+            print(f"No zips table cached in {args.cache_dir} for {args.base_url + args.list_url}", file=sys.stderr)
+            return 1
+        zips_table = cached['bitstreams']
+    else:
+        from digipathos_downloader.download import fetch_zips_table
+        zips_table = fetch_zips_table(name_filter='all',
+                                      verbose=False,
+                                      base_url=args.base_url,
+                                      list_url=args.list_url,
+                                      cache_dir=args.cache_dir)
+    _print_table(_select(zips_table, args), args.json)
+    return 0
+
+
+def _report(info: dict) -> int:
+    """Print what went wrong during a get_dataset run. Returns the exit status."""
+    failed = list(info['not_downloaded'] or [])
+    failed += info['validation']['corrupt_files'] + info['validation']['zero_size_files']
+    failed += info['failed_unzips_list'] or []
+    for name in failed:
+        print(f"failed: {name}", file=sys.stderr)
+    return 1 if failed else 0
+
+
+def _get_dataset(args: argparse.Namespace, **kwargs) -> dict:
+    from digipathos_downloader.download import get_dataset
+    transform = None
+    if args.resize is not None:
+        from digipathos_downloader.transforms import ResizeTransform
+        transform = ResizeTransform(args.resize)
+    return get_dataset(args.data_dir,
+                       args.tmp_dir if args.tmp_dir is not None else args.data_dir.rstrip('/') + '.tmp',
+                       name_filter=args.filter,
+                       verbose=not args.quiet,
+                       base_url=args.base_url,
+                       list_url=args.list_url,
+                       max_workers=args.workers,
+                       extract_workers=args.extract_workers,
+                       pipelined=args.mode == 'pipelined',
+                       direct=args.mode == 'direct',
+                       cache_dir=args.cache_dir,
+                       query=_query(args),
+                       schedule=args.schedule,
+                       rate_limit=args.rate_limit,
+                       byte_budget=args.byte_budget,
+                       metrics_path=args.metrics,
+                       output_format=args.format,
+                       write_index=args.index,
+                       transform=transform,
+                       dedup=args.dedup,
+                       num_shards=args.num_shards,
+                       shard_index=args.shard_index,
+                       member_workers=args.member_workers,
+                       adaptive=args.adaptive,
+                       trust_crc=args.trust_crc,
+                       **kwargs)
+
+
+def fetch_command(args: argparse.Namespace) -> int:
+    """Download the dataset into a new directory (or continue an interrupted download with --resume)."""
+    return _report(_get_dataset(args, resume=args.resume))
+
+
+def sync_command(args: argparse.Namespace) -> int:
+    """Bring an existing dataset directory up to date with the website."""
+    info = _get_dataset(args, sync=True, prune=args.prune)
+    if not args.quiet:
+        print(f"{len(info['sync']['changed'])} samples new or changed, {len(info['sync']['removed'])} removed upstream.")
+    return _report(info)
+
+
+def verify_command(args: argparse.Namespace) -> int:
+    """Check ZIP-files (given directly, or every one in the given folders). Exits with 1 if one is corrupt."""
+    import os
+    from concurrent.futures import ThreadPoolExecutor
+
+    from digipathos_downloader.integrity import verify_zip
+    paths = []
+    for path in args.paths:
+        if os.path.isdir(path):
+            paths += [os.path.join(path, name) for name in sorted(os.listdir(path)) if name.endswith('.zip')]
+        else:
+            paths.append(path)
+    with ThreadPoolExecutor(max_workers=args.workers) as executor:
+        problems = list(executor.map(verify_zip, paths))
+    for path, problem in zip(paths, problems):
+        if problem is not None:
+            print(f"{path}: {problem}", file=sys.stderr)
+        elif not args.quiet:
+            print(f"{path}: OK")
+    return 1 if any(problem is not None for problem in problems) else 0
+
+
+def extract_command(args: argparse.Namespace) -> int:
+    """Extract a folder of ZIP-files into class folders."""
+    import os
+
+    from digipathos_downloader.download import unpack_zips
+    transform = None
+    if args.resize is not None:
+        from digipathos_downloader.transforms import ResizeTransform
+        transform = ResizeTransform(args.resize)
+    os.makedirs(args.data_dir, exist_ok=True)
+    failed = unpack_zips(args.zips_dir,
+                         args.data_dir,
+                         verbose=not args.quiet,
+                         overwrite=args.overwrite,
+                         max_workers=args.workers,
+                         transform=transform,
+                         member_workers=args.member_workers)
+    for name in failed or []:
+        print(f"failed: {name}", file=sys.stderr)
+    return 1 if failed else 0
+
+
+def build_parser() -> argparse.ArgumentParser:
+    """Build the argument parser of the 'digipathos' command.
+
+    Returns:
+        parser (argparse.ArgumentParser): the parser. Each subcommand sets its function as 'command'.
+    """
+    parser = argparse.ArgumentParser(prog='digipathos', description="Download Embrapa's Digipathos dataset.")
+    subparsers = parser.add_subparsers(dest='command_name', metavar='command', required=True)
+
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument('-q', '--quiet', action='store_true', help="only report problems")
+    common.add_argument('--base-url', default=BASE_URL, help="digipathos base url")
+    common.add_argument('--list-url', default=LIST_URL, help="digipathos list url")
+    common.add_argument('--cache-dir', help="directory of the local table and sample cache")
+
+    filters = argparse.ArgumentParser(add_help=False)
+    filters.add_argument('--filter', choices=['cropped', 'original', 'all'], default='cropped',
+                         help="which images: cropped only, original only or all (default: cropped)")
+    filters.add_argument('--crop', action='append', help="keep this crop (repeatable)")
+    filters.add_argument('--disease', action='append', help="keep this disease (repeatable)")
+    filters.add_argument('--part', action='append', type=int, help="keep this part index (repeatable)")
+    filters.add_argument('--max-bytes', type=_byte_count, help="keep samples in name order up to this total size")
+
+    download = argparse.ArgumentParser(add_help=False)
+    download.add_argument('data_dir', help="the dataset directory")
+    download.add_argument('--tmp-dir', help="directory for the downloads (default: <data_dir>.tmp)")
+    download.add_argument('-j', '--workers', type=int, default=4, help="parallel downloads (default: 4)")
+    download.add_argument('--extract-workers', type=int, default=1, help="parallel extractions (default: 1)")
+    download.add_argument('--member-workers', type=int, default=1,
+                          help="threads extracting the members of each archive (default: 1)")
+    download.add_argument('--mode', choices=['phased', 'pipelined', 'direct'], default='phased',
+                          help="download then extract, extract each sample as it lands, or stream into data_dir")
+    download.add_argument('--adaptive', action='store_true',
+                          help="tune the number of parallel downloads, up to --workers, from the observed throughput")
+    download.add_argument('--rate-limit', type=_byte_count, help="bandwidth cap, e.g. '10 MB' per second")
+    download.add_argument('--byte-budget', type=_byte_count, help="download at most this many bytes")
+    download.add_argument('--schedule', choices=['largest', 'smallest', 'table'], default='largest',
+                          help="download order (default: largest first)")
+    download.add_argument('--format', choices=['folders', 'zips', 'shards'], default='folders',
+                          help="output format (default: folders)")
+    download.add_argument('--resize', type=int, help="resize and center crop the images to this square size")
+    download.add_argument('--dedup', action='store_true', help="store identical images once, as hardlinks")
+    download.add_argument('--trust-crc', action='store_true',
+                          help="with --dedup, skip the samples whose images are present by CRC-32 and size "
+                               "(a CRC collision would install a wrong image)")
+    download.add_argument('--index', action='store_true', help="write an index of the extracted images")
+    download.add_argument('--metrics', help="JSON-lines file for the download events")
+    download.add_argument('--num-shards', type=int, default=1, help="how many nodes split the download")
+    download.add_argument('--shard-index', type=int, default=0, help="which part this node downloads")
+
+    list_parser = subparsers.add_parser('list', parents=[common, filters], help="list the samples")
+    list_parser.add_argument('--cached', action='store_true', help="read the cached table, never the network")
+    list_parser.add_argument('--json', action='store_true', help="print the entries as JSON")
+    list_parser.set_defaults(command=list_command)
+
+    fetch_parser = subparsers.add_parser('fetch', parents=[common, filters, download], help="download the dataset")
+    fetch_parser.add_argument('--resume', action='store_true', help="continue an interrupted download")
+    fetch_parser.set_defaults(command=fetch_command)
+
+    sync_parser = subparsers.add_parser('sync', parents=[common, filters, download], help="update a dataset directory")
+    sync_parser.add_argument('--prune', action='store_true', help="delete the samples removed upstream")
+    sync_parser.set_defaults(command=sync_command)
+
+    verify_parser = subparsers.add_parser('verify', parents=[common], help="check downloaded ZIP-files")
+    verify_parser.add_argument('paths', nargs='+', help="ZIP-files, or folders of ZIP-files")
+    verify_parser.add_argument('-j', '--workers', type=int, default=4, help="parallel checks (default: 4)")
+    verify_parser.set_defaults(command=verify_command)
+
+    extract_parser = subparsers.add_parser('extract', parents=[common], help="extract a folder of ZIP-files")
+    extract_parser.add_argument('zips_dir', help="the folder of ZIP-files")
+    extract_parser.add_argument('data_dir', help="the dataset directory")
+    extract_parser.add_argument('-j', '--workers', type=int, default=1, help="parallel extractions (default: 1)")
+    extract_parser.add_argument('--member-workers', type=int, default=1,
+                                help="threads extracting the members of each archive (default: 1)")
+    extract_parser.add_argument('--overwrite', action='store_true', help="replace existing class folders")
+    extract_parser.add_argument('--resize', type=int, help="resize and center crop the images to this square size")
+    extract_parser.set_defaults(command=extract_command)
+    return parser
+
+
+def main(argv: list = None) -> int:
+    """Run the 'digipathos' command (the console script declared in pyproject.toml).
+
+    Only argparse is imported up front: every subcommand imports what it needs when it runs, so that quick
+    commands (e.g., 'digipathos list --cached') start without loading requests or the download machinery.
+
+    Args:
+        argv (list, optional): the arguments. Defaults to None (sys.argv[1:]).
+
+    Returns:
+        status (int): the exit status: 0 on success, 1 if something failed, 2 for invalid arguments.
+    """
+    args = build_parser().parse_args(argv)
+    try:
+        return args.command(args)
+    except ValueError as e:
+        print(f"digipathos {args.command_name}: {e}", file=sys.stderr)
+        return 2
+
+
+if __name__ == "__main__":
+    sys.exit(main())
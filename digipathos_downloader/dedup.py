@@ -0,0 +1,313 @@
+import hashlib
+import io
+import json
+import os
+import shutil
+import zipfile
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+from digipathos_downloader.session import RetryPolicy, get_with_retries
+from digipathos_downloader.streaming import safe_path
+
+
+# the end of central directory record (22 bytes) plus the longest archive comment
+TAIL_SIZE = 22 + 65535
+
+
+def default_dedup_index_path(data_dir: str) -> str:
+    """Where the content hashes of a dataset directory are kept by default, next to the directory.
+
+    Args:
+        data_dir (str): the dataset directory.
+
+    Returns:
+        path (str): '<data_dir>.dedup.json'.
+    """
+    return os.path.normpath(data_dir) + '.dedup.json'
+
+
+class _RangeFile(io.RawIOBase):
+    """Seekable, read-only view of a remote file, fetched with HTTP Range requests as it is read.
+
+    The tail of the file is fetched up front, since that is where ZipFile looks first: for most archives,
+    the central directory is in it and reading the member list costs one request.
+    """
+
+    def __init__(self, url: str, session, retry_policy: RetryPolicy):
+        self._url = url
+        self._session = session
+        self._retry_policy = retry_policy
+        self._position = 0
+        data, start, self._size = self._fetch(f"bytes=-{TAIL_SIZE}")
+        self._tail = data
+        self._tail_start = start
+
+    def _fetch(self, byte_range: str) -> tuple:
+        response = get_with_retries(self._session, self._url, self._retry_policy,
+                                    headers={"Range": byte_range}, stream=True)
+        with response:
+            if response.status_code != 206:
+                # a server ignoring the range would send the whole archive
+                raise OSError(f"{self._url} answered {response.status_code} to a range request")
+            content_range = response.headers.get("Content-Range", "")
+            try:
+                first_last, size = content_range.split(" ")[1].split("/")
+                start = int(first_last.split("-")[0])
+                size = int(size)
+            except (IndexError, ValueError):
+                raise OSError(f"{self._url} sent an invalid Content-Range: {content_range!r}")
+            return response.content, start, size
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def tell(self) -> int:
+        return self._position
+
+    def seek(self, offset: int, whence: int = os.SEEK_SET) -> int:
+        if whence == os.SEEK_CUR:
+            offset += self._position
+        elif whence == os.SEEK_END:
+            offset += self._size
+        self._position = max(0, offset)
+        return self._position
+
+    def readinto(self, buffer) -> int:
+        size = min(len(buffer), self._size - self._position)
+        if size <= 0:
+            return 0
+        if self._position >= self._tail_start:
+            start = self._position - self._tail_start
+            data = self._tail[start:start + size]
+        else:
+            data, _, _ = self._fetch(f"bytes={self._position}-{self._position + size - 1}")
+        buffer[:len(data)] = data
+        self._position += len(data)
+        return len(data)
+
+
+def read_remote_members(url: str,
+                        session: requests.Session = requests,
+                        retry_policy: RetryPolicy = None) -> list:
+    """List the members of a remote ZIP-file from its central directory, without downloading the archive.
+
+    Args:
+        url (str): the archive url. The server must honor Range requests.
+        session (requests.Session, optional): the session used for the requests. Defaults to the requests module.
+        retry_policy (RetryPolicy, optional): how the requests are retried. Defaults to RetryPolicy().
+
+    Raises:
+        OSError: if the server does not honor Range requests.
+        BadZipFile: if the file is not a ZIP-file.
+
+    Returns:
+        members (list): a (name, crc32, size) tuple for every file in the archive.
+    """
+    with _RangeFile(url, session, retry_policy) as remote_file:
+        with zipfile.ZipFile(remote_file, mode="r") as zip_contents:
+            return [(member.filename, member.CRC, member.file_size)
+                    for member in zip_contents.infolist() if not member.is_dir()]
+
+
+def scan_members(data_dir: str, index_path: str = None, exclude: set = ()) -> dict:
+    """Hash every image of a dataset directory, reusing the hashes of the files left unchanged since the last scan.
+
+    Each file gets the CRC-32 found in ZIP central directories, to be matched against remote archives, and a
+    sha256, to tell identical files apart for sure. The hashes are kept in index_path, keyed by path, along with
+    the size and modification time they were computed for.
+
+    Args:
+        data_dir (str): the dataset directory (a folder of images per class).
+        index_path (str, optional): where the hashes are kept. Defaults to '<data_dir>.dedup.json'.
+        exclude (set, optional): class folders left out of the scan. Defaults to none.
+
+    Returns:
+        members (dict): maps every path (relative to data_dir) to its size, CRC-32 and sha256.
+    """
+    if index_path is None:
+        index_path = default_dedup_index_path(data_dir)
+    known = {}
+    if os.path.exists(index_path):
+        with open(index_path, "r") as index_file:
+            known = json.load(index_file)
+    index = {}
+    for entry in sorted(os.scandir(data_dir), key=lambda entry: entry.name):
+        if not entry.is_dir() or entry.name in exclude:
+            continue
+        for root, dirs, files in os.walk(entry.path):
+            dirs.sort()
+            for name in sorted(files):
+                path = os.path.join(root, name)
+                relative_path = os.path.relpath(path, data_dir)
+                stat = os.stat(path)
+                cached = known.get(relative_path)
+                if cached is not None and cached[:2] == [stat.st_size, stat.st_mtime_ns]:
+                    index[relative_path] = cached
+                    continue
+                crc = 0
+                file_hash = hashlib.sha256()
+                with open(path, "rb") as image_file:
+                    for block in iter(lambda: image_file.read(1024 * 1024), b""):
+                        crc = zlib.crc32(block, crc)
+                        file_hash.update(block)
+                index[relative_path] = [stat.st_size, stat.st_mtime_ns, crc, file_hash.hexdigest()]
+    if exclude:
+        # keep what was known of the excluded folders for the next scan
+        index.update({path: value for path, value in known.items() if path.split(os.sep)[0] in exclude})
+    tmp_path = f"{index_path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w") as index_file:
+        json.dump(index, index_file)
+    os.replace(tmp_path, index_path)
+    return {path: {'size': size, 'crc': crc, 'sha256': digest}
+            for path, (size, _, crc, digest) in index.items() if path.split(os.sep)[0] not in exclude}
+
+
+def plan_member_links(zips_table: list, remote_members: dict, local_members: dict, data_dir: str) -> tuple:
+    """Split the samples into the ones to download and the ones whose every member is already at hand.
+
+    A member is at hand when a file with the same CRC-32 and size is in data_dir, or in an archive planned
+    for download before it. Samples are taken in table order, so the first of two identical archives is
+    downloaded and the second is linked to it. Nothing else is compared: a CRC-32 collision links the wrong
+    image, which is why get_dataset only plans links when asked to (trust_crc=True).
+
+    Args:
+        zips_table (list): the samples, in download order.
+        remote_members (dict): maps sample names to their members (see read_remote_members). Samples missing
+            from it, or mapped to None, are downloaded.
+        local_members (dict): the files already in data_dir (see scan_members).
+        data_dir (str): the dataset directory.
+
+    Returns:
+        (tuple): the samples to download, and a (sample, links) tuple for every other sample, where links
+            holds the (source, target) paths that rebuild its class folder.
+    """
+    at_hand = {}
+    for relative_path, member in sorted(local_members.items()):
+        at_hand.setdefault((member['crc'], member['size']), os.path.join(data_dir, relative_path))
+    to_download = []
+    linked = []
+    for entry in zips_table:
+        members = remote_members.get(entry["name"])
+        class_dir = os.path.join(data_dir, entry["name"][:-4])
+        if members and all((crc, size) in at_hand for _, crc, size in members):
+            linked.append((entry, [(at_hand[(crc, size)], safe_path(class_dir, name)) for name, crc, size in members]))
+            continue
+        to_download.append(entry)
+        for name, crc, size in members or []:
+            at_hand.setdefault((crc, size), safe_path(class_dir, name))
+    return to_download, linked
+
+
+def skip_present_zips(zips_table: list,
+                      data_dir: str,
+                      base_url: str,
+                      session: requests.Session = requests,
+                      retry_policy: RetryPolicy = None,
+                      verbose: bool = True,
+                      max_workers: int = 10,
+                      index_path: str = None) -> tuple:
+    """Find the samples that need not be downloaded, because their images are already in data_dir or in
+    another sample of the table.
+
+    Only the central directories of the remote archives are fetched (see read_remote_members). Members are
+    matched by CRC-32 and size, which is all a central directory tells about them. Samples whose central
+    directory cannot be read are downloaded.
+
+    Args:
+        zips_table (list): the samples to download, in download order.
+        data_dir (str): the dataset directory.
+        base_url (str): digipathos website base url.
+        session (requests.Session, optional): the session used for the requests. Defaults to the requests module.
+        retry_policy (RetryPolicy, optional): how the requests are retried. Defaults to RetryPolicy().
+        verbose (bool, optional): notify the user about the progress. Defaults to True.
+        max_workers (int, optional): how many central directories are fetched at the same time. Defaults to 10.
+        index_path (str, optional): where the hashes of data_dir are kept. Defaults to '<data_dir>.dedup.json'.
+
+    Returns:
+        (tuple): the samples to download, and the linked ones (see plan_member_links).
+    """
+    def read(entry: dict):
+        try:
+            return read_remote_members(base_url + '/' + entry["bsLink"], session, retry_policy)
+        except (OSError, zipfile.BadZipFile, requests.exceptions.RequestException) as e:
+            if verbose:
+                print(f"{e}\nCannot list the members of {entry['name']}, it will be downloaded...")
+            return None
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        remote_members = dict(zip([entry["name"] for entry in zips_table], executor.map(read, zips_table)))
+    # the class folders about to be replaced cannot serve as sources
+    local_members = scan_members(data_dir, index_path, exclude={entry["name"][:-4] for entry in zips_table})
+    to_download, linked = plan_member_links(zips_table, remote_members, local_members, data_dir)
+    if verbose:
+        print(f"{len(linked)} ZIP-files are already present and will be linked instead of downloaded...")
+    return to_download, linked
+
+
+def link_members(class_dir: str, links: list) -> bool:
+    """Rebuild a class folder out of files already on disk, as hardlinks (or copies across filesystems).
+
+    Args:
+        class_dir (str): the class folder. It is replaced if it exists.
+        links (list): the (source, target) paths, targets inside class_dir.
+
+    Returns:
+        (bool): False if a source is missing (e.g., its archive failed to download), True otherwise.
+    """
+    if any(not os.path.exists(source) for source, _ in links):
+        return False
+    shutil.rmtree(class_dir, ignore_errors=True)
+    os.makedirs(class_dir)
+    for source, target in links:
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        try:
+            os.link(source, target)
+        except OSError:
+            shutil.copyfile(source, target)
+    return True
+
+
+def dedup_files(data_dir: str, index_path: str = None, verbose: bool = True) -> dict:
+    """Keep a single copy of every image in a dataset directory, by hardlinking identical files together.
+
+    Files are identical when their sizes and sha256 match (see scan_members). Each group keeps the file
+    with the smallest path and every other one becomes a hardlink to it, so paths and contents do not change.
+    Files that cannot be hardlinked (e.g., on a filesystem without hardlinks) are left as they are.
+
+    Args:
+        data_dir (str): the dataset directory.
+        index_path (str, optional): where the hashes of data_dir are kept. Defaults to '<data_dir>.dedup.json'.
+        verbose (bool, optional): notify the user about the progress. Defaults to True.
+
+    Returns:
+        (dict): the number of files (n_files), of distinct contents (n_unique), of files turned into
+            hardlinks by this call (n_linked), and the bytes it freed (bytes_saved).
+    """
+    members = scan_members(data_dir, index_path)
+    groups = {}
+    for relative_path in sorted(members):
+        member = members[relative_path]
+        groups.setdefault((member['size'], member['sha256']), []).append(os.path.join(data_dir, relative_path))
+    n_linked = 0
+    bytes_saved = 0
+    for (size, _), paths in groups.items():
+        for path in paths[1:]:
+            if os.path.samefile(paths[0], path):
+                continue
+            tmp_path = f"{path}.{os.getpid()}.tmp"
+            try:
+                os.link(paths[0], tmp_path)
+                os.replace(tmp_path, path)
+            except OSError:
+                continue
+            n_linked += 1
+            bytes_saved += size
+    if verbose:
+        print(f"{n_linked} duplicate images replaced by hardlinks, {bytes_saved / 1024 ** 2:.2f} MiB freed...")
+    return {'n_files': len(members), 'n_unique': len(groups), 'n_linked': n_linked, 'bytes_saved': bytes_saved}
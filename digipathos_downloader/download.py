@@ -1,34 +1,70 @@
+import hashlib
+import io
 import os
+import queue
 import shutil
 import sys
+import threading
+import time
 import zipfile
+from contextlib import closing
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
 
 import requests
 
-def create_dir(path) -> None:
+from digipathos_downloader import pipeline
+from digipathos_downloader.cache import ZipCache
+from digipathos_downloader.image_index import build_image_index
+from digipathos_downloader.dedup import dedup_files, link_members, skip_present_zips
+from digipathos_downloader.integrity import expected_checksum, verify_zip
+from digipathos_downloader.manifest import DownloadManifest
+from digipathos_downloader.metrics import MetricsRecorder, emit, emit_download_end, emit_download_retry
+from digipathos_downloader.metadata import build_metadata_catalog, filter_zips_table, query_metadata_catalog
+from digipathos_downloader.scheduler import (AdaptiveConcurrency, TokenBucket, apply_byte_budget, order_zips_table,
+                                             partition_zips_table)
+from digipathos_downloader.reader import ZipDataset
+from digipathos_downloader.session import RetryPolicy, create_session, get_with_retries
+from digipathos_downloader.streaming import UnstreamableZipError, extract_stream, safe_path
+from digipathos_downloader.shards import write_shards
+from digipathos_downloader.sync import (default_catalog_path, diff_zips_tables, load_local_catalog,
+                                        save_local_catalog, shard_catalog_path)
+from digipathos_downloader.table_cache import is_fresh, load_cached_table, save_cached_table
+from digipathos_downloader.transforms import claim_output_path, extract_transformed
+
+
+OUTPUT_FORMATS = ('folders', 'zips', 'shards')
+
+
+def create_dir(path, exist_ok: bool = False) -> None:
     """Create directory in a given path.
 
     Args:
         path (str): the directory to be created. 
+        exist_ok (bool, optional): do not fail if the directory already exists. Defaults to False.
 
     Raises:
         OSError: raised when the directory cannot be created.
     """
     try:
         os.mkdir(path)
+    except FileExistsError as e:
+        if not (exist_ok and os.path.isdir(path)):
+            raise OSError(f"{e}\nFailed to create directory: {path}")
     except OSError as e:
         raise OSError(f"{e}\nFailed to create directory: {path}")
 
 
 def create_basic_folder_structure(dataset_dir: str = 'plant-disease-db', 
                                   volatile_dir: str = 'tmp',  
-                                  verbose: str = False) -> None:
+                                  verbose: str = False,
+                                  exist_ok: bool = False) -> None:
     """Create folder structure for the dataset download process.
 
     Args:
         dataset_dir (str, optional): the name of the  directory where the images will be downloaded to. Defaults to 'plant-disease-db'.
         volatile_dir (str, optional): the name of the directory where temporary files are kept. Cannot be equal to dataset_dir. Defaults to 'tmp'.
         verbose (str, optional): notify the user about the download progress. Defaults to False.
+        exist_ok (bool, optional): reuse the directories if they already exist (e.g., to resume an interrupted run). Defaults to False.
 
     Raises:
         OSError: raised when the directories cannot be created.
@@ -41,8 +77,8 @@ def create_basic_folder_structure(dataset_dir: str = 'plant-disease-db',
     if verbose:
         print("Setting up basic folder structure...")
     try:
-        create_dir(data_dir)
-        create_dir(tmp_dir)
+        create_dir(data_dir, exist_ok)
+        create_dir(tmp_dir, exist_ok)
     except OSError as e:
         print(f"{e}\nUnable to create basic folder structure. Please make sure the directory exists and is empty.")
         sys.exit(1)
@@ -51,14 +87,36 @@ def create_basic_folder_structure(dataset_dir: str = 'plant-disease-db',
 def fetch_zips_table(name_filter: str = "cropped", 
                      verbose: str = False,
                      base_url: str = "https://www.digipathos-rep.cnptia.embrapa.br",
-                     list_url: str = "/jspui/zipsincollection/123456789/3"):
+                     list_url: str = "/jspui/zipsincollection/123456789/3",
+                     session: requests.Session = None,
+                     retry_policy: RetryPolicy = None,
+                     page_size: int = 1000,
+                     page_workers: int = 1,
+                     cache_dir: str = None,
+                     cache_ttl: float = 3600):
     """Fetch Zips table. Executes a get request to the digipathos website requesting the the images metadata. 
 
+    The table is requested page_size entries at a time, until a page comes back short. With page_workers > 1,
+    that many pages are requested at once. A page holding only entries already received (a server ignoring
+    the offset) counts as a failure to fetch the table.
+
+    Given a cache_dir, the table is kept on disk (see table_cache). A cached table younger than cache_ttl
+    seconds is used as is; an older one is revalidated with a conditional request (If-None-Match /
+    If-Modified-Since on the first page) and reused if the server answers 304. If the website cannot
+    be reached, a cached table of any age is used instead of giving up.
+
     Args:
         name_filter (str, optional): which images to download: cropped only, original only, or all. Defaults to 'cropped'.
         verbose (str, optional): notify about the process. Defaults to False.
         base_url (str, optional): digipathos base url. Defaults to "https://www.digipathos-rep.cnptia.embrapa.br".
         list_url (str, optional): digipathos list url. Defaults to "/jspui/zipsincollection/123456789/3".
+        session (requests.Session, optional): the session used for the request (see create_session). Defaults to None.
+        retry_policy (RetryPolicy, optional): how the request is retried. Defaults to RetryPolicy().
+        page_size (int, optional): how many entries are requested at a time. Defaults to 1000.
+        page_workers (int, optional): how many pages are requested at the same time. Defaults to 1.
+        cache_dir (str, optional): the directory where the table is cached. Defaults to None (no cache).
+        cache_ttl (float, optional): how long a cached table is used without revalidation, in seconds.
+            None means forever. Defaults to 3600.
 
     Returns: 
         zips_table: a list containing the images' metadata.
@@ -67,78 +125,367 @@ def fetch_zips_table(name_filter: str = "cropped",
         RequestException: raised when the process is unable to fetch zip table from a given image url.
     """
     url = base_url + list_url
-    if verbose:
-        print("Downloading table containing remote image DB information...")
-    query_params = {"offset": 0, "limit": 100000}
-    try:
-        response = requests.get(url, query_params).json()
-    except requests.exceptions.RequestException as e:
-        print(f"{e}\nUnable to fetch ZIP's table from {url}")
-        sys.exit(1)
+    http = session if session is not None else requests
+    cached = load_cached_table(cache_dir, url) if cache_dir is not None else None
+    if is_fresh(cached, cache_ttl):
+        if verbose:
+            print("Using cached table containing remote image DB information...")
+        zips_table = cached['bitstreams']
     else:
-        zips_table = response["bitstreams"]
-        if name_filter.lower() == "cropped":
-            if verbose:
-                print("Filtering for cropped images...")
-            return [entry for entry in zips_table if "cropped" in entry["name"].lower()]
-        elif name_filter.lower() == "original":
-            if verbose:
-                print("Filtering for original images...")
-            return [entry for entry in zips_table if "cropped" not in entry["name"].lower()]
+        if verbose:
+            print("Downloading table containing remote image DB information...")
+        try:
+            fetched = _fetch_table_pages(http, url, retry_policy, page_size, page_workers, cached)
+        except requests.exceptions.RequestException as e:
+            if cached is None:
+                print(f"{e}\nUnable to fetch ZIP's table from {url}")
+                sys.exit(1)
+            print(f"{e}\nUnable to fetch ZIP's table from {url}. Using the cached one instead.")
+            zips_table = cached['bitstreams']
         else:
-            return zips_table
+            if cache_dir is not None:
+                save_cached_table(cache_dir, url, fetched['bitstreams'], fetched['etag'], fetched['last_modified'])
+            zips_table = fetched['bitstreams']
+    return filter_zips_table(zips_table, name_filter, verbose)
+
+def _fetch_table_pages(http,
+                       url: str,
+                       retry_policy: RetryPolicy,
+                       page_size: int,
+                       page_workers: int,
+                       cached: dict) -> dict:
+    """Request the zips table page by page (see fetch_zips_table).
+
+    Args:
+        http (requests.Session): the session, or the requests module.
+        url (str): the full list url.
+        retry_policy (RetryPolicy): how each request is retried.
+        page_size (int): how many entries are requested at a time.
+        page_workers (int): how many pages are requested at the same time.
+        cached (dict): the cached table to revalidate. None if there is none.
+
+    Returns:
+        (dict): the 'bitstreams' and the validators of the first page ('etag', 'last_modified').
+
+    Raises:
+        RequestException: raised when a page cannot be fetched, or when the server sends the same entries
+            again (i.e., it ignores the offset).
+    """
+    def get_page(offset: int, headers: dict = None) -> requests.Response:
+        response = get_with_retries(http, url, retry_policy,
+                                    params={"offset": offset, "limit": page_size}, headers=headers)
+        if response.status_code != 304:
+            response.raise_for_status()
+        return response
+
+    headers = {}
+    if cached is not None and cached.get('etag'):
+        headers["If-None-Match"] = cached['etag']
+    if cached is not None and cached.get('last_modified'):
+        headers["If-Modified-Since"] = cached['last_modified']
+    first_page = get_page(0, headers)
+    if first_page.status_code == 304:
+        return {'bitstreams': cached['bitstreams'],
+                'etag': first_page.headers.get("ETag", cached.get('etag')),
+                'last_modified': first_page.headers.get("Last-Modified", cached.get('last_modified'))}
+    bitstreams = first_page.json()["bitstreams"]
+    seen_links = {entry["bsLink"] for entry in bitstreams}
+    last_page = bitstreams
+    offset = page_size
+    with ThreadPoolExecutor(max_workers=page_workers) as executor:
+        while len(last_page) == page_size:
+            offsets = [offset + index * page_size for index in range(page_workers)]
+            pages = [page.json()["bitstreams"] for page in executor.map(get_page, offsets)]
+            for page_offset, page in zip(offsets, pages):
+                if not page_adds_entries(page, seen_links):
+                    raise requests.exceptions.RequestException(
+                        f"{url} sent the same entries again at offset {page_offset}; it seems to ignore the offset.")
+                bitstreams.extend(page)
+                last_page = page
+                if len(page) < page_size:
+                    break
+            offset = offsets[-1] + page_size
+    return {'bitstreams': bitstreams,
+            'etag': first_page.headers.get("ETag"),
+            'last_modified': first_page.headers.get("Last-Modified")}
+
+
+def page_adds_entries(page: list, seen_links: set) -> bool:
+    """Record the bsLinks of a table page in seen_links, telling whether an entry was new.
+
+    A server that ignores the offset keeps sending the first page; without this check the paging never ends.
+
+    Args:
+        page (list): the page entries.
+        seen_links (set): the bsLinks of the previous pages. Updated in place.
+
+    Returns:
+        (bool): False if the page is not empty and all its entries were already seen, True otherwise.
+    """
+    new_links = {entry["bsLink"] for entry in page} - seen_links
+    seen_links.update(new_links)
+    return bool(new_links) or not page
 
 
 def download_zip(relative_url: str, 
                  zip_name: str, 
                  tmp_dir: str = '.',                 
-                 base_url: str = "https://www.digipathos-rep.cnptia.embrapa.br"):
+                 base_url: str = "https://www.digipathos-rep.cnptia.embrapa.br",
+                 chunk_size: int = 1024 * 1024,
+                 manifest: DownloadManifest = None,
+                 session: requests.Session = None,
+                 retry_policy: RetryPolicy = None,
+                 checksum: tuple = None,
+                 rate_limiter: TokenBucket = None,
+                 on_event=None):
     """Tries to download a sample (a zip file).
 
+    The response body is streamed to a temporary '<zip_name>.part' file in chunks of chunk_size bytes,
+    which is renamed to zip_name once complete. Memory use does not depend on the sample size.
+    If a '.part' file is already there (e.g., left by an interrupted run), the download continues
+    from its last byte through an HTTP Range request.
+    When a checksum is given, the file is hashed while it is written and a mismatch counts as a failed attempt.
+
     Args:
         relative_url (str): the sample url to be downloaded.
         zip_name (str): the sample name.
         tmp_dir (str): where the zip file will be downloaded to.  
         base_url (str, optional): digipathos base url. Defaults to "https://www.digipathos-rep.cnptia.embrapa.br".
+        chunk_size (int, optional): how many bytes are written to disk at a time. Defaults to 1 MiB.
+        manifest (DownloadManifest, optional): where the download progress is recorded. Defaults to None.
+        session (requests.Session, optional): the session used for the requests (see create_session). Defaults to
+            None, which sends each request through a new connection.
+        retry_policy (RetryPolicy, optional): how many attempts are made and how long to wait between them.
+            Defaults to RetryPolicy().
+        checksum (tuple, optional): the hashlib algorithm and expected hex digest of the sample (see
+            expected_checksum). Defaults to None (not checked).
+        rate_limiter (TokenBucket, optional): the global bandwidth cap. Defaults to None (no cap).
+        on_event (callable, optional): receives the download events (see MetricsRecorder). Defaults to None.
     
     Returns:
         url_not_downloaded (str): the url of a failed download. If download is successful, returns None.
     """
-    
-    url_not_downloaded = None
+    http = session if session is not None else requests
+    if retry_policy is None:
+        retry_policy = RetryPolicy()
+    filename = tmp_dir + '/' + zip_name
+    part_filename = filename + '.part'
+    if manifest is not None:
+        manifest.update(relative_url, name=zip_name)
+    emit(on_event, 'download_start', name=zip_name, url=relative_url)
+    started = time.monotonic()
+    n_transferred = 0
     attempts = 0
-    max_attempts = 3
-    while attempts < max_attempts:
+    failed_response = None
+    failure = None
+    while attempts < retry_policy.max_attempts:
+        if attempts > 0:
+            emit_download_retry(on_event, zip_name, attempts, failure)
+            retry_policy.wait(attempts, failed_response)
+            failed_response = None
+        offset = os.path.getsize(part_filename) if os.path.exists(part_filename) else 0
+        headers = {"Range": f"bytes={offset}-"} if offset > 0 else {}
         try:
-            response = requests.get(base_url + relative_url)
-            if not response.ok:
-                print(f"Error while downloading {zip_name}.\Retrying...")
+            with http.get(base_url + relative_url, headers=headers, stream=True,
+                          timeout=retry_policy.timeout) as response:
+                if response.status_code == 416:
+                    # the partial file does not match the remote one anymore
+                    remove_part_file(part_filename)
+                    failure = ('http', 416)
+                    attempts += 1
+                    continue
+                if not response.ok:
+                    failure = ('http', response.status_code)
+                    if response.status_code not in retry_policy.retry_statuses:
+                        break
+                    print(f"Error while downloading {zip_name}.\nRetrying...")
+                    failed_response = response
+                    attempts += 1
+                    continue
+                if response.status_code != 206:
+                    offset = 0
+                expected_size = content_size(response, offset)
+                bytes_received = offset
+                if manifest is not None:
+                    manifest.update(relative_url, status='partial', bytes_received=bytes_received,
+                                    expected_size=expected_size, save=True)
+                file_hash = hash_part_file(part_filename, offset, checksum)
+                with open(part_filename, "ab" if offset > 0 else "wb") as part_file:
+                    for chunk in _throttled(response.iter_content(chunk_size=chunk_size), rate_limiter):
+                        part_file.write(chunk)
+                        if file_hash is not None:
+                            file_hash.update(chunk)
+                        bytes_received += len(chunk)
+                        n_transferred += len(chunk)
+                        if manifest is not None:
+                            manifest.update(relative_url, bytes_received=bytes_received)
+                        emit(on_event, 'download_progress', name=zip_name, bytes=len(chunk))
+            if expected_size is not None and bytes_received != expected_size:
+                print(f"Incomplete download of {zip_name} ({bytes_received}/{expected_size} bytes).\nRetrying...")
+                failure = ('incomplete', None)
                 attempts += 1
-            else:
-                break
+                continue
+            if file_hash is not None and file_hash.hexdigest() != checksum[1]:
+                print(f"Checksum mismatch for {zip_name}.\nRetrying...")
+                remove_part_file(part_filename)
+                failure = ('checksum', None)
+                attempts += 1
+                continue
+            os.replace(part_filename, filename)
+            if manifest is not None:
+                manifest.update(relative_url, status='complete', bytes_received=bytes_received,
+                                expected_size=bytes_received, save=True)
+            emit_download_end(on_event, zip_name, 'complete', n_transferred, started, attempts)
+            return None
         except requests.exceptions.RequestException:
             print(f"Error while downloading {zip_name}.\nRetrying...")
+            failure = ('network', None)
             attempts += 1
-
-    if attempts < max_attempts:
-        filename = tmp_dir + '/' + zip_name
-        try:
-            open(filename, "wb").write(response.content)
         except EnvironmentError as e:
+            remove_part_file(part_filename)
             url_not_downloaded = base_url + '/' + relative_url
+            if manifest is not None:
+                manifest.update(relative_url, status='failed', bytes_received=0, save=True)
             print(f"{e}\nFailed to write {zip_name} to {tmp_dir}\n"
                   f"Please try to download it manually: {url_not_downloaded}")
+            emit_download_end(on_event, zip_name, 'failed', n_transferred, started, attempts, ('disk', None))
             return url_not_downloaded
-    else:
-        url_not_downloaded = base_url + '/' + relative_url
-        print(f"\nFailed to download {zip_name}\n"
-              f"Please try to download it manually: {url_not_downloaded}")
-        return url_not_downloaded
+
+    # the '.part' file is kept, so a later run can resume it
+    url_not_downloaded = base_url + '/' + relative_url
+    if manifest is not None:
+        manifest.update(relative_url, status='failed', save=True)
+    print(f"\nFailed to download {zip_name}\n"
+          f"Please try to download it manually: {url_not_downloaded}")
+    emit_download_end(on_event, zip_name, 'failed', n_transferred, started, attempts, failure)
+    return url_not_downloaded
+
+def _throttled(chunks, rate_limiter: TokenBucket):
+    """Pass the chunks through, holding each one back as long as the rate limiter requires (if any)."""
+    for chunk in chunks:
+        if rate_limiter is not None:
+            rate_limiter.consume(len(chunk))
+        yield chunk
+
+def remove_part_file(part_filename: str) -> None:
+    """Deletes a leftover '.part' file, if any.
+
+    Args:
+        part_filename (str): path for the partial download.
+    """
+    try:
+        os.remove(part_filename)
+    except FileNotFoundError:
+        pass
+
+def hash_part_file(part_filename: str, offset: int, checksum: tuple):
+    """Start hashing a download, feeding in the bytes already in the '.part' file when it is resumed.
+
+    Args:
+        part_filename (str): path for the partial download.
+        offset (int): how many bytes of the partial download are kept.
+        checksum (tuple): the hashlib algorithm and expected hex digest. None if there is nothing to check.
+
+    Returns:
+        file_hash (hashlib object): the running hash. None if checksum is None.
+    """
+    if checksum is None:
+        return None
+    file_hash = hashlib.new(checksum[0])
+    if offset > 0:
+        with open(part_filename, "rb") as part_file:
+            for block in iter(lambda: part_file.read(1024 * 1024), b""):
+                file_hash.update(block)
+    return file_hash
+
+def content_size(response: requests.Response, offset: int):
+    """Work out the full size of a sample from the response headers.
+
+    Args:
+        response (requests.Response): the (possibly partial) response.
+        offset (int): how many bytes were already on disk when the request was made.
+
+    Returns:
+        expected_size (int): the sample size in bytes. None if the server does not tell it.
+    """
+    if response.headers.get("Content-Encoding") not in (None, "identity"):
+        # the body is decoded on the fly, so its length on disk is unknown beforehand
+        return None
+    content_range = response.headers.get("Content-Range")
+    if content_range is not None and '/' in content_range:
+        total = content_range.rsplit('/', 1)[1]
+        if total.isdigit():
+            return int(total)
+    content_length = response.headers.get("Content-Length")
+    if content_length is not None and content_length.isdigit():
+        return offset + int(content_length)
+    return None
+
+def fetch_zip(remote_zip_info: dict,
+              tmp_dir: str = '.',
+              base_url: str = "https://www.digipathos-rep.cnptia.embrapa.br",
+              chunk_size: int = 1024 * 1024,
+              manifest: DownloadManifest = None,
+              session: requests.Session = None,
+              retry_policy: RetryPolicy = None,
+              cache: ZipCache = None,
+              rate_limiter: TokenBucket = None,
+              on_event=None):
+    """Get a sample into tmp_dir: from the cache when it holds it, otherwise through download_zip.
+    Fresh downloads are added to the cache.
+
+    Args:
+        remote_zip_info (dict): the sample metadata (an entry of the zips table).
+        tmp_dir (str, optional): where the zip file will be placed. Defaults to '.'.
+        base_url (str, optional): digipathos base url. Defaults to "https://www.digipathos-rep.cnptia.embrapa.br".
+        chunk_size (int, optional): how many bytes are written to disk at a time. Defaults to 1 MiB.
+        manifest (DownloadManifest, optional): where the download progress is recorded. Defaults to None.
+        session (requests.Session, optional): the session used for the requests. Defaults to None.
+        retry_policy (RetryPolicy, optional): how the download is retried. Defaults to RetryPolicy().
+        cache (ZipCache, optional): the local cache of samples. Defaults to None.
+        rate_limiter (TokenBucket, optional): the global bandwidth cap. Defaults to None (no cap).
+        on_event (callable, optional): receives the download events (see MetricsRecorder). Defaults to None.
+
+    Returns:
+        url_not_downloaded (str): the url of a failed download. If successful, returns None.
+    """
+    filename = tmp_dir + '/' + remote_zip_info["name"]
+    started = time.monotonic()
+    if cache is not None and cache.fetch(remote_zip_info["bsLink"], filename):
+        emit_download_end(on_event, remote_zip_info["name"], 'cached', 0, started, 0)
+        if manifest is not None:
+            n_bytes = os.path.getsize(filename)
+            manifest.update(remote_zip_info["bsLink"], name=remote_zip_info["name"], status='complete',
+                            bytes_received=n_bytes, expected_size=n_bytes, save=True)
+        return None
+    fail_download = download_zip(remote_zip_info["bsLink"],
+                                 remote_zip_info["name"],
+                                 tmp_dir,
+                                 base_url,
+                                 chunk_size,
+                                 manifest,
+                                 session,
+                                 retry_policy,
+                                 expected_checksum(remote_zip_info),
+                                 rate_limiter,
+                                 on_event)
+    if fail_download is None and cache is not None:
+        cache.store(remote_zip_info["bsLink"], filename, remote_zip_info.get("size"))
+    return fail_download
 
 def download_zips(zips_tbl: list, 
                   tmp_dir: str = '.',                                  
                   verbose: bool = True,
-                  base_url: str = "https://www.digipathos-rep.cnptia.embrapa.br"):
+                  base_url: str = "https://www.digipathos-rep.cnptia.embrapa.br",
+                  max_workers: int = 1,
+                  chunk_size: int = 1024 * 1024,
+                  manifest: DownloadManifest = None,
+                  session: requests.Session = None,
+                  retry_policy: RetryPolicy = None,
+                  cache: ZipCache = None,
+                  rate_limiter: TokenBucket = None,
+                  on_event=None,
+                  concurrency: AdaptiveConcurrency = None):
     
     """Iterates over the samples metadata and download them.
 
@@ -147,20 +494,287 @@ def download_zips(zips_tbl: list,
         tmp_dir (str, optional): the directory where your zipped files are (i.e., tmp folder). Defaults to '.'.
         verbose (bool): notify the user about the progress. Default to True
         base_url (str, optional): digipathos base url. Defaults to "https://www.digipathos-rep.cnptia.embrapa.br".
+        max_workers (int, optional): how many samples are downloaded at the same time. Since every sample
+            comes from the same host, this is also the per-host concurrency limit. Defaults to 1 (sequential).
+        chunk_size (int, optional): how many bytes are written to disk at a time. Defaults to 1 MiB.
+        manifest (DownloadManifest, optional): where the download progress is recorded. Samples it marks as
+            complete are skipped. Defaults to None.
+        session (requests.Session, optional): the session shared by all downloads. Defaults to None, in which
+            case a session with a connection pool of max_workers connections is used.
+        retry_policy (RetryPolicy, optional): how each download is retried. Defaults to RetryPolicy().
+        cache (ZipCache, optional): the local cache checked before each download (see fetch_zip). Defaults to None.
+        rate_limiter (TokenBucket, optional): the bandwidth cap shared by all downloads. Defaults to None (no cap).
+        on_event (callable, optional): receives the download events (see MetricsRecorder). Defaults to None.
+        concurrency (AdaptiveConcurrency, optional): tunes how many of the max_workers threads download at the
+            same time from what the downloads observe. Defaults to None (all of them).
     
     Returns:
         not_downloaded (list): the failed downloads' urls. None if successful.
     """              
+    if max_workers < 1:
+        raise ValueError('max_workers must be at least 1.')
+    if session is None:
+        with create_session(max_workers) as session:
+            return download_zips(zips_tbl, tmp_dir, verbose, base_url, max_workers, chunk_size,
+                                 manifest=manifest, session=session, retry_policy=retry_policy, cache=cache,
+                                 rate_limiter=rate_limiter, on_event=on_event, concurrency=concurrency)
     not_downloaded = []
-    for index, remote_zip_info in enumerate(zips_tbl):
-        if verbose:
-            print(f"Downloading ZIP-file {index+1}/{len(zips_tbl)}...")
-        fail_download = download_zip(remote_zip_info["bsLink"], 
-                                     remote_zip_info["name"],
-                                     tmp_dir,
-                                     base_url)
-        if fail_download != None:
-            not_downloaded.append(fail_download)
+    if manifest is not None:
+        pending = [entry for entry in zips_tbl if not manifest.is_complete(entry["bsLink"], tmp_dir)]
+        if verbose and len(pending) < len(zips_tbl):
+            print(f"Skipping {len(zips_tbl) - len(pending)} ZIP-files already downloaded...")
+        zips_tbl = pending
+    if concurrency is not None:
+        on_event = concurrency.observer(on_event)
+    if max_workers == 1:
+        for index, remote_zip_info in enumerate(zips_tbl):
+            if verbose:
+                print(f"Downloading ZIP-file {index+1}/{len(zips_tbl)}...")
+            fail_download = fetch_zip(remote_zip_info,
+                                      tmp_dir,
+                                      base_url,
+                                      chunk_size,
+                                      manifest,
+                                      session,
+                                      retry_policy,
+                                      cache,
+                                      rate_limiter,
+                                      on_event)
+            if fail_download != None:
+                not_downloaded.append(fail_download)
+    else:
+        def fetch(*args):
+            if concurrency is None:
+                return fetch_zip(*args)
+            with concurrency.slot():
+                return fetch_zip(*args)
+
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = [executor.submit(fetch,
+                                       remote_zip_info,
+                                       tmp_dir,
+                                       base_url,
+                                       chunk_size,
+                                       manifest,
+                                       session,
+                                       retry_policy,
+                                       cache,
+                                       rate_limiter,
+                                       on_event)
+                       for remote_zip_info in zips_tbl]
+            for index, _ in enumerate(as_completed(futures)):
+                if verbose:
+                    print(f"Downloaded ZIP-file {index+1}/{len(zips_tbl)}...")
+            # keep the failures in table order, as the sequential mode does
+            for future in futures:
+                fail_download = future.result()
+                if fail_download != None:
+                    not_downloaded.append(fail_download)
+    if len(not_downloaded) > 0:
+        return not_downloaded
+
+def download_and_extract_zip(relative_url: str,
+                              zip_name: str,
+                              data_dir: str,
+                              base_url: str = "https://www.digipathos-rep.cnptia.embrapa.br",
+                              chunk_size: int = 1024 * 1024,
+                              session: requests.Session = None,
+                              retry_policy: RetryPolicy = None,
+                              spool_threshold: int = 8 * 1024 * 1024,
+                              rate_limiter: TokenBucket = None,
+                              on_event=None):
+    """Tries to download a sample straight into its class folder, without writing the zip file anywhere.
+
+    Samples up to spool_threshold bytes are buffered in memory and then extracted. Bigger ones are extracted
+    member by member while the bytes stream in (see extract_stream). A failed attempt removes the class folder
+    and starts over. A sample that cannot be streamed (e.g., a stored member with a data descriptor) is
+    downloaded again to '<zip_name>.part' in data_dir and unpacked with zipfile, as in the phased mode.
+
+    Args:
+        relative_url (str): the sample url to be downloaded.
+        zip_name (str): the sample name.
+        data_dir (str): path for the folder where the files will be extracted to.
+        base_url (str, optional): digipathos base url. Defaults to "https://www.digipathos-rep.cnptia.embrapa.br".
+        chunk_size (int, optional): how many bytes are read from the network at a time. Defaults to 1 MiB.
+        session (requests.Session, optional): the session used for the requests. Defaults to None.
+        retry_policy (RetryPolicy, optional): how the download is retried. Defaults to RetryPolicy().
+        spool_threshold (int, optional): the largest sample, in bytes, buffered in memory. Defaults to 8 MiB.
+        rate_limiter (TokenBucket, optional): the global bandwidth cap. Defaults to None (no cap).
+        on_event (callable, optional): receives the download events (see MetricsRecorder). Defaults to None.
+
+    Returns:
+        url_not_downloaded (str): the url of a failed download or extraction. If successful, returns None.
+    """
+    http = session if session is not None else requests
+    if retry_policy is None:
+        retry_policy = RetryPolicy()
+    class_dir = data_dir + "/" + zip_name[:-4]
+    url_not_downloaded = base_url + '/' + relative_url
+    emit(on_event, 'download_start', name=zip_name, url=relative_url)
+    started = time.monotonic()
+    n_transferred = 0
+    attempts = 0
+    failed_response = None
+    failure = None
+    while attempts < retry_policy.max_attempts:
+        if attempts > 0:
+            emit_download_retry(on_event, zip_name, attempts, failure)
+            retry_policy.wait(attempts, failed_response)
+            failed_response = None
+        try:
+            with http.get(base_url + relative_url, stream=True, timeout=retry_policy.timeout) as response:
+                if not response.ok:
+                    failure = ('http', response.status_code)
+                    if response.status_code not in retry_policy.retry_statuses:
+                        break
+                    print(f"Error while downloading {zip_name}.\nRetrying...")
+                    failed_response = response
+                    attempts += 1
+                    continue
+                if os.path.isdir(class_dir):
+                    shutil.rmtree(class_dir)
+                create_dir(class_dir)
+                size = content_size(response, 0)
+
+                def counted(chunks):
+                    nonlocal n_transferred
+                    for chunk in chunks:
+                        n_transferred += len(chunk)
+                        emit(on_event, 'download_progress', name=zip_name, bytes=len(chunk))
+                        yield chunk
+
+                chunks = counted(_throttled(response.iter_content(chunk_size=chunk_size), rate_limiter))
+                if size is not None and size <= spool_threshold:
+                    buffer = io.BytesIO()
+                    for chunk in chunks:
+                        buffer.write(chunk)
+                    with zipfile.ZipFile(buffer, mode="r") as zip_contents:
+                        zip_contents.extractall(class_dir)
+                else:
+                    extract_stream(chunks, class_dir)
+            emit_download_end(on_event, zip_name, 'complete', n_transferred, started, attempts)
+            return None
+        except UnstreamableZipError as e:
+            print(f"{e}\nDownloading {zip_name} to a file instead...")
+            shutil.rmtree(class_dir, ignore_errors=True)
+            return _download_and_unpack(relative_url, zip_name, data_dir, base_url, chunk_size, session,
+                                        retry_policy, rate_limiter, on_event, started, attempts, n_transferred)
+        except requests.exceptions.RequestException:
+            print(f"Error while downloading {zip_name}.\nRetrying...")
+            shutil.rmtree(class_dir, ignore_errors=True)
+            failure = ('network', None)
+            attempts += 1
+        except (zipfile.BadZipFile, NotImplementedError, OSError) as e:
+            shutil.rmtree(class_dir, ignore_errors=True)
+            print(f"{e}\nFailed to extract {zip_name} to {data_dir}\n"
+                  f"Please try to download it manually: {url_not_downloaded}")
+            emit_download_end(on_event, zip_name, 'failed', n_transferred, started, attempts, ('extract', None))
+            return url_not_downloaded
+
+    print(f"\nFailed to download {zip_name}\n"
+          f"Please try to download it manually: {url_not_downloaded}")
+    emit_download_end(on_event, zip_name, 'failed', n_transferred, started, attempts, failure)
+    return url_not_downloaded
+
+def _download_and_unpack(relative_url: str,
+                         zip_name: str,
+                         data_dir: str,
+                         base_url: str,
+                         chunk_size: int,
+                         session: requests.Session,
+                         retry_policy: RetryPolicy,
+                         rate_limiter: TokenBucket,
+                         on_event,
+                         started: float,
+                         attempts: int,
+                         n_transferred: int):
+    """Download a sample to data_dir with download_zip, unpack it with unpack_zip and remove the zip file.
+
+    The fallback of download_and_extract_zip for the samples extract_stream cannot handle. Only the progress
+    events of download_zip are forwarded, so the sample still has one 'download_start' and one 'download_end'.
+
+    Args:
+        started (float): when download_and_extract_zip began, from time.monotonic().
+        attempts (int): the attempts download_and_extract_zip already made.
+        n_transferred (int): the bytes download_and_extract_zip already received.
+        (the other arguments are those of download_and_extract_zip)
+
+    Returns:
+        url_not_downloaded (str): the url of a failed download or extraction. If successful, returns None.
+    """
+    def forward_progress(event: dict) -> None:
+        nonlocal n_transferred
+        if event['event'] == 'download_progress':
+            n_transferred += event['bytes']
+            emit(on_event, 'download_progress', name=zip_name, bytes=event['bytes'])
+
+    url_not_downloaded = download_zip(relative_url, zip_name, data_dir, base_url, chunk_size, session=session,
+                                      retry_policy=retry_policy, rate_limiter=rate_limiter, on_event=forward_progress)
+    if url_not_downloaded is not None:
+        remove_part_file(data_dir + '/' + zip_name + '.part')
+        emit_download_end(on_event, zip_name, 'failed', n_transferred, started, attempts, ('network', None))
+        return url_not_downloaded
+    try:
+        failed_unzip = unpack_zip(zip_name, data_dir, data_dir, overwrite=True)
+    finally:
+        remove_part_file(data_dir + '/' + zip_name)
+    if failed_unzip is not None:
+        shutil.rmtree(data_dir + "/" + zip_name[:-4], ignore_errors=True)
+        url_not_downloaded = base_url + '/' + relative_url
+        print(f"Please try to download {zip_name} manually: {url_not_downloaded}")
+        emit_download_end(on_event, zip_name, 'failed', n_transferred, started, attempts, ('extract', None))
+        return url_not_downloaded
+    emit_download_end(on_event, zip_name, 'complete', n_transferred, started, attempts)
+    return None
+
+def download_and_extract_zips(zips_tbl: list,
+                              data_dir: str,
+                              verbose: bool = True,
+                              base_url: str = "https://www.digipathos-rep.cnptia.embrapa.br",
+                              max_workers: int = 1,
+                              chunk_size: int = 1024 * 1024,
+                              session: requests.Session = None,
+                              retry_policy: RetryPolicy = None,
+                              spool_threshold: int = 8 * 1024 * 1024,
+                              rate_limiter: TokenBucket = None,
+                              on_event=None):
+    """Iterates over the samples metadata and extracts them straight into data_dir (see download_and_extract_zip).
+
+    Args:
+        zips_tbl (list): the samples metadata (i.e., generated by fetch_zips_table).
+        data_dir (str): path for the folder where the files will be extracted to.
+        verbose (bool, optional): notify the user about the progress. Defaults to True.
+        base_url (str, optional): digipathos base url. Defaults to "https://www.digipathos-rep.cnptia.embrapa.br".
+        max_workers (int, optional): how many samples are downloaded at the same time. Defaults to 1.
+        chunk_size (int, optional): how many bytes are read from the network at a time. Defaults to 1 MiB.
+        session (requests.Session, optional): the session shared by all downloads. Defaults to None.
+        retry_policy (RetryPolicy, optional): how each download is retried. Defaults to RetryPolicy().
+        spool_threshold (int, optional): the largest sample, in bytes, buffered in memory. Defaults to 8 MiB.
+        rate_limiter (TokenBucket, optional): the global bandwidth cap. Defaults to None (no cap).
+        on_event (callable, optional): receives the download events (see MetricsRecorder). Defaults to None.
+
+    Returns:
+        not_downloaded (list): the failed samples' urls. None if successful.
+    """
+    if max_workers < 1:
+        raise ValueError('max_workers must be at least 1.')
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = [executor.submit(download_and_extract_zip,
+                                   remote_zip_info["bsLink"],
+                                   remote_zip_info["name"],
+                                   data_dir,
+                                   base_url,
+                                   chunk_size,
+                                   session,
+                                   retry_policy,
+                                   spool_threshold,
+                                   rate_limiter,
+                                   on_event)
+                   for remote_zip_info in zips_tbl]
+        for index, _ in enumerate(as_completed(futures)):
+            if verbose:
+                print(f"Extracted ZIP-file {index+1}/{len(zips_tbl)}...")
+        not_downloaded = [future.result() for future in futures if future.result() != None]
     if len(not_downloaded) > 0:
         return not_downloaded
 
@@ -183,35 +797,97 @@ def validate_downloads(n_zips: int,
     zero_size_files = []                  
     if verbose:
         print("Validating downloads...")
-    n_zips_in_tmp = len([name for name in os.listdir(tmp_dir)])
+    zip_files = list_zips(tmp_dir)
+    n_zips_in_tmp = len(zip_files)
     if n_zips_in_tmp != n_zips:
         print(f"WARNING: Number of ZIP-files in {tmp_dir} is not the same as retrieved from the EMPRABA website.\n"
               f"Expected number of ZIP-files: {n_zips}. ZIP-files found in directory: {n_zips_in_tmp}.")
-    for filename in os.listdir(tmp_dir):
+    for filename in zip_files:
         if os.path.getsize(tmp_dir + filename) == 0:
             zero_size_files.append(tmp_dir + filename)
             print(f"WARNING: ZIP-file {filename} has a size of 0 bytes.")
     return n_zips_in_tmp, zero_size_files
 
+def verify_downloads(zips_tbl: list,
+                     tmp_dir: str,
+                     verbose: bool = True,
+                     manifest: DownloadManifest = None) -> list:
+    """Verify the integrity of the downloaded samples (see verify_zip): size against the zips table and
+    CRC-32 of every member. Checksums are left out, since download_zip checks them while streaming.
+    Corrupt files are deleted, and reset in the manifest, so they can be downloaded again.
+
+    Args:
+        zips_tbl (list): the samples metadata (i.e., generated by fetch_zips_table).
+        tmp_dir (str): the directory where your zipped files are (i.e., tmp folder).
+        verbose (bool, optional): notify the user about the progress. Defaults to True.
+        manifest (DownloadManifest, optional): where the download progress is recorded. Defaults to None.
+
+    Returns:
+        corrupt (list): the metadata of the corrupt samples. Samples that were not downloaded are left out.
+    """
+    if verbose:
+        print("Verifying downloads...")
+    corrupt = []
+    for remote_zip_info in zips_tbl:
+        filename = tmp_dir + '/' + remote_zip_info["name"]
+        if not os.path.exists(filename):
+            continue
+        problem = verify_zip(filename, remote_zip_info.get("size"))
+        if problem is not None:
+            print(f"WARNING: ZIP-file {remote_zip_info['name']} is corrupt: {problem}.")
+            os.remove(filename)
+            if manifest is not None:
+                manifest.update(remote_zip_info["bsLink"], status='pending', bytes_received=0, save=True)
+            corrupt.append(remote_zip_info)
+    return corrupt
+
+def list_zips(dir: str) -> list:
+    """List the ZIP-files in a directory, leaving out partial downloads and the download manifest.
+
+    Args:
+        dir (str): the directory where your zipped files are (i.e., tmp folder).
+
+    Returns:
+        zip_files (list): the sorted names of the ZIP-files.
+    """
+    return sorted(name for name in os.listdir(dir) if name.lower().endswith('.zip'))
+
 def unpack_zip(filename: str,
                data_dir: str,
-               tmp_dir: str):
+               tmp_dir: str,
+               overwrite: bool = False,
+               transform=None,
+               member_workers: int = 1):
     """Extracts a file to a given folder.
 
     Args:
         filename (str): name of the zip file to be extracted.
         data_dir (str): path for the folder where the files will be extracted to.
         tmp_dir (str): path for zip file origin.
+        overwrite (bool, optional): replace the class folder if it already exists (e.g., left by an interrupted run). Defaults to False.
+        transform (callable, optional): applied to every member on its way out of the archive, e.g. a
+            ResizeTransform (see extract_transformed). Defaults to None (members are extracted as they are).
+        member_workers (int, optional): how many threads share the members of the archive (see extract_zip_members).
+            Extraction is then incremental: an existing class folder is completed rather than refused, unless
+            overwrite is set. Defaults to 1 (a single extractall call).
 
     Returns:
         file_to_be_extracted (str): path for the file whose extraction failed. Not returned if extraction is succesful.
     """
     class_dir = data_dir + "/" + filename[:-4] # DATA_DIR = "/plant-disease-db"
     try:
-        create_dir(class_dir)
+        if overwrite and os.path.isdir(class_dir):
+            shutil.rmtree(class_dir)
+        create_dir(class_dir, exist_ok=member_workers > 1)
         file_to_be_extracted = tmp_dir + '/' + filename
+        if member_workers > 1:
+            extract_zip_members(file_to_be_extracted, class_dir, member_workers, transform)
+            return
         with zipfile.ZipFile(file_to_be_extracted, mode="r") as zip_contents: # TMP_DIR = "/plant-disease-db/tmp"
-            zip_contents.extractall(class_dir)
+            if transform is None:
+                zip_contents.extractall(class_dir)
+            else:
+                extract_transformed(zip_contents, class_dir, transform)
     except IOError as e:
         print(f"{e}\nSkipping unpacking of {filename}")
         return filename
@@ -219,32 +895,205 @@ def unpack_zip(filename: str,
         print(f"The following error occured:{e}")
         return filename
 
+def extract_zip_members(zip_path: str,
+                        dest_dir: str,
+                        max_workers: int = 4,
+                        transform=None) -> list:
+    """Extracts the members of a single archive with several threads, so that one big archive keeps several cores busy.
+
+    The central directory is read once, and the members, in file order, form a queue shared by the threads. Each
+    thread reads through its own ZipFile handle (decompression releases the GIL) and writes every member to a
+    temporary file renamed into place once complete, so an interrupted extraction never leaves a truncated member.
+    Members already extracted with their expected size are skipped, which makes re-extraction incremental. With a
+    transform, every member is transformed again.
+
+    Args:
+        zip_path (str): path for the zip file.
+        dest_dir (str): the folder the members are extracted to (e.g., the class folder).
+        max_workers (int, optional): how many threads extract members. Defaults to 4.
+        transform (callable, optional): applied to every member (see extract_transformed). Defaults to None.
+
+    Raises:
+        BadZipFile: raised when a member fails its CRC check.
+        ValueError: raised when two members are transformed into the same file (see claim_output_path).
+
+    Returns:
+        names (list): the paths written. Members already extracted are left out.
+    """
+    with zipfile.ZipFile(zip_path, mode="r") as zip_contents:
+        members = sorted(zip_contents.infolist(), key=lambda member: member.header_offset)
+    pending = queue.SimpleQueue()
+    for member in members:
+        if member.is_dir():
+            os.makedirs(safe_path(dest_dir, member.filename), exist_ok=True)
+        else:
+            pending.put(member)
+    n_workers = max(1, min(max_workers, pending.qsize()))
+    sources = {}
+
+    def work() -> list:
+        written = []
+        with zipfile.ZipFile(zip_path, mode="r") as handle:
+            while True:
+                try:
+                    member = pending.get_nowait()
+                except queue.Empty:
+                    return written
+                path = safe_path(dest_dir, member.filename)
+                if transform is None and os.path.isfile(path) and os.path.getsize(path) == member.file_size:
+                    continue
+                if transform is not None:
+                    transformed = transform(member.filename, handle.read(member))
+                    if transformed is None:
+                        continue
+                    path = safe_path(dest_dir, transformed[0])
+                    claim_output_path(sources, path, member.filename)
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                tmp_path = f"{path}.{threading.get_ident()}.part"
+                try:
+                    with open(tmp_path, "wb") as output_file:
+                        if transform is None:
+                            with handle.open(member) as member_file:
+                                shutil.copyfileobj(member_file, output_file, 1024 * 1024)
+                        else:
+                            output_file.write(transformed[1])
+                    os.replace(tmp_path, path)
+                except BaseException:
+                    if os.path.exists(tmp_path):
+                        os.remove(tmp_path)
+                    raise
+                written.append(path)
+
+    with ThreadPoolExecutor(max_workers=n_workers) as executor:
+        futures = [executor.submit(work) for _ in range(n_workers)]
+        return [path for future in futures for path in future.result()]
+
 def unpack_zips(folder: str,
                 target_folder: str,
-                verbose: bool = True):
+                verbose: bool = True,
+                overwrite: bool = False,
+                max_workers: int = 1,
+                transform=None,
+                member_workers: int = 1):
     """Extracts all files inside a given folder.
 
     Args:
         folder (str): the folder where the zip files are.
         target_folder (str): the folder to unzip the files to.
         verbose (bool, optional): notify the user about the progress. Defaults to True.
+        overwrite (bool, optional): replace class folders that already exist. Defaults to False.
+        max_workers (int, optional): how many archives are extracted at the same time, each in its own process.
+            Archives that would unpack into the same class folder are always handled by the same process.
+            Defaults to 1 (sequential, in the calling process).
+        transform (callable, optional): applied to every member while it is extracted (see unpack_zip). It must
+            be picklable when max_workers > 1, and it then runs in the worker processes. Defaults to None.
+        member_workers (int, optional): how many threads share the members of each archive (see unpack_zip).
+            Defaults to 1.
 
     Returns:
         failed_unzips_list (list): a list of paths for the files whose unzipping failed. Return None if successful.
     """            
-
+    if max_workers < 1:
+        raise ValueError('max_workers must be at least 1.')
     failed_unzips_list = []            
     if verbose:
         print("Unpacking ZIP-files...")
-    for zip_file in os.listdir(folder):
-        returned_path = unpack_zip(zip_file,
-                                   target_folder,
-                                   folder)
-        if returned_path != None:
-            failed_unzips_list.append(returned_path)
+    zip_files = list_zips(folder)
+    if max_workers == 1:
+        for zip_file in zip_files:
+            returned_path = unpack_zip(zip_file,
+                                       target_folder,
+                                       folder,
+                                       overwrite,
+                                       transform,
+                                       member_workers)
+            if returned_path != None:
+                failed_unzips_list.append(returned_path)
+    else:
+        groups = {}
+        for zip_file in zip_files:
+            groups.setdefault(zip_file[:-4], []).append(zip_file)
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            futures = [executor.submit(_unpack_group, group, target_folder, folder, overwrite, transform,
+                                       member_workers)
+                       for group in groups.values()]
+            failed = set()
+            for future in futures:
+                failed.update(future.result())
+        failed_unzips_list = [zip_file for zip_file in zip_files if zip_file in failed]
     if len(failed_unzips_list) > 0:
         return failed_unzips_list
 
+def _unpack_group(filenames: list,
+                  data_dir: str,
+                  tmp_dir: str,
+                  overwrite: bool,
+                  transform=None,
+                  member_workers: int = 1) -> list:
+    """Extracts, one after the other, archives that share a class folder. Runs inside a worker process.
+
+    Args:
+        filenames (list): names of the zip files to be extracted.
+        data_dir (str): path for the folder where the files will be extracted to.
+        tmp_dir (str): path for zip file origin.
+        overwrite (bool): replace the class folder if it already exists.
+        transform (callable, optional): applied to every member while it is extracted. Defaults to None.
+        member_workers (int, optional): how many threads share the members of each archive. Defaults to 1.
+
+    Returns:
+        failed (list): the names of the files whose extraction failed.
+    """
+    failed = []
+    for filename in filenames:
+        returned_path = unpack_zip(filename, data_dir, tmp_dir, overwrite, transform, member_workers)
+        if returned_path != None:
+            failed.append(returned_path)
+    return failed
+
+
+def move_zips(folder: str, target_folder: str, verbose: bool = True) -> None:
+    """Moves all zip files inside a given folder to another one, replacing those already there.
+
+    Args:
+        folder (str): the folder where the zip files are.
+        target_folder (str): the folder to move the files to.
+        verbose (bool, optional): notify the user about the progress. Defaults to True.
+    """
+    if verbose:
+        print("Moving ZIP-files...")
+    for zip_file in list_zips(folder):
+        os.replace(folder + '/' + zip_file, target_folder + '/' + zip_file)
+
+def pack_shards(folder: str,
+                target_folder: str,
+                verbose: bool = True,
+                shard_size: int = 256 * 1024 * 1024):
+    """Packs the images of all zip files inside a given folder into tar shards (see write_shards).
+
+    Args:
+        folder (str): the folder where the zip files are.
+        target_folder (str): the folder for the shards and their manifest.
+        verbose (bool, optional): notify the user about the progress. Defaults to True.
+        shard_size (int, optional): the size of each shard, in bytes. Defaults to 256 MiB.
+
+    Returns:
+        failed_unzips_list (list): the zip files that could not be read, and were left out. Return None if successful.
+    """
+    if verbose:
+        print("Packing ZIP-files into shards...")
+    readable = []
+    failed_unzips_list = []
+    for zip_file in list_zips(folder):
+        try:
+            with zipfile.ZipFile(folder + '/' + zip_file, mode="r"):
+                readable.append(folder + '/' + zip_file)
+        except (zipfile.BadZipFile, OSError) as e:
+            print(f"{e}\nSkipping packing of {zip_file}")
+            failed_unzips_list.append(zip_file)
+    with ZipDataset(readable) as dataset:
+        write_shards(dataset, target_folder, shard_size, verbose=verbose)
+    if len(failed_unzips_list) > 0:
+        return failed_unzips_list
 
 def remove_tmp_dir(dir: str):
     """delete a temporary dir.
@@ -259,9 +1108,113 @@ def get_dataset(data_dir: str,
                 name_filter:str = "cropped", 
                 verbose: bool = True,
                 base_url: str = "https://www.digipathos-rep.cnptia.embrapa.br",
-                list_url: str = "/jspui/zipsincollection/12345678"):
+                list_url: str = "/jspui/zipsincollection/12345678",
+                max_workers: int = 1,
+                chunk_size: int = 1024 * 1024,
+                resume: bool = False,
+                sync: bool = False,
+                prune: bool = False,
+                catalog_path: str = None,
+                session: requests.Session = None,
+                retry_policy: RetryPolicy = None,
+                pipelined: bool = False,
+                extract_workers: int = 1,
+                direct: bool = False,
+                spool_threshold: int = 8 * 1024 * 1024,
+                verify_rounds: int = 2,
+                cache_dir: str = None,
+                cache_max_size: int = None,
+                query: dict = None,
+                schedule: str = 'largest',
+                rate_limit: float = None,
+                byte_budget: int = None,
+                metrics_path: str = None,
+                on_event=None,
+                output_format: str = 'folders',
+                shard_size: int = 256 * 1024 * 1024,
+                write_index: bool = False,
+                transform=None,
+                dedup: bool = False,
+                num_shards: int = 1,
+                shard_index: int = 0,
+                member_workers: int = 1,
+                adaptive: bool = False,
+                trust_crc: bool = False):
     """Get digipathos dataset.
 
+    The download progress is kept in a manifest inside tmp_dir. If a run is interrupted, calling
+    get_dataset again with resume=True reuses the existing directories, skips the samples already
+    downloaded and continues the partial ones.
+
+    Every run records the installed samples in a local catalog. With sync=True, only the samples that
+    are new or changed since the catalog was written are downloaded and extracted (see diff_zips_tables).
+
+    By default the samples are all downloaded, then all validated, then all extracted. With pipelined=True,
+    each sample is validated, extracted and deleted as soon as its download finishes (see run_pipeline),
+    which overlaps network and disk work and keeps only a few archives in tmp_dir at a time.
+    In that mode info['validation']['n_zips_in_tmp'] counts the archives that passed validation.
+
+    With direct=True, tmp_dir is neither created nor used: every sample is extracted into data_dir while it
+    downloads (see download_and_extract_zip). Extraction failures are reported in info['not_downloaded'] and
+    info['validation']['n_zips_in_tmp'] counts the samples extracted.
+
+    Downloaded samples are verified (see verify_downloads) before extraction, and corrupt ones are downloaded
+    again up to verify_rounds times. Those still corrupt are listed in info['validation']['corrupt_files'].
+    In direct mode, the streaming extraction checks the CRC of every member instead.
+
+    Given a cache_dir, samples are looked up in a ZipCache shared by every dataset directory that uses it,
+    so each archive is downloaded only once per machine. The direct mode does not use the cache for samples.
+    The zips table is cached there too (see fetch_zips_table).
+
+    A query narrows the samples down by crop, disease, variant, part or size budget. It holds the keyword
+    arguments of query_metadata_catalog, e.g. {'crop': 'Abacaxi (Pineapple)', 'max_bytes': 10 ** 9}, and is
+    applied after name_filter. The parsed catalog is kept in '<cache_dir>/metadata.sqlite' if there is a cache_dir.
+
+    The samples are downloaded in schedule order (see order_zips_table), largest first by default, at no more
+    than rate_limit bytes per second overall. Given a byte_budget, only the samples that fit in it are downloaded
+    (see apply_byte_budget); the others are listed in info['deferred'] and left out of the local catalog, so a
+    later run with sync=True picks them up.
+
+    Every run is instrumented (see MetricsRecorder): the bytes, time, throughput and retries of each sample and
+    the time spent per phase are summed up in info['metrics']. The events are also appended to the JSON-lines
+    file metrics_path, if given, and sent to the on_event callback as they happen.
+
+    With output_format='zips', the verified archives are moved into data_dir instead of being extracted, to be
+    read in place with ZipDataset. With output_format='shards', the images are packed from the archives into
+    tar shards of about shard_size bytes in data_dir, with a 'shards.json' manifest (see write_shards). Both
+    need the phased mode (neither pipelined nor direct). Shards are written once, so they cannot be synced.
+
+    With write_index=True, a memory-mappable index of the extracted images (class ids, sizes, dimensions) is
+    written to '<data_dir>.index' and its path returned in info['index_path'] (see ImageIndex).
+
+    A transform (e.g., ResizeTransform(224)) preprocesses every image while it is extracted, in the extraction
+    workers, so the images are written once, already in their final form. It needs the 'folders' output format
+    and is not available in direct mode.
+
+    With dedup=True, identical images are hardlinked together once extracted, so that each is stored once (see
+    dedup_files). Images are identical when their sha256 match. With trust_crc=True as well, the central directory
+    of every remote archive is read first (with Range requests) and the archives whose images are all already in
+    data_dir, or in another archive of the run (e.g., a '- 2.zip' part repeating a '- 1.zip'), are not downloaded:
+    their class folders are built out of hardlinks instead. Those are listed in info['dedup']['linked']. A central
+    directory only gives the CRC-32 and size of each member, so a CRC-32 collision would silently install the
+    wrong image. That is why trust_crc is opt-in.
+
+    Several nodes can split a download with num_shards and shard_index: each one takes its part of the samples
+    (see partition_zips_table), computed from the zips table alone, so the nodes never talk to each other. Most
+    samples keep their node when the table changes between runs. The nodes may share data_dir, but each needs its
+    own tmp_dir, and writes its own catalog (see shard_catalog_path). Once every node is done, merge_shard_catalogs
+    combines those into the catalog of data_dir. The 'shards' output format, write_index and dedup work on the
+    whole data_dir, so they are not available to a node.
+
+    With member_workers > 1, the members of each archive are extracted by that many threads (see
+    extract_zip_members), so that a single big archive does not leave the other cores idle. Extraction is then
+    incremental: a resumed run completes the class folders left by the interrupted one instead of replacing them.
+    It applies to the phased and pipelined modes.
+
+    With adaptive=True, max_workers is an upper bound: the number of downloads in flight starts low and is tuned
+    from the observed throughput, latency and failures (see AdaptiveConcurrency). The decisions are recorded as
+    'concurrency' events and listed in info['metrics']['concurrency']. It needs the phased mode.
+
     Args:
         data_dir (str): the name of the  directory where the images will be downloaded to. 
         tmp_dir (str): the name of the directory where temporary files are kept. Cannot be equal to dataset_dir.
@@ -269,45 +1222,314 @@ def get_dataset(data_dir: str,
         verbose (bool, optional): notify the user about the progress. Default to True base_url (str): digipathos base url. Defaults to True.
         base_url (str, optional): base_url (str): digipathos base url. Defaults to "https://www.digipathos-rep.cnptia.embrapa.br".
         list_url (str, optional): digipathos list url. Defaults to "/jspui/zipsincollection/123456789/3".
+        max_workers (int, optional): how many samples are downloaded at the same time. Defaults to 1.
+        chunk_size (int, optional): how many bytes of a sample are written to disk at a time. Defaults to 1 MiB.
+        resume (bool, optional): continue an interrupted run instead of starting from scratch. Defaults to False.
+        sync (bool, optional): update an existing dataset directory with the upstream changes only. Defaults to False.
+        prune (bool, optional): when syncing, delete the class folders of samples removed upstream. Defaults to False.
+        catalog_path (str, optional): path for the local catalog. Defaults to '<data_dir>.catalog.json'.
+        session (requests.Session, optional): the session used for every request (see create_session). Defaults to
+            None, in which case a session with a connection pool of max_workers connections is used.
+        retry_policy (RetryPolicy, optional): how failed requests are retried. Defaults to RetryPolicy().
+        pipelined (bool, optional): extract each sample as soon as it is downloaded. Defaults to False.
+        extract_workers (int, optional): how many archives are extracted at the same time: by worker processes
+            in the phased mode, by worker threads in pipelined mode. Defaults to 1.
+        direct (bool, optional): extract the samples while they download, skipping tmp_dir. Defaults to False.
+        spool_threshold (int, optional): in direct mode, the largest sample, in bytes, buffered in memory
+            before extraction. Bigger samples are extracted from the stream. Defaults to 8 MiB.
+        verify_rounds (int, optional): how many times corrupt samples are downloaded again. Defaults to 2.
+        cache_dir (str, optional): the directory of the local sample cache. Defaults to None (no cache).
+        cache_max_size (int, optional): the largest size of the cache, in bytes. Defaults to None (unbounded).
+        query (dict, optional): which samples to keep (see query_metadata_catalog). Defaults to None (all of them).
+        schedule (str, optional): the download order: 'largest' first, 'smallest' first or 'table'. Defaults to 'largest'.
+        rate_limit (float, optional): the bandwidth cap shared by all downloads, in bytes per second. Defaults to
+            None (no cap).
+        byte_budget (int, optional): how many bytes this run may download. Defaults to None (no budget).
+        metrics_path (str, optional): a JSON-lines file for the download events. Defaults to None (no file).
+        on_event (callable, optional): receives every download event as a dict. Defaults to None.
+        output_format (str, optional): 'folders' for a folder of images per class, 'zips' to keep the
+            archives or 'shards' for tar shards. Defaults to 'folders'.
+        shard_size (int, optional): with output_format='shards', the size of each shard, in bytes. Defaults to 256 MiB.
+        write_index (bool, optional): index the extracted images (see build_image_index). Only for the 'folders'
+            output format. Defaults to False.
+        transform (callable, optional): applied to every image during extraction (see unpack_zip). Defaults to None.
+        dedup (bool, optional): skip the archives already present and store identical images once. Only for the
+            'folders' output format, without a transform. Defaults to False.
+        num_shards (int, optional): how many nodes split the download. Defaults to 1.
+        shard_index (int, optional): which part of the samples this node downloads, from 0 to num_shards - 1.
+            Defaults to 0.
+        member_workers (int, optional): how many threads extract the members of each archive. Defaults to 1.
+        adaptive (bool, optional): tune the number of downloads in flight, up to max_workers. Defaults to False.
+        trust_crc (bool, optional): with dedup, link the archives whose members match images at hand by CRC-32
+            and size instead of downloading them. Defaults to False.
+
+    Raises:
+        ValueError: for an unknown output_format, or one the chosen mode cannot produce, or an invalid shard_index.
 
     Returns:
         info (dict): information regarding the download process.
     """
-    create_basic_folder_structure(data_dir, 
-                                  tmp_dir, 
-                                  verbose)
-    zips_table = fetch_zips_table(name_filter=name_filter, 
-                                  verbose=verbose,
-                                  base_url=base_url,
-                                  list_url=list_url)
-    not_downloaded = download_zips(zips_table,
-                                   tmp_dir,
-                                   verbose,
-                                   base_url)
-    n_zips_in_tmp, zero_size_files = validate_downloads(len(zips_table), 
-                                                        tmp_dir,
-                                                        verbose)
-    failed_unzips_list = unpack_zips(tmp_dir,
-                                     data_dir,
-                                     verbose)
-    remove_tmp_dir(tmp_dir)    
+    if output_format not in OUTPUT_FORMATS:
+        raise ValueError(f"output_format must be one of {OUTPUT_FORMATS}, not {output_format!r}.")
+    if output_format != 'folders' and (pipelined or direct):
+        raise ValueError(f"output_format={output_format!r} needs the phased mode (pipelined=False, direct=False).")
+    if transform is not None and (direct or output_format != 'folders'):
+        raise ValueError("transform needs output_format='folders' and is not available in direct mode.")
+    if dedup and (output_format != 'folders' or transform is not None):
+        raise ValueError("dedup needs output_format='folders' and no transform.")
+    if trust_crc and not dedup:
+        raise ValueError("trust_crc needs dedup=True.")
+    if write_index and output_format != 'folders':
+        raise ValueError("write_index needs output_format='folders'.")
+    if output_format == 'shards' and sync:
+        raise ValueError("output_format='shards' cannot be synced; download the dataset again instead.")
+    if not 0 <= shard_index < num_shards:
+        raise ValueError('shard_index must be in [0, num_shards).')
+    if adaptive and (pipelined or direct):
+        raise ValueError("adaptive needs the phased mode (pipelined=False, direct=False).")
+    if num_shards > 1 and (output_format == 'shards' or write_index or dedup):
+        raise ValueError("output_format='shards', write_index and dedup are not available with num_shards > 1.")
+    cache = ZipCache(cache_dir, cache_max_size) if cache_dir is not None else None
+    rate_limiter = TokenBucket(rate_limit) if rate_limit is not None else None
+    recorder = MetricsRecorder(metrics_path, on_event)
+    concurrency = AdaptiveConcurrency(max_workers, on_event=recorder) if adaptive else None
+    owns_session = session is None
+    if owns_session:
+        session = create_session(max_workers)
+    try:
+        if direct:
+            if verbose:
+                print("Setting up basic folder structure...")
+            create_dir(data_dir, exist_ok=resume or sync or num_shards > 1)
+        else:
+            create_basic_folder_structure(data_dir, 
+                                          tmp_dir, 
+                                          verbose,
+                                          exist_ok=resume or sync or num_shards > 1)
+        with recorder.phase('fetch_table'):
+            zips_table = fetch_zips_table(name_filter=name_filter, 
+                                          verbose=verbose,
+                                          base_url=base_url,
+                                          list_url=list_url,
+                                          session=session,
+                                          retry_policy=retry_policy,
+                                          cache_dir=cache_dir)
+            if query is not None:
+                metadata_path = os.path.join(cache_dir, 'metadata.sqlite') if cache_dir is not None else ":memory:"
+                with closing(build_metadata_catalog(zips_table, metadata_path)) as connection:
+                    zips_table = query_metadata_catalog(connection, **query)
+                if verbose:
+                    print(f"{len(zips_table)} ZIP-files match the query...")
+        full_table = zips_table
+        if num_shards > 1:
+            zips_table = partition_zips_table(zips_table, num_shards, shard_index)
+            if verbose:
+                print(f"Shard {shard_index} of {num_shards} holds {len(zips_table)} ZIP-files...")
+        if catalog_path is None:
+            catalog_path = default_catalog_path(data_dir) if num_shards == 1 else \
+                shard_catalog_path(data_dir, shard_index, num_shards)
+        catalog = load_local_catalog(catalog_path) if resume or sync else {}
+        if sync:
+            to_download, removed = diff_zips_tables(zips_table, catalog)
+            # samples dealt to another node since the last run are still upstream: forget them, do not prune them
+            remote_names = {entry["name"] for entry in full_table}
+            for entry in [entry for entry in removed if entry["name"] in remote_names]:
+                removed.remove(entry)
+                catalog.pop(entry["bsLink"])
+            if verbose:
+                print(f"{len(to_download)} ZIP-files are new or changed, {len(removed)} were removed upstream...")
+        else:
+            to_download, removed = zips_table, []
+        changed = to_download
+        to_download, deferred = apply_byte_budget(order_zips_table(to_download, schedule), byte_budget)
+        if verbose and len(deferred) > 0:
+            print(f"{len(deferred)} ZIP-files do not fit in the byte budget and are left for a later run...")
+        linked = []
+        if trust_crc:
+            with recorder.phase('dedup'):
+                to_download, linked = skip_present_zips(to_download,
+                                                        data_dir,
+                                                        base_url,
+                                                        session,
+                                                        retry_policy,
+                                                        verbose,
+                                                        max_workers)
+        if direct:
+            with recorder.phase('download'):
+                not_downloaded = download_and_extract_zips(to_download,
+                                                           data_dir,
+                                                           verbose,
+                                                           base_url,
+                                                           max_workers,
+                                                           chunk_size,
+                                                           session,
+                                                           retry_policy,
+                                                           spool_threshold,
+                                                           rate_limiter,
+                                                           recorder)
+            n_zips_in_tmp = len(to_download) - len(not_downloaded or [])
+            corrupt_files = []
+            zero_size_files = []
+            failed_unzips_list = None
+        elif pipelined:
+            with recorder.phase('pipeline'):
+                results = pipeline.run_pipeline(to_download,
+                                                data_dir,
+                                                tmp_dir,
+                                                verbose,
+                                                base_url,
+                                                max_workers,
+                                                chunk_size,
+                                                DownloadManifest(tmp_dir),
+                                                session,
+                                                retry_policy,
+                                                extract_workers=extract_workers,
+                                                overwrite=sync or (resume and member_workers == 1),
+                                                verify_rounds=verify_rounds,
+                                                cache=cache,
+                                                rate_limiter=rate_limiter,
+                                                on_event=recorder,
+                                                transform=transform,
+                                                member_workers=member_workers)
+            not_downloaded = results['not_downloaded']
+            n_zips_in_tmp = results['n_validated']
+            corrupt_files = results['corrupt_files']
+            zero_size_files = []
+            failed_unzips_list = results['failed_unzips_list']
+        else:
+            manifest = DownloadManifest(tmp_dir)
+            with recorder.phase('download'):
+                not_downloaded = download_zips(to_download,
+                                               tmp_dir,
+                                               verbose,
+                                               base_url,
+                                               max_workers,
+                                               chunk_size,
+                                               manifest,
+                                               session,
+                                               retry_policy,
+                                               cache,
+                                               rate_limiter,
+                                               recorder,
+                                               concurrency)
+            with recorder.phase('validate'):
+                corrupt = verify_downloads(to_download, tmp_dir, verbose, manifest)
+                for _ in range(verify_rounds):
+                    if len(corrupt) == 0:
+                        break
+                    if verbose:
+                        print(f"Downloading {len(corrupt)} corrupt ZIP-files again...")
+                    failed_again = download_zips(corrupt,
+                                                 tmp_dir,
+                                                 verbose,
+                                                 base_url,
+                                                 max_workers,
+                                                 chunk_size,
+                                                 manifest,
+                                                 session,
+                                                 retry_policy,
+                                                 rate_limiter=rate_limiter,
+                                                 on_event=recorder,
+                                                 concurrency=concurrency)
+                    not_downloaded = (not_downloaded or []) + (failed_again or []) or None
+                    corrupt = verify_downloads(corrupt, tmp_dir, verbose, manifest)
+                corrupt_files = [entry["name"] for entry in corrupt]
+                n_zips_in_tmp, zero_size_files = validate_downloads(len(to_download), 
+                                                                    tmp_dir,
+                                                                    verbose)
+            if output_format == 'zips':
+                with recorder.phase('move'):
+                    move_zips(tmp_dir, data_dir, verbose)
+                failed_unzips_list = None
+            elif output_format == 'shards':
+                with recorder.phase('pack'):
+                    failed_unzips_list = pack_shards(tmp_dir, data_dir, verbose, shard_size)
+            else:
+                with recorder.phase('unpack'):
+                    failed_unzips_list = unpack_zips(tmp_dir,
+                                                     data_dir,
+                                                     verbose,
+                                                     overwrite=sync or (resume and member_workers == 1),
+                                                     max_workers=extract_workers,
+                                                     transform=transform,
+                                                     member_workers=member_workers)
+        dedup_info = None
+        if dedup:
+            with recorder.phase('link'):
+                failed_links = [entry["name"] for entry, links in linked
+                                if not link_members(data_dir + "/" + entry["name"][:-4], links)]
+                if len(failed_links) > 0:
+                    failed_unzips_list = (failed_unzips_list or []) + failed_links
+                dedup_info = dict(dedup_files(data_dir, verbose=verbose),
+                                  linked=[entry["name"] for entry, _ in linked if entry["name"] not in failed_links])
+        with recorder.phase('cleanup'):
+            if not direct:
+                remove_tmp_dir(tmp_dir)
+            if prune:
+                for entry in removed:
+                    if output_format == 'zips':
+                        if verbose:
+                            print(f"Removing {data_dir}/{entry['name']}...")
+                        try:
+                            os.remove(data_dir + "/" + entry["name"])
+                        except FileNotFoundError:
+                            pass
+                    else:
+                        class_dir = data_dir + "/" + entry["name"][:-4]
+                        if verbose:
+                            print(f"Removing {class_dir}...")
+                        shutil.rmtree(class_dir, ignore_errors=True)
+                    catalog.pop(entry["bsLink"])
+        failed_names = {entry["name"] for entry in to_download
+                        if base_url + '/' + entry["bsLink"] in (not_downloaded or [])}
+        failed_names.update(failed_unzips_list or [])
+        failed_names.update(os.path.basename(path) for path in zero_size_files)
+        failed_names.update(corrupt_files)
+        for entry in to_download + [entry for entry, _ in linked]:
+            if entry["name"] not in failed_names:
+                # a re-uploaded sample replaces the entry of its previous link
+                for link in [link for link, old in catalog.items() if old["name"] == entry["name"]]:
+                    catalog.pop(link)
+                catalog[entry["bsLink"]] = entry
+        save_local_catalog(catalog_path, list(catalog.values()))
+        index_path = None
+        if write_index:
+            with recorder.phase('index'):
+                index_path = build_image_index(data_dir)
+    finally:
+        if owns_session:
+            session.close()
     info = {
         'zips_table': zips_table,
         'not_downloaded':  not_downloaded,
         'validation': {
             'n_zips_in_tmp': n_zips_in_tmp,
-            'zero_size_files': zero_size_files
+            'zero_size_files': zero_size_files,
+            'corrupt_files': corrupt_files
         },
-        'failed_unzips_list': failed_unzips_list
+        'failed_unzips_list': failed_unzips_list,
+        'deferred': [entry["name"] for entry in deferred],
+        'metrics': recorder.summary()
     }
+    if write_index:
+        info['index_path'] = index_path
+    if dedup:
+        info['dedup'] = dedup_info
+    if num_shards > 1:
+        info['shard'] = {'shard_index': shard_index, 'num_shards': num_shards, 'catalog_path': catalog_path}
+    if sync:
+        info['sync'] = {
+            'changed': [entry["name"] for entry in changed],
+            'removed': [entry["name"] for entry in removed]
+        }
     return info
 
-def main(name_filter, verbose):
-    create_basic_folder_structure(verbose=verbose)
+def main(name_filter, verbose, data_dir: str = 'plant-disease-db', tmp_dir: str = 'tmp'):
+    create_basic_folder_structure(data_dir, tmp_dir, verbose=verbose)
     zips_table = fetch_zips_table(name_filter=name_filter, verbose=verbose)
-    download_zips(zips_table, verbose=verbose)
-    validate_downloads(len(zips_table), verbose=verbose)
-    unpack_zips(verbose=verbose)
-    remove_tmp_dir()
+    download_zips(zips_table, tmp_dir, verbose=verbose)
+    validate_downloads(len(zips_table), tmp_dir, verbose=verbose)
+    unpack_zips(tmp_dir, data_dir, verbose=verbose)
+    remove_tmp_dir(tmp_dir)
     if verbose:
         print("All done. Have fun!")
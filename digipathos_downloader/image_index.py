@@ -0,0 +1,210 @@
+import json
+import mmap
+import os
+import struct
+
+
+INDEX_MAGIC = b'DGPIDX01'
+# magic, number of records, offset and length of the metadata (JSON), offset of the records, offset of the paths
+HEADER = struct.Struct('<8sQQQQQ')
+# path offset and length (in the paths blob), class id, size in bytes, width and height (0 if unknown)
+RECORD = struct.Struct('<QIIQII')
+JPEG_SOF_MARKERS = {0xC0, 0xC1, 0xC2, 0xC3, 0xC5, 0xC6, 0xC7, 0xC9, 0xCA, 0xCB, 0xCD, 0xCE, 0xCF}
+
+
+def default_index_path(data_dir: str) -> str:
+    """Where the image index of a dataset directory is kept by default.
+
+    The index sits next to data_dir rather than inside it, so that data_dir only holds class folders.
+
+    Args:
+        data_dir (str): the dataset directory.
+
+    Returns:
+        path (str): '<data_dir>.index'.
+    """
+    return os.path.normpath(data_dir) + '.index'
+
+
+def _jpeg_size(image_file) -> tuple:
+    """Walk the JPEG segments up to the first start of frame, which holds the dimensions."""
+    image_file.seek(2)
+    while True:
+        marker = image_file.read(2)
+        if len(marker) < 2 or marker[0] != 0xFF:
+            return None
+        code = marker[1]
+        while code == 0xFF:
+            # fill bytes before the marker code
+            next_byte = image_file.read(1)
+            if not next_byte:
+                return None
+            code = next_byte[0]
+        if code == 0x01 or 0xD0 <= code <= 0xD8:
+            # markers without a length
+            continue
+        length_bytes = image_file.read(2)
+        if len(length_bytes) < 2:
+            return None
+        length = struct.unpack('>H', length_bytes)[0]
+        if code in JPEG_SOF_MARKERS:
+            frame = image_file.read(5)
+            if len(frame) < 5:
+                return None
+            _, height, width = struct.unpack('>BHH', frame)
+            return width, height
+        image_file.seek(length - 2, os.SEEK_CUR)
+
+
+def image_size(path: str) -> tuple:
+    """Read the dimensions of a JPEG, PNG or GIF image from its header, without decoding it.
+
+    Args:
+        path (str): path for the image.
+
+    Returns:
+        (tuple): the width and height in pixels. None if the format is not recognized.
+    """
+    try:
+        with open(path, "rb") as image_file:
+            header = image_file.read(26)
+            if header[:2] == b'\xff\xd8':
+                return _jpeg_size(image_file)
+            if header[:8] == b'\x89PNG\r\n\x1a\n' and header[12:16] == b'IHDR':
+                return struct.unpack('>II', header[16:24])
+            if header[:6] in (b'GIF87a', b'GIF89a'):
+                return struct.unpack('<HH', header[6:10])
+    except (OSError, struct.error):
+        return None
+    return None
+
+
+def build_image_index(data_dir: str, index_path: str = None) -> str:
+    """Scan a dataset directory once and write a compact, memory-mappable index of its images.
+
+    Classes are the sub-folders of data_dir, in sorted order, and their ids are their positions. Each image gets
+    a fixed-size record (see RECORD) with its class id, size in bytes and dimensions, plus its path relative to
+    data_dir in a shared blob. See ImageIndex to read it.
+
+    Args:
+        data_dir (str): the dataset directory (a folder of images per class).
+        index_path (str, optional): where the index is written. Defaults to '<data_dir>.index'.
+
+    Returns:
+        index_path (str): the path of the index.
+    """
+    if index_path is None:
+        index_path = default_index_path(data_dir)
+    classes = sorted(entry.name for entry in os.scandir(data_dir) if entry.is_dir())
+    records = bytearray()
+    paths = bytearray()
+    for class_id, label in enumerate(classes):
+        for root, dirs, files in os.walk(os.path.join(data_dir, label)):
+            dirs.sort()
+            for name in sorted(files):
+                path = os.path.join(root, name)
+                relative_path = os.path.relpath(path, data_dir).encode()
+                width, height = image_size(path) or (0, 0)
+                records += RECORD.pack(len(paths), len(relative_path), class_id, os.path.getsize(path), width, height)
+                paths += relative_path
+    metadata = json.dumps({'root': os.path.abspath(data_dir), 'classes': classes}).encode()
+    n_records = len(records) // RECORD.size
+    metadata_offset = HEADER.size
+    records_offset = metadata_offset + len(metadata)
+    # keep the records aligned for zero-copy array views
+    records_offset += -records_offset % 8
+    paths_offset = records_offset + len(records)
+    tmp_path = f"{index_path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as index_file:
+        index_file.write(HEADER.pack(INDEX_MAGIC, n_records, metadata_offset, len(metadata), records_offset, paths_offset))
+        index_file.write(metadata)
+        index_file.write(b'\0' * (records_offset - metadata_offset - len(metadata)))
+        index_file.write(records)
+        index_file.write(paths)
+    os.replace(tmp_path, index_path)
+    return index_path
+
+
+class ImageIndex:
+    """Read-only, memory-mapped view of an index written by build_image_index.
+
+    Opening an index costs one mmap call, whatever the number of images, and every process mapping the same
+    file shares its pages. The index is picklable: a copy sent to a data loader worker maps the file again.
+
+    Args:
+        index_path (str): path for the index.
+        root (str, optional): the dataset directory the paths are relative to. Defaults to the one the index
+            was built from.
+
+    Raises:
+        ValueError: if the file is not an image index.
+    """
+
+    def __init__(self, index_path: str, root: str = None):
+        self.index_path = index_path
+        self._root = root
+        self._open()
+
+    def _open(self) -> None:
+        with open(self.index_path, "rb") as index_file:
+            self._buffer = mmap.mmap(index_file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, self._n_records, metadata_offset, metadata_length, self._records_offset, self._paths_offset = \
+            HEADER.unpack_from(self._buffer, 0)
+        if magic != INDEX_MAGIC:
+            self._buffer.close()
+            raise ValueError(f"{self.index_path} is not an image index.")
+        metadata = json.loads(self._buffer[metadata_offset:metadata_offset + metadata_length])
+        self.root = self._root if self._root is not None else metadata['root']
+        self.classes = metadata['classes']
+
+    def __len__(self) -> int:
+        return self._n_records
+
+    def __getitem__(self, index: int) -> tuple:
+        """Get the metadata of an image.
+
+        Args:
+            index (int): the image position in the index.
+
+        Returns:
+            (tuple): the image path (under root), its class id, size in bytes, width and height (0 if unknown).
+        """
+        if not -self._n_records <= index < self._n_records:
+            raise IndexError('image index out of range')
+        index %= self._n_records
+        path_offset, path_length, class_id, size, width, height = \
+            RECORD.unpack_from(self._buffer, self._records_offset + index * RECORD.size)
+        start = self._paths_offset + path_offset
+        relative_path = self._buffer[start:start + path_length].decode()
+        return os.path.join(self.root, relative_path), class_id, size, width, height
+
+    def as_array(self):
+        """Get every record as a NumPy structured array, backed by the mapped file (no copy).
+
+        Needs NumPy, which is not a dependency of this package.
+
+        Returns:
+            (numpy.ndarray): the records, with the fields 'path_offset', 'path_length', 'class_id', 'size',
+                'width' and 'height'.
+        """
+        import numpy as np
+        dtype = np.dtype([('path_offset', '<u8'), ('path_length', '<u4'), ('class_id', '<u4'),
+                          ('size', '<u8'), ('width', '<u4'), ('height', '<u4')])
+        return np.frombuffer(self._buffer, dtype=dtype, count=self._n_records, offset=self._records_offset)
+
+    def close(self) -> None:
+        """Unmap the file."""
+        self._buffer.close()
+
+    def __getstate__(self) -> dict:
+        return {'index_path': self.index_path, '_root': self._root}
+
+    def __setstate__(self, state: dict) -> None:
+        self.__dict__.update(state)
+        self._open()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
@@ -0,0 +1,123 @@
+import hashlib
+import os
+import re
+import zipfile
+
+
+SIZE_UNITS = {'b': 0, 'bytes': 0, 'kb': 1, 'mb': 2, 'gb': 3, 'tb': 4}
+SIZE_PATTERN = re.compile(r"\s*([\d.,]+)\s*([a-zA-Z]*)\s*")
+
+
+def _split_size(size: str) -> tuple:
+    """Split '20.45 MB' into (20.45, 2), the value and the power of the unit. Returns None if it cannot be parsed."""
+    match = SIZE_PATTERN.fullmatch(size or "")
+    if match is None or match.group(2).lower() not in SIZE_UNITS:
+        return None
+    try:
+        return float(match.group(1).replace(',', '')), SIZE_UNITS[match.group(2).lower()]
+    except ValueError:
+        return None
+
+
+def parse_size(size: str) -> float:
+    """Parse a human readable size from the zips table (e.g., '636.43 kB' or '20.45 MB').
+
+    The digipathos website shows binary units (1 kB = 1024 bytes).
+
+    Args:
+        size (str): the size as shown on the website.
+
+    Returns:
+        n_bytes (float): the size in bytes. None if the string cannot be parsed.
+    """
+    parsed = _split_size(size)
+    if parsed is None:
+        return None
+    value, exponent = parsed
+    return value * 1024 ** exponent
+
+
+def size_matches(n_bytes: int, size: str) -> bool:
+    """Check a file size against the rounded size from the zips table.
+
+    The displayed size has two decimals, so a difference of up to half a hundredth of the unit is accepted.
+    Decimal units (1 kB = 1000 bytes) are accepted too, so a change of convention upstream does not turn
+    every sample into a corrupt one.
+
+    Args:
+        n_bytes (int): the file size in bytes.
+        size (str): the size as shown on the website (e.g., '20.45 MB').
+
+    Returns:
+        (bool): False if the file size does not match. True if it does, or if size cannot be parsed.
+    """
+    parsed = _split_size(size)
+    if parsed is None:
+        return True
+    value, exponent = parsed
+    for base in (1024, 1000):
+        unit = base ** exponent
+        if abs(n_bytes - value * unit) <= 0.005 * unit + 1:
+            return True
+    return False
+
+
+def expected_checksum(remote_zip_info: dict) -> tuple:
+    """Get the checksum of a sample, when the repository provides one.
+
+    Both the DSpace REST form ({'value': ..., 'checkSumAlgorithm': 'MD5'}) and '<algorithm>:<hexdigest>'
+    strings are understood.
+
+    Args:
+        remote_zip_info (dict): the sample metadata (an entry of the zips table).
+
+    Returns:
+        (tuple): the hashlib algorithm name and the expected hex digest. None if there is no checksum.
+    """
+    checksum = remote_zip_info.get("checksum")
+    if isinstance(checksum, dict) and checksum.get("value") and checksum.get("checkSumAlgorithm"):
+        algorithm, digest = checksum["checkSumAlgorithm"], checksum["value"]
+    elif isinstance(checksum, str) and ':' in checksum:
+        algorithm, digest = checksum.split(':', 1)
+    else:
+        return None
+    algorithm = algorithm.lower().replace('-', '')
+    if algorithm not in hashlib.algorithms_available:
+        return None
+    return algorithm, digest.lower()
+
+
+def verify_zip(path: str, size: str = None, checksum: tuple = None) -> str:
+    """Verify a downloaded sample: its size, its checksum and the CRC of every member.
+
+    Args:
+        path (str): path for the zip file.
+        size (str, optional): the size shown on the website (e.g., '20.45 MB'). Defaults to None (not checked).
+        checksum (tuple, optional): the algorithm and hex digest (see expected_checksum). Defaults to None (not checked).
+
+    Returns:
+        problem (str): why the file is corrupt. None if it passed every check.
+    """
+    if not os.path.exists(path):
+        return "file not found"
+    n_bytes = os.path.getsize(path)
+    if n_bytes == 0:
+        return "size of 0 bytes"
+    if size is not None and not size_matches(n_bytes, size):
+        return f"size of {n_bytes} bytes does not match the expected {size}"
+    if checksum is not None:
+        algorithm, digest = checksum
+        file_hash = hashlib.new(algorithm)
+        with open(path, "rb") as zip_file:
+            for block in iter(lambda: zip_file.read(1024 * 1024), b""):
+                file_hash.update(block)
+        if file_hash.hexdigest() != digest:
+            return f"{algorithm} checksum does not match"
+    try:
+        with zipfile.ZipFile(path, mode="r") as zip_contents:
+            bad_member = zip_contents.testzip()
+    except (zipfile.BadZipFile, OSError, EOFError) as e:
+        return f"not a valid ZIP-file ({e})"
+    if bad_member is not None:
+        return f"bad CRC-32 for member {bad_member}"
+    return None
@@ -0,0 +1,81 @@
+import json
+import os
+import threading
+
+
+MANIFEST_NAME = 'manifest.json'
+
+
+class DownloadManifest:
+    """Keeps track of each bitstream's download progress in a JSON file inside tmp_dir.
+
+    Every entry is keyed by the bitstream relative url (i.e., 'bsLink') and holds the sample name,
+    its status ('pending', 'partial', 'complete' or 'failed'), the bytes received so far and the
+    expected size in bytes (None while unknown). A rerun reads the file back, so completed samples
+    can be skipped and partial ones continued.
+
+    Args:
+        tmp_dir (str): the directory where the zipped files are downloaded to.
+    """
+
+    def __init__(self, tmp_dir: str):
+        self.path = tmp_dir + '/' + MANIFEST_NAME
+        self._lock = threading.Lock()
+        self.entries = {}
+        if os.path.exists(self.path):
+            with open(self.path, "r") as manifest_file:
+                self.entries = json.load(manifest_file)
+
+    def get(self, relative_url: str) -> dict:
+        """Get a bitstream entry.
+
+        Args:
+            relative_url (str): the sample url.
+
+        Returns:
+            entry (dict): a copy of the entry. None if the bitstream is not in the manifest.
+        """
+        with self._lock:
+            entry = self.entries.get(relative_url)
+            return dict(entry) if entry is not None else None
+
+    def update(self, relative_url: str, save: bool = False, **fields) -> None:
+        """Update a bitstream entry, creating it if necessary.
+
+        Args:
+            relative_url (str): the sample url.
+            save (bool, optional): write the manifest to disk afterwards. Defaults to False.
+            **fields: the entry fields to be set (name, status, bytes_received, expected_size).
+        """
+        with self._lock:
+            entry = self.entries.setdefault(relative_url, {'name': None,
+                                                           'status': 'pending',
+                                                           'bytes_received': 0,
+                                                           'expected_size': None})
+            entry.update(fields)
+        if save:
+            self.save()
+
+    def is_complete(self, relative_url: str, tmp_dir: str) -> bool:
+        """Check whether a bitstream was fully downloaded and its file is still in place.
+
+        Args:
+            relative_url (str): the sample url.
+            tmp_dir (str): the directory where the zipped files are downloaded to.
+
+        Returns:
+            (bool): True if the sample does not need to be downloaded again.
+        """
+        entry = self.get(relative_url)
+        if entry is None or entry['status'] != 'complete':
+            return False
+        filename = tmp_dir + '/' + entry['name']
+        return os.path.exists(filename) and os.path.getsize(filename) == entry['bytes_received']
+
+    def save(self) -> None:
+        """Atomically write the manifest to disk."""
+        with self._lock:
+            tmp_path = self.path + '.tmp'
+            with open(tmp_path, "w") as manifest_file:
+                json.dump(self.entries, manifest_file, indent=1)
+            os.replace(tmp_path, self.path)
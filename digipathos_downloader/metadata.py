@@ -0,0 +1,132 @@
+import json
+import sqlite3
+
+from digipathos_downloader.integrity import parse_size
+
+
+def parse_zip_name(name: str) -> dict:
+    """Split a sample name into structured fields.
+
+    Names look like 'Abacaxi (Pineapple) - Fusariose (Fusariose) - 1.zip': the crop, the disease and the
+    part index, separated by ' - '. Any part mentioning 'cropped' marks the cropped variant.
+
+    Args:
+        name (str): the sample name (i.e., entry["name"]).
+
+    Returns:
+        (dict): the crop, disease (None if missing), part (int, None if missing) and cropped (bool) fields.
+    """
+    stem = name[:-4] if name.lower().endswith('.zip') else name
+    parts = [part.strip() for part in stem.split(' - ')]
+    cropped = any('cropped' in part.lower() for part in parts)
+    parts = [part for part in parts if 'cropped' not in part.lower()]
+    part_index = None
+    if len(parts) > 1 and parts[-1].isdigit():
+        part_index = int(parts.pop())
+    return {'crop': parts[0] if parts else None,
+            'disease': ' - '.join(parts[1:]) or None,
+            'part': part_index,
+            'cropped': cropped}
+
+
+def filter_zips_table(zips_table: list, name_filter: str = "cropped", verbose: bool = False) -> list:
+    """Keep the cropped images only, the original images only, or all of them.
+
+    Args:
+        zips_table (list): the samples metadata, as served.
+        name_filter (str, optional): 'cropped', 'original' or anything else for all. Defaults to 'cropped'.
+        verbose (bool, optional): notify about the process. Defaults to False.
+
+    Returns:
+        zips_table (list): the entries passing the filter.
+    """
+    if name_filter.lower() == "cropped":
+        if verbose:
+            print("Filtering for cropped images...")
+        return [entry for entry in zips_table if "cropped" in entry["name"].lower()]
+    elif name_filter.lower() == "original":
+        if verbose:
+            print("Filtering for original images...")
+        return [entry for entry in zips_table if "cropped" not in entry["name"].lower()]
+    else:
+        return zips_table
+
+
+def build_metadata_catalog(zips_table: list, path: str = ":memory:") -> sqlite3.Connection:
+    """Parse the zips table once into an indexed SQLite table.
+
+    Every entry becomes a row with its bsLink, name, crop, disease, part, cropped flag and size in bytes
+    (parsed from strings like '20.45 MB'), plus the original entry. Rows are replaced on rebuild, so the
+    same file can be refreshed with a newer table.
+
+    Args:
+        zips_table (list): the samples metadata (i.e., generated by fetch_zips_table).
+        path (str, optional): the SQLite database file. Defaults to ":memory:".
+
+    Returns:
+        connection (sqlite3.Connection): the catalog, ready for query_metadata_catalog.
+    """
+    connection = sqlite3.connect(path, check_same_thread=False)
+    with connection:
+        connection.execute("DROP TABLE IF EXISTS zips")
+        connection.execute("""CREATE TABLE zips (
+                                  bs_link TEXT PRIMARY KEY,
+                                  name TEXT NOT NULL,
+                                  crop TEXT COLLATE NOCASE,
+                                  disease TEXT COLLATE NOCASE,
+                                  part INTEGER,
+                                  cropped INTEGER NOT NULL,
+                                  size_bytes INTEGER,
+                                  entry TEXT NOT NULL)""")
+        connection.execute("CREATE INDEX zips_crop ON zips (crop, disease)")
+        connection.execute("CREATE INDEX zips_disease ON zips (disease)")
+        connection.execute("CREATE INDEX zips_cropped ON zips (cropped)")
+        rows = []
+        for entry in zips_table:
+            fields = parse_zip_name(entry["name"])
+            size_bytes = parse_size(entry.get("size"))
+            rows.append((entry["bsLink"], entry["name"], fields['crop'], fields['disease'], fields['part'],
+                         int(fields['cropped']), None if size_bytes is None else int(size_bytes), json.dumps(entry)))
+        connection.executemany("INSERT OR REPLACE INTO zips VALUES (?, ?, ?, ?, ?, ?, ?, ?)", rows)
+    return connection
+
+
+def query_metadata_catalog(connection: sqlite3.Connection,
+                           crop=None,
+                           disease=None,
+                           cropped: bool = None,
+                           part=None,
+                           max_bytes: int = None) -> list:
+    """Select samples from the catalog. Every criterion left as None matches anything.
+
+    Args:
+        connection (sqlite3.Connection): the catalog (see build_metadata_catalog).
+        crop (str or list, optional): the crop(s), e.g. 'Abacaxi (Pineapple)'. Case insensitive. Defaults to None.
+        disease (str or list, optional): the disease(s), e.g. 'Fusariose (Fusariose)'. Case insensitive. Defaults to None.
+        cropped (bool, optional): True for the cropped variant only, False for the original only. Defaults to None.
+        part (int or list, optional): the part index(es). Defaults to None.
+        max_bytes (int, optional): a size budget. Samples are taken in name order while their total size fits
+            in it. Defaults to None (no budget).
+
+    Returns:
+        zips_table (list): the matching entries, in name order, as in fetch_zips_table.
+    """
+    conditions, params = [], []
+    for column, value in (('crop', crop), ('disease', disease), ('part', part)):
+        if value is None:
+            continue
+        values = [value] if isinstance(value, (str, int)) else list(value)
+        conditions.append(f"{column} IN ({', '.join('?' * len(values))})")
+        params.extend(values)
+    if cropped is not None:
+        conditions.append("cropped = ?")
+        params.append(int(cropped))
+    where = ("WHERE " + " AND ".join(conditions)) if conditions else ""
+    query = f"""SELECT entry, SUM(COALESCE(size_bytes, 0)) OVER (ORDER BY name, bs_link) AS running_total
+                FROM zips {where} ORDER BY name, bs_link"""
+    zips_table = []
+    for entry, running_total in connection.execute(query, params):
+        if max_bytes is not None and running_total > max_bytes:
+            break
+        zips_table.append(json.loads(entry))
+    return zips_table
@@ -0,0 +1,139 @@
+import json
+import threading
+import time
+from contextlib import contextmanager
+
+
+def emit(on_event, event: str, **fields) -> None:
+    """Send an event to a callback, if there is one.
+
+    Every event is a dict with its type ('event'), a unix timestamp ('time') and the given fields.
+
+    Args:
+        on_event (callable): the callback (e.g., a MetricsRecorder). None to drop the event.
+        event (str): the event type (e.g., 'download_end').
+    """
+    if on_event is not None:
+        on_event({'event': event, 'time': time.time(), **fields})
+
+
+def emit_download_retry(on_event, zip_name: str, attempt: int, failure: tuple) -> None:
+    """Send the 'download_retry' event of a sample (see MetricsRecorder), given the (cause, HTTP status) of the
+    failed attempt."""
+    cause, status = failure if failure is not None else (None, None)
+    emit(on_event, 'download_retry', name=zip_name, attempt=attempt, status=status, cause=cause)
+
+
+def emit_download_end(on_event,
+                      zip_name: str,
+                      status: str,
+                      n_bytes: int,
+                      started: float,
+                      retries: int,
+                      failure: tuple = None) -> None:
+    """Send the 'download_end' event of a sample (see MetricsRecorder). A failed one carries the (cause, HTTP
+    status) of its last attempt."""
+    elapsed = time.monotonic() - started
+    cause, http_status = failure if failure is not None else (None, None)
+    emit(on_event, 'download_end', name=zip_name, status=status, bytes=n_bytes, elapsed=elapsed,
+         throughput=n_bytes / elapsed if elapsed > 0 else None, retries=retries, cause=cause, http_status=http_status)
+
+
+class MetricsRecorder:
+    """Collects the download events into a summary, and optionally into a JSON-lines file.
+
+    A recorder is a callback: pass it as on_event to download_zips, run_pipeline, get_dataset, etc. The events are
+
+    - 'download_start' (name, url): a sample download begins.
+    - 'download_progress' (name, bytes): a chunk of the sample arrived. Not written to the file unless
+      progress_events is True, as there is one per chunk.
+    - 'download_retry' (name, attempt, status, cause): an attempt failed and the sample is requested again.
+      cause is 'http' (status is then the HTTP status), 'network', 'incomplete' (the body was cut short) or
+      'checksum'.
+    - 'download_end' (name, status, bytes, elapsed, throughput, retries, cause, http_status): the sample is
+      'complete', 'cached' (taken from the local cache) or 'failed'. bytes counts what went over the network in
+      this run. A failed sample carries the cause (as in 'download_retry', or 'disk' and 'extract' for local
+      errors) and HTTP status of its last attempt, None otherwise.
+    - 'extract_end' (name, status, elapsed): a sample was extracted ('complete') or not ('failed').
+    - 'phase_start' / 'phase_end' (phase, elapsed): a step of get_dataset, e.g. 'fetch_table' or 'download'.
+    - 'concurrency' (limit, previous, reason, throughput, latency, error_rate): an AdaptiveConcurrency decision.
+
+    Args:
+        path (str, optional): a JSON-lines file where every event is appended. Defaults to None (no file).
+        on_event (callable, optional): another callback every event is forwarded to. Defaults to None.
+        progress_events (bool, optional): write 'download_progress' events to the file too. Defaults to False.
+    """
+
+    def __init__(self, path: str = None, on_event=None, progress_events: bool = False):
+        self.path = path
+        self.on_event = on_event
+        self.progress_events = progress_events
+        self.phases = {}
+        self.files = {}
+        self.concurrency = []
+        self._first_start = None
+        self._last_end = None
+        self._lock = threading.Lock()
+        if path is not None:
+            # start a fresh file for this run
+            open(path, "w").close()
+
+    def __call__(self, event: dict) -> None:
+        with self._lock:
+            kind = event['event']
+            if kind == 'phase_end':
+                self.phases[event['phase']] = self.phases.get(event['phase'], 0.0) + event['elapsed']
+            elif kind == 'download_start':
+                if self._first_start is None:
+                    self._first_start = event['time']
+            elif kind == 'download_end':
+                self.files[event['name']] = {key: event[key]
+                                             for key in ('status', 'bytes', 'elapsed', 'throughput', 'retries')}
+                self._last_end = event['time']
+            elif kind == 'concurrency':
+                self.concurrency.append({key: event[key] for key in ('limit', 'previous', 'reason')})
+            if self.path is not None and (kind != 'download_progress' or self.progress_events):
+                with open(self.path, "a") as metrics_file:
+                    metrics_file.write(json.dumps(event) + "\n")
+        if self.on_event is not None:
+            self.on_event(event)
+
+    @contextmanager
+    def phase(self, name: str):
+        """Time a block of code as a phase.
+
+        Args:
+            name (str): the phase name (e.g., 'download').
+        """
+        emit(self, 'phase_start', phase=name)
+        start = time.monotonic()
+        try:
+            yield
+        finally:
+            emit(self, 'phase_end', phase=name, elapsed=time.monotonic() - start)
+
+    def summary(self) -> dict:
+        """Aggregate the events recorded so far.
+
+        Returns:
+            (dict): the seconds spent per phase (phases), the number of samples downloaded, taken from the cache
+                and failed (n_downloaded, n_cached, n_failed), the bytes transferred (bytes), the total number
+                of retries (retries), the overall throughput in bytes per second from the first download start
+                to the last download end (throughput), the per sample metrics (files) and the limits set by
+                AdaptiveConcurrency, if any (concurrency).
+        """
+        with self._lock:
+            statuses = [entry['status'] for entry in self.files.values()]
+            n_bytes = sum(entry['bytes'] for entry in self.files.values())
+            span = (self._last_end - self._first_start) if self._first_start is not None and self._last_end else 0
+            return {
+                'phases': dict(self.phases),
+                'n_downloaded': statuses.count('complete'),
+                'n_cached': statuses.count('cached'),
+                'n_failed': statuses.count('failed'),
+                'bytes': n_bytes,
+                'retries': sum(entry['retries'] for entry in self.files.values()),
+                'throughput': n_bytes / span if span > 0 else None,
+                'files': {name: dict(entry) for name, entry in self.files.items()},
+                'concurrency': [dict(entry) for entry in self.concurrency]
+            }
@@ -0,0 +1,160 @@
+import os
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+from digipathos_downloader import download
+from digipathos_downloader.cache import ZipCache
+from digipathos_downloader.integrity import verify_zip
+from digipathos_downloader.manifest import DownloadManifest
+from digipathos_downloader.metrics import emit
+from digipathos_downloader.scheduler import TokenBucket
+from digipathos_downloader.session import RetryPolicy
+
+
+def run_pipeline(zips_tbl: list,
+                 data_dir: str,
+                 tmp_dir: str,
+                 verbose: bool = True,
+                 base_url: str = "https://www.digipathos-rep.cnptia.embrapa.br",
+                 max_workers: int = 1,
+                 chunk_size: int = 1024 * 1024,
+                 manifest: DownloadManifest = None,
+                 session: requests.Session = None,
+                 retry_policy: RetryPolicy = None,
+                 extract_workers: int = 1,
+                 queue_size: int = None,
+                 overwrite: bool = False,
+                 verify_rounds: int = 2,
+                 cache: ZipCache = None,
+                 rate_limiter: TokenBucket = None,
+                 on_event=None,
+                 transform=None,
+                 member_workers: int = 1) -> dict:
+    """Download, verify, extract and delete every sample as soon as it lands, instead of one phase at a time.
+
+    Downloads run in a pool of max_workers threads and hand the finished archives over to extract_workers
+    threads through a bounded queue. When extraction falls behind, the downloaders wait for room in the queue,
+    so at most about queue_size + max_workers archives sit in tmp_dir at any time. Each archive is verified
+    (see verify_zip) by the thread that downloaded it, and downloaded again if corrupt.
+
+    Args:
+        zips_tbl (list): the samples metadata (i.e., generated by fetch_zips_table).
+        data_dir (str): path for the folder where the files will be extracted to.
+        tmp_dir (str): the directory where the zipped files are downloaded to.
+        verbose (bool, optional): notify the user about the progress. Defaults to True.
+        base_url (str, optional): digipathos base url. Defaults to "https://www.digipathos-rep.cnptia.embrapa.br".
+        max_workers (int, optional): how many samples are downloaded at the same time. Defaults to 1.
+        chunk_size (int, optional): how many bytes are written to disk at a time. Defaults to 1 MiB.
+        manifest (DownloadManifest, optional): where the progress is recorded. Samples it marks as extracted
+            are skipped and downloaded samples are extracted without being requested again. Defaults to None.
+        session (requests.Session, optional): the session shared by all downloads. Defaults to None.
+        retry_policy (RetryPolicy, optional): how each download is retried. Defaults to RetryPolicy().
+        extract_workers (int, optional): how many archives are extracted at the same time. Defaults to 1.
+        queue_size (int, optional): how many downloaded archives may wait for extraction. Defaults to 2 * max_workers.
+        overwrite (bool, optional): replace class folders that already exist. Defaults to False.
+        verify_rounds (int, optional): how many times a corrupt archive is downloaded again. Defaults to 2.
+        cache (ZipCache, optional): the local cache checked before each download (see fetch_zip). Defaults to None.
+        rate_limiter (TokenBucket, optional): the bandwidth cap shared by all downloads. Defaults to None (no cap).
+        on_event (callable, optional): receives the download and extraction events (see MetricsRecorder).
+            Defaults to None.
+        transform (callable, optional): applied to every member while it is extracted (see unpack_zip).
+            Defaults to None.
+        member_workers (int, optional): how many threads share the members of each archive (see unpack_zip).
+            Defaults to 1.
+
+    Returns:
+        (dict): the failed downloads' urls (not_downloaded), the number of archives that passed verification
+            (n_validated), the archives still corrupt after every round (corrupt_files) and the archives whose
+            extraction failed (failed_unzips_list). The failure lists are None when empty, as in download_zips.
+    """
+    if max_workers < 1 or extract_workers < 1:
+        raise ValueError('max_workers and extract_workers must be at least 1.')
+    extract_queue = queue.Queue(maxsize=queue_size or 2 * max_workers)
+    validated = []
+    corrupt_files = []
+    failed_unzips_list = []
+
+    def download_stage(remote_zip_info: dict):
+        zip_path = tmp_dir + '/' + remote_zip_info["name"]
+        for verify_round in range(verify_rounds + 1):
+            if manifest is None or not manifest.is_complete(remote_zip_info["bsLink"], tmp_dir):
+                fail_download = download.fetch_zip(remote_zip_info,
+                                                   tmp_dir,
+                                                   base_url,
+                                                   chunk_size,
+                                                   manifest,
+                                                   session,
+                                                   retry_policy,
+                                                   # a corrupt copy is fetched from the network, never again from the cache
+                                                   cache if verify_round == 0 else None,
+                                                   rate_limiter,
+                                                   on_event)
+                if fail_download is not None:
+                    return fail_download
+            problem = verify_zip(zip_path, remote_zip_info.get("size"))
+            if problem is None:
+                validated.append(remote_zip_info["name"])
+                extract_queue.put(remote_zip_info)
+                return None
+            print(f"WARNING: ZIP-file {remote_zip_info['name']} is corrupt: {problem}.")
+            os.remove(zip_path)
+            if manifest is not None:
+                manifest.update(remote_zip_info["bsLink"], status='pending', bytes_received=0, save=True)
+        corrupt_files.append(remote_zip_info["name"])
+        return None
+
+    def extract_stage():
+        while True:
+            remote_zip_info = extract_queue.get()
+            if remote_zip_info is None:
+                return
+            filename = remote_zip_info["name"]
+            zip_path = tmp_dir + '/' + filename
+            started = time.monotonic()
+            try:
+                if download.unpack_zip(filename, data_dir, tmp_dir, overwrite, transform, member_workers) is not None:
+                    failed_unzips_list.append(filename)
+                    emit(on_event, 'extract_end', name=filename, status='failed', elapsed=time.monotonic() - started)
+                    continue
+                os.remove(zip_path)
+                if manifest is not None:
+                    manifest.update(remote_zip_info["bsLink"], status='extracted', save=True)
+                emit(on_event, 'extract_end', name=filename, status='complete', elapsed=time.monotonic() - started)
+                if verbose:
+                    print(f"Extracted {filename}...")
+            except OSError as e:
+                # a broken stage must not leave the downloaders blocked on a full queue
+                print(f"{e}\nSkipping unpacking of {filename}")
+                failed_unzips_list.append(filename)
+                emit(on_event, 'extract_end', name=filename, status='failed', elapsed=time.monotonic() - started)
+
+    pending = zips_tbl
+    if manifest is not None:
+        pending = [entry for entry in zips_tbl
+                   if (manifest.get(entry["bsLink"]) or {}).get('status') != 'extracted']
+        if verbose and len(pending) < len(zips_tbl):
+            print(f"Skipping {len(zips_tbl) - len(pending)} ZIP-files already extracted...")
+
+    extractors = [threading.Thread(target=extract_stage, daemon=True) for _ in range(extract_workers)]
+    for extractor in extractors:
+        extractor.start()
+    try:
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = [executor.submit(download_stage, entry) for entry in pending]
+            not_downloaded = [future.result() for future in futures if future.result() is not None]
+    finally:
+        for _ in extractors:
+            extract_queue.put(None)
+        for extractor in extractors:
+            extractor.join()
+
+    return {
+        'not_downloaded': not_downloaded or None,
+        'n_validated': len(validated),
+        'corrupt_files': corrupt_files,
+        'failed_unzips_list': failed_unzips_list or None
+    }
@@ -0,0 +1,125 @@
+import os
+import zipfile
+
+
+class ZipDataset:
+    """Read-only view of the images inside the downloaded ZIP-files, without extracting them.
+
+    The members of every archive are indexed once, from the central directories only. Each image is labelled
+    with the name of its archive minus '.zip', which is the class folder name unpack_zips would have used.
+    Images are then read lazily by index, straight out of the archives.
+
+    Every process opens its own handle per archive, on first use, so a dataset can be handed to the worker
+    processes of a data loader (it is picklable and handles are never shared across a fork). Use shard to
+    split it between workers or nodes.
+
+    Args:
+        source (str or list): a folder holding the ZIP-files (e.g., get_dataset's data_dir with
+            output_format='zips'), or a list of paths for ZIP-files.
+        extensions (tuple, optional): the member suffixes kept, case insensitive. Defaults to None (every file).
+    """
+
+    def __init__(self, source, extensions: tuple = None):
+        if isinstance(source, str):
+            paths = [os.path.join(source, name) for name in sorted(os.listdir(source)) if name.endswith('.zip')]
+        else:
+            paths = list(source)
+        suffixes = tuple(extension.lower() for extension in extensions) if extensions is not None else None
+        self.samples = []
+        for path in paths:
+            label = os.path.basename(path)[:-4]
+            with zipfile.ZipFile(path, mode="r") as zip_contents:
+                for member in zip_contents.infolist():
+                    if member.is_dir() or (suffixes is not None and not member.filename.lower().endswith(suffixes)):
+                        continue
+                    self.samples.append((path, member.filename, label, member.file_size))
+        self.classes = sorted({label for _, _, label, _ in self.samples})
+        self.class_to_idx = {label: index for index, label in enumerate(self.classes)}
+        self._handles = {}
+        self._pid = os.getpid()
+
+    def __len__(self) -> int:
+        return len(self.samples)
+
+    def __getitem__(self, index: int) -> tuple:
+        """Read an image.
+
+        Args:
+            index (int): the image position in the index.
+
+        Returns:
+            (tuple): the label (the archive name without '.zip') and the image bytes.
+        """
+        path, member, label, _ = self.samples[index]
+        return label, self._archive(path).read(member)
+
+    def __iter__(self):
+        """Yield (label, bytes) for every image, in index order."""
+        for index in range(len(self)):
+            yield self[index]
+
+    def open(self, index: int):
+        """Open an image as a file-like object, decompressed while it is read (e.g., by PIL.Image.open).
+
+        Args:
+            index (int): the image position in the index.
+
+        Returns:
+            (zipfile.ZipExtFile): the opened member. Close it when done.
+        """
+        path, member, _, _ = self.samples[index]
+        return self._archive(path).open(member)
+
+    def shard(self, num_shards: int, index: int) -> 'ZipDataset':
+        """Take every num_shards-th image, starting at index, e.g. one shard per data loader worker.
+
+        The shards are disjoint, cover the whole dataset and differ in size by one image at most. They keep
+        the classes (and class ids) of the whole dataset.
+
+        Args:
+            num_shards (int): how many shards the dataset is split into.
+            index (int): which shard, from 0 to num_shards - 1.
+
+        Raises:
+            ValueError: if index is not in [0, num_shards).
+
+        Returns:
+            (ZipDataset): the shard.
+        """
+        if not 0 <= index < num_shards:
+            raise ValueError('index must be in [0, num_shards).')
+        shard = object.__new__(ZipDataset)
+        shard.__setstate__(dict(self.__getstate__(), samples=self.samples[index::num_shards]))
+        return shard
+
+    def close(self) -> None:
+        """Close the archives opened by this process."""
+        for handle in self._handles.values():
+            handle.close()
+        self._handles = {}
+
+    def _archive(self, path: str) -> zipfile.ZipFile:
+        if self._pid != os.getpid():
+            # handles inherited through a fork share their file offset with the parent
+            self._handles = {}
+            self._pid = os.getpid()
+        handle = self._handles.get(path)
+        if handle is None:
+            handle = self._handles[path] = zipfile.ZipFile(path, mode="r")
+        return handle
+
+    def __getstate__(self) -> dict:
+        state = dict(self.__dict__)
+        state['_handles'] = {}
+        return state
+
+    def __setstate__(self, state: dict) -> None:
+        self.__dict__.update(state)
+        self._handles = {}
+        self._pid = os.getpid()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
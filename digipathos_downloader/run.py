@@ -1,5 +1,5 @@
-import setup_checks
-import download
+from digipathos_downloader import setup_checks
+from digipathos_downloader import download
 import sys
 
 
@@ -0,0 +1,309 @@
+import hashlib
+import threading
+import time
+from contextlib import contextmanager
+
+from digipathos_downloader.integrity import parse_size
+from digipathos_downloader.metrics import emit
+
+
+SCHEDULE_POLICIES = ('largest', 'smallest', 'table')
+
+
+def order_zips_table(zips_table: list, policy: str = 'largest') -> list:
+    """Order the samples for download.
+
+    With several workers, starting the biggest samples first keeps a large one from being the only download
+    left at the end of the run. Samples whose size cannot be parsed go last, in table order.
+
+    Args:
+        zips_table (list): the samples metadata (i.e., generated by fetch_zips_table).
+        policy (str, optional): 'largest' first, 'smallest' first, or 'table' to keep the server order.
+            Defaults to 'largest'.
+
+    Raises:
+        ValueError: for an unknown policy.
+
+    Returns:
+        zips_table (list): a new list with the same entries, in download order.
+    """
+    if policy not in SCHEDULE_POLICIES:
+        raise ValueError(f"policy must be one of {SCHEDULE_POLICIES}, not {policy!r}.")
+    if policy == 'table':
+        return list(zips_table)
+    sign = -1 if policy == 'largest' else 1
+    sizes = [parse_size(entry.get("size")) for entry in zips_table]
+    order = sorted(range(len(zips_table)),
+                   key=lambda index: (sizes[index] is None, sign * (sizes[index] or 0), index))
+    return [zips_table[index] for index in order]
+
+
+def apply_byte_budget(zips_table: list, byte_budget: int) -> tuple:
+    """Split the samples into those that fit in a byte budget and those left for a later run.
+
+    Samples are taken in order whenever they still fit (first fit), so a big sample that does not fit
+    does not stop smaller ones after it. Samples whose size cannot be parsed never fit.
+
+    Args:
+        zips_table (list): the samples metadata, in download order (see order_zips_table).
+        byte_budget (int): how many bytes may be downloaded. None means no budget.
+
+    Returns:
+        (tuple): the scheduled samples and the deferred ones, both in the given order.
+    """
+    if byte_budget is None:
+        return list(zips_table), []
+    scheduled, deferred = [], []
+    remaining = byte_budget
+    for entry in zips_table:
+        size = parse_size(entry.get("size"))
+        if size is not None and size <= remaining:
+            scheduled.append(entry)
+            remaining -= size
+        else:
+            deferred.append(entry)
+    return scheduled, deferred
+
+
+PARTITION_SLACK = 0.1
+
+
+def _shard_preference(bs_link: str, num_shards: int) -> list:
+    """Rank the parts for a sample by the hash of its bsLink and the part index (rendezvous hashing)."""
+    return sorted(range(num_shards),
+                  key=lambda shard: hashlib.sha256(f"{shard}:{bs_link}".encode()).digest())
+
+
+def partition_zips_table(zips_table: list, num_shards: int, shard_index: int) -> list:
+    """Take one node's part of the samples, so that several nodes can split a download without talking.
+
+    Each sample goes to the first part of its own ranking of the parts, drawn from the hash of its bsLink
+    (rendezvous hashing), unless that part already holds its share of the bytes: the total size over
+    num_shards, plus PARTITION_SLACK of it. It then goes to the next part of its ranking with room left.
+    Samples are dealt in the order of their bsLink hash, so every node computes the same partition from the
+    same table, whatever its order, and no part exceeds its share by more than one sample. As the parts are
+    picked by hash rather than by the other samples' sizes, most samples keep their part when samples are
+    added to or removed from the table (only those pushed over a full part move). Samples whose size cannot
+    be parsed count as empty.
+
+    Args:
+        zips_table (list): the samples metadata (i.e., generated by fetch_zips_table).
+        num_shards (int): how many parts the samples are split into.
+        shard_index (int): which part, from 0 to num_shards - 1.
+
+    Raises:
+        ValueError: if shard_index is not in [0, num_shards).
+
+    Returns:
+        zips_table (list): the samples of the part, in table order.
+    """
+    if not 0 <= shard_index < num_shards:
+        raise ValueError('shard_index must be in [0, num_shards).')
+    sizes = [parse_size(entry.get("size")) or 0 for entry in zips_table]
+    capacity = (1 + PARTITION_SLACK) * sum(sizes) / num_shards
+    order = sorted(range(len(zips_table)),
+                   key=lambda index: (hashlib.sha256(zips_table[index]["bsLink"].encode()).digest(),
+                                      zips_table[index]["name"]))
+    loads = [0] * num_shards
+    assigned = set()
+    for index in order:
+        preference = _shard_preference(zips_table[index]["bsLink"], num_shards)
+        # the loads add up to less than the total size, so some part is always below its share
+        shard = next((shard for shard in preference if loads[shard] < capacity), preference[0])
+        loads[shard] += sizes[index]
+        if shard == shard_index:
+            assigned.add(index)
+    return [entry for index, entry in enumerate(zips_table) if index in assigned]
+
+
+class TokenBucket:
+    """Global bytes per second cap, shared by every download thread.
+
+    The bucket fills at rate bytes per second, up to burst bytes. Each chunk takes its size out of the bucket
+    and the caller sleeps while the bucket is in debt, so the total throughput of all threads stays at rate
+    on average however many workers there are.
+
+    Args:
+        rate (float): the allowed throughput, in bytes per second.
+        burst (float, optional): how many bytes may go through at once after an idle period. Defaults to rate
+            (one second worth of bytes).
+
+    Raises:
+        ValueError: if rate is not positive.
+    """
+
+    def __init__(self, rate: float, burst: float = None):
+        if rate <= 0:
+            raise ValueError('rate must be positive.')
+        self.rate = rate
+        self.burst = burst if burst is not None else rate
+        self._tokens = self.burst
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+
+    def consume(self, n_bytes: int) -> float:
+        """Take n_bytes out of the bucket, sleeping as long as needed to respect the rate.
+
+        Args:
+            n_bytes (int): the size of the chunk just received.
+
+        Returns:
+            delay (float): how long the caller slept, in seconds.
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._last) * self.rate)
+            self._last = now
+            self._tokens -= n_bytes
+            delay = -self._tokens / self.rate if self._tokens < 0 else 0.0
+        if delay > 0:
+            time.sleep(delay)
+        return delay
+
+
+class AdaptiveConcurrency:
+    """Limit on the downloads in flight, tuned from what the downloads observe (additive increase,
+    multiplicative decrease).
+
+    The controller watches the download events (see observer) and takes a decision every time a window of
+    downloads, as many as the current limit, has finished:
+
+    - when a download failed with a 5xx, a 429 or a network error, the limit is multiplied by decrease. Other
+      failures (e.g., a 404, a cut short body or a checksum mismatch) say nothing about the server load and are
+      left out, and a download counts once however many of its attempts failed;
+    - when the throughput did not grow while the time per byte of each download did, the server is queueing
+      requests, and the limit goes down by one;
+    - otherwise the limit goes up by one, to probe whether more parallelism helps.
+
+    Every decision is sent to on_event as a 'concurrency' event (limit, previous, reason, throughput, latency,
+    error_rate), so that it ends up in the metrics (see MetricsRecorder).
+
+    Args:
+        max_limit (int): the most downloads in flight, e.g. the size of the thread pool.
+        initial (int, optional): the starting limit. Defaults to 2 (or max_limit if lower).
+        min_limit (int, optional): the fewest downloads in flight. Defaults to 1.
+        decrease (float, optional): the factor applied to the limit when requests fail. Defaults to 0.5.
+        tolerance (float, optional): the relative change in throughput or latency that counts. Defaults to 0.1.
+        on_event (callable, optional): receives the 'concurrency' events. Defaults to None.
+
+    Raises:
+        ValueError: if the limits are not 1 <= min_limit <= max_limit.
+    """
+
+    def __init__(self,
+                 max_limit: int,
+                 initial: int = 2,
+                 min_limit: int = 1,
+                 decrease: float = 0.5,
+                 tolerance: float = 0.1,
+                 on_event=None):
+        if not 1 <= min_limit <= max_limit:
+            raise ValueError('the limits must satisfy 1 <= min_limit <= max_limit.')
+        self.max_limit = max_limit
+        self.min_limit = min_limit
+        self.limit = max(min_limit, min(initial, max_limit))
+        self.decrease = decrease
+        self.tolerance = tolerance
+        self.on_event = on_event
+        self.decisions = []
+        self._in_flight = 0
+        self._condition = threading.Condition()
+        # the downloads whose congestion was already counted, until they end
+        self._congested = set()
+        self._last_throughput = None
+        self._last_latency = None
+        self._reset_window()
+
+    def _reset_window(self) -> None:
+        self._window_start = time.monotonic()
+        self._n_finished = 0
+        self._n_errors = 0
+        self._bytes = 0
+        self._busy = 0.0
+
+    @contextmanager
+    def slot(self):
+        """Hold one of the limit's slots for the duration of a download, waiting for one if none is free."""
+        with self._condition:
+            while self._in_flight >= self.limit:
+                self._condition.wait()
+            self._in_flight += 1
+        try:
+            yield
+        finally:
+            with self._condition:
+                self._in_flight -= 1
+                self._condition.notify()
+
+    def observe(self, event: dict) -> None:
+        """Account for a download event (see MetricsRecorder), and decide on the limit at the end of a window.
+
+        Args:
+            event (dict): the event.
+        """
+        kind = event['event']
+        decision = None
+        with self._condition:
+            if kind == 'download_retry':
+                self._count_congestion(event['name'], event.get('cause'), event.get('status'))
+            elif kind == 'download_end' and event['status'] != 'cached':
+                self._n_finished += 1
+                self._bytes += event['bytes']
+                self._busy += event['elapsed']
+                if event['status'] == 'failed':
+                    self._count_congestion(event['name'], event.get('cause'), event.get('http_status'))
+                self._congested.discard(event['name'])
+            if kind == 'download_end' and self._n_finished >= self.limit:
+                decision = self._decide()
+                self._condition.notify_all()
+        if decision is not None:
+            emit(self.on_event, 'concurrency', **decision)
+
+    def _count_congestion(self, name: str, cause: str, http_status: int) -> None:
+        """Count a failed attempt as an error if it tells that the server is overloaded, once per download."""
+        overloaded = cause == 'network' or (cause == 'http' and (http_status == 429 or http_status >= 500))
+        if overloaded and name not in self._congested:
+            self._congested.add(name)
+            self._n_errors += 1
+
+    def observer(self, on_event=None):
+        """Get a callback that feeds the controller, then forwards every event to on_event.
+
+        Args:
+            on_event (callable, optional): the callback wrapped (e.g., a MetricsRecorder). Defaults to None.
+
+        Returns:
+            (callable): the callback to pass as on_event to the downloads.
+        """
+        def callback(event: dict) -> None:
+            self.observe(event)
+            if on_event is not None:
+                on_event(event)
+        return callback
+
+    def _decide(self) -> dict:
+        elapsed = time.monotonic() - self._window_start
+        throughput = self._bytes / elapsed if elapsed > 0 else 0.0
+        # seconds per MiB of each download, which grows when the server queues requests
+        latency = self._busy / (self._bytes / 1024 ** 2) if self._bytes > 0 else None
+        # the share of the downloads finished in the window that hit an overloaded server
+        error_rate = self._n_errors / self._n_finished
+        previous = self.limit
+        grew = self._last_throughput is None or throughput >= self._last_throughput * (1 + self.tolerance)
+        if self._n_errors > 0:
+            self.limit = max(self.min_limit, int(self.limit * self.decrease))
+            reason = 'errors'
+        elif not grew and latency is not None and self._last_latency is not None \
+                and latency > self._last_latency * (1 + self.tolerance):
+            self.limit = max(self.min_limit, self.limit - 1)
+            reason = 'latency'
+        else:
+            self.limit = min(self.max_limit, self.limit + 1)
+            reason = 'probe'
+        self._last_throughput = throughput
+        self._last_latency = latency
+        self._reset_window()
+        decision = {'limit': self.limit, 'previous': previous, 'reason': reason, 'throughput': throughput,
+                    'latency': latency, 'error_rate': error_rate}
+        self.decisions.append(decision)
+        return decision
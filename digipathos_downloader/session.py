@@ -0,0 +1,131 @@
+import random
+import time
+from dataclasses import dataclass
+from email.utils import parsedate_to_datetime
+
+import requests
+from requests.adapters import HTTPAdapter
+
+
+@dataclass
+class RetryPolicy:
+    """How failed requests are retried.
+
+    The n-th retry waits backoff_factor * 2 ** (n - 1) seconds, capped at backoff_max, plus a random
+    jitter of up to jitter times that delay. When the server sends a 'Retry-After' header, its value
+    is waited instead (also capped at backoff_max).
+
+    Args:
+        max_attempts (int, optional): how many times a request is tried. Defaults to 3.
+        backoff_factor (float, optional): the delay before the first retry, in seconds. Defaults to 0.5.
+        backoff_max (float, optional): the longest delay between attempts, in seconds. Defaults to 30.
+        jitter (float, optional): the random fraction added to each delay. Defaults to 0.5.
+        timeout (tuple, optional): the (connect, read) timeouts of each request, in seconds. Defaults to (10, 60).
+        retry_statuses (tuple, optional): the HTTP statuses worth retrying. Other error statuses fail right away.
+            Defaults to (408, 425, 429, 500, 502, 503, 504).
+    """
+    max_attempts: int = 3
+    backoff_factor: float = 0.5
+    backoff_max: float = 30.0
+    jitter: float = 0.5
+    timeout: tuple = (10, 60)
+    retry_statuses: tuple = (408, 425, 429, 500, 502, 503, 504)
+
+    def delay(self, attempt: int, response: requests.Response = None) -> float:
+        """Compute how long to wait before the next attempt.
+
+        Args:
+            attempt (int): how many attempts have failed so far (starting at 1).
+            response (requests.Response, optional): the failed response, if any. Defaults to None.
+
+        Returns:
+            delay (float): the waiting time in seconds.
+        """
+        retry_after = parse_retry_after(response.headers.get("Retry-After")) if response is not None else None
+        if retry_after is not None:
+            return min(retry_after, self.backoff_max)
+        delay = min(self.backoff_factor * 2 ** (attempt - 1), self.backoff_max)
+        return delay * (1 + random.uniform(0, self.jitter))
+
+    def wait(self, attempt: int, response: requests.Response = None) -> None:
+        """Sleep before the next attempt (see delay).
+
+        Args:
+            attempt (int): how many attempts have failed so far (starting at 1).
+            response (requests.Response, optional): the failed response, if any. Defaults to None.
+        """
+        time.sleep(self.delay(attempt, response))
+
+
+def parse_retry_after(value: str):
+    """Parse a 'Retry-After' header, given either in seconds or as an HTTP date.
+
+    Args:
+        value (str): the header value.
+
+    Returns:
+        seconds (float): how long the server asks to wait. None if the header is missing or malformed.
+    """
+    if value is None:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, retry_at.timestamp() - time.time())
+
+
+def create_session(pool_size: int = 10) -> requests.Session:
+    """Create an HTTP session whose connections are kept alive and reused across requests.
+
+    Args:
+        pool_size (int, optional): how many connections are kept per host. Should match the download concurrency. Defaults to 10.
+
+    Returns:
+        session (requests.Session): the session. It can be shared by threads.
+    """
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+def get_with_retries(session: requests.Session,
+                     url: str,
+                     retry_policy: RetryPolicy = None,
+                     **kwargs) -> requests.Response:
+    """Send a GET request, retrying connection errors and retryable statuses according to a policy.
+
+    Args:
+        session (requests.Session): the session used for the request. The requests module itself works too.
+        url (str): the requested url.
+        retry_policy (RetryPolicy, optional): how the request is retried. Defaults to RetryPolicy().
+        **kwargs: further arguments for session.get.
+
+    Returns:
+        response (requests.Response): the last response received. It may still be an error response.
+
+    Raises:
+        RequestException: raised when the last attempt fails without a response.
+    """
+    if retry_policy is None:
+        retry_policy = RetryPolicy()
+    kwargs.setdefault("timeout", retry_policy.timeout)
+    attempt = 1
+    while True:
+        try:
+            response = session.get(url, **kwargs)
+        except requests.exceptions.RequestException:
+            if attempt >= retry_policy.max_attempts:
+                raise
+            retry_policy.wait(attempt)
+        else:
+            if response.status_code not in retry_policy.retry_statuses or attempt >= retry_policy.max_attempts:
+                return response
+            retry_policy.wait(attempt, response)
+            response.close()
+        attempt += 1
@@ -0,0 +1,102 @@
+import hashlib
+import io
+import json
+import os
+import posixpath
+import tarfile
+
+from digipathos_downloader.reader import ZipDataset
+
+
+SHARDS_MANIFEST_NAME = 'shards.json'
+
+
+def class_balanced_order(dataset: ZipDataset) -> list:
+    """Interleave the classes so that every stretch of the output holds about as many images of each.
+
+    Images are taken round-robin over the classes (in class order), each class in index order, so the order
+    only depends on the archives' contents.
+
+    Args:
+        dataset (ZipDataset): the indexed images.
+
+    Returns:
+        order (list): the dataset indexes, in output order.
+    """
+    per_class = {label: [] for label in dataset.classes}
+    for index, (_, _, label, _) in enumerate(dataset.samples):
+        per_class[label].append(index)
+    queues = [per_class[label] for label in dataset.classes]
+    order = []
+    for position in range(max((len(queue) for queue in queues), default=0)):
+        order.extend(queue[position] for queue in queues if position < len(queue))
+    return order
+
+
+def _add_file(shard: tarfile.TarFile, name: str, data: bytes) -> None:
+    """Add a member with fixed metadata, so that the same input always gives the same bytes."""
+    info = tarfile.TarInfo(name)
+    info.size = len(data)
+    info.mtime = 0
+    info.mode = 0o644
+    shard.addfile(info, io.BytesIO(data))
+
+
+def write_shards(dataset: ZipDataset,
+                 output_dir: str,
+                 shard_size: int = 256 * 1024 * 1024,
+                 prefix: str = 'shard',
+                 verbose: bool = True) -> dict:
+    """Pack the images into tar shards readable by WebDataset-style loaders.
+
+    Each image becomes three members sharing a key: '<key>.<extension>' (the image bytes), '<key>.cls' (the
+    class id) and '<key>.json' (the label and where the image came from). Images are written in class-balanced
+    order (see class_balanced_order) and a new shard is started when the current one reaches shard_size bytes.
+    A manifest, 'shards.json', lists the classes and, for each shard, its name, number of images, size and sha256.
+
+    Args:
+        dataset (ZipDataset): the images, read straight from the downloaded archives.
+        output_dir (str): where the shards and the manifest are written. It must exist.
+        shard_size (int, optional): the size at which a shard is closed, in bytes. Defaults to 256 MiB.
+        prefix (str, optional): the shard names are '<prefix>-000000.tar', '<prefix>-000001.tar', etc. Defaults to 'shard'.
+        verbose (bool, optional): notify the user about the progress. Defaults to True.
+
+    Returns:
+        manifest (dict): the contents of 'shards.json'.
+    """
+    shards = []
+    shard = None
+
+    def close_shard() -> None:
+        shard.close()
+        path = os.path.join(output_dir, shards[-1]['name'])
+        file_hash = hashlib.sha256()
+        with open(path, "rb") as shard_file:
+            for block in iter(lambda: shard_file.read(1024 * 1024), b""):
+                file_hash.update(block)
+        shards[-1].update(size=os.path.getsize(path), sha256=file_hash.hexdigest())
+        if verbose:
+            print(f"Wrote {shards[-1]['name']} ({shards[-1]['n_samples']} images)...")
+
+    for key, index in enumerate(class_balanced_order(dataset)):
+        if shard is None or shard.fileobj.tell() >= shard_size:
+            if shard is not None:
+                close_shard()
+            shards.append({'name': f"{prefix}-{len(shards):06d}.tar", 'n_samples': 0})
+            shard = tarfile.open(os.path.join(output_dir, shards[-1]['name']), mode="w", format=tarfile.USTAR_FORMAT)
+        path, member, label, _ = dataset.samples[index]
+        _, data = dataset[index]
+        extension = posixpath.splitext(member)[1].lower().lstrip('.') or 'bin'
+        _add_file(shard, f"{key:09d}.{extension}", data)
+        _add_file(shard, f"{key:09d}.cls", str(dataset.class_to_idx[label]).encode())
+        _add_file(shard, f"{key:09d}.json",
+                  json.dumps({'label': label, 'archive': os.path.basename(path), 'member': member}).encode())
+        shards[-1]['n_samples'] += 1
+    if shard is not None:
+        close_shard()
+    manifest = {'classes': dataset.classes,
+                'n_samples': sum(entry['n_samples'] for entry in shards),
+                'shards': shards}
+    with open(os.path.join(output_dir, SHARDS_MANIFEST_NAME), "w") as manifest_file:
+        json.dump(manifest, manifest_file, indent=2)
+    return manifest
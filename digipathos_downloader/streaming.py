@@ -0,0 +1,163 @@
+import os
+import struct
+import zipfile
+import zlib
+
+
+LOCAL_HEADER_SIGNATURE = b"PK\x03\x04"
+CENTRAL_HEADER_SIGNATURE = b"PK\x01\x02"
+END_OF_CENTRAL_DIR_SIGNATURE = b"PK\x05\x06"
+DATA_DESCRIPTOR_SIGNATURE = b"PK\x07\x08"
+LOCAL_HEADER = struct.Struct("<4sHHHHHIIIHH")
+
+
+class UnstreamableZipError(Exception):
+    """Raised when a member of a ZIP-file cannot be extracted from a stream, although the file may be valid.
+
+    The archive can still be extracted once it is on disk, with zipfile (see download_and_extract_zip).
+    """
+
+
+class _ChunkReader:
+    """Reads exact amounts of bytes out of an iterator of byte chunks.
+
+    Args:
+        chunks (iterator): the byte chunks (e.g., response.iter_content()).
+    """
+
+    def __init__(self, chunks):
+        self._chunks = iter(chunks)
+        self._buffer = b""
+
+    def read(self, size: int) -> bytes:
+        """Read exactly size bytes.
+
+        Raises:
+            BadZipFile: raised when the stream ends first.
+        """
+        while len(self._buffer) < size:
+            chunk = next(self._chunks, None)
+            if chunk is None:
+                raise zipfile.BadZipFile("Unexpected end of the ZIP stream")
+            self._buffer += chunk
+        data, self._buffer = self._buffer[:size], self._buffer[size:]
+        return data
+
+    def read_some(self) -> bytes:
+        """Read whatever is buffered, or the next chunk. Returns b'' at the end of the stream."""
+        if not self._buffer:
+            self._buffer = next(self._chunks, b"")
+        data, self._buffer = self._buffer, b""
+        return data
+
+    def unread(self, data: bytes) -> None:
+        """Put bytes back in front of the stream."""
+        self._buffer = data + self._buffer
+
+
+def safe_path(dest_dir: str, member_name: str) -> str:
+    """Map a member name to a path inside dest_dir, dropping absolute parts and '..' as ZipFile.extractall does."""
+    parts = [part for part in member_name.replace('\\', '/').split('/') if part not in ('', '.', '..')]
+    return os.path.join(dest_dir, *parts) if parts else dest_dir
+
+
+def _zip64_sizes(extra: bytes) -> tuple:
+    """Read the (uncompressed, compressed) sizes of a ZIP64 extra field. Returns None if there is none."""
+    while len(extra) >= 4:
+        header_id, length = struct.unpack("<HH", extra[:4])
+        if header_id == 0x0001 and length >= 16:
+            return struct.unpack("<QQ", extra[4:20])
+        extra = extra[4 + length:]
+    return None
+
+
+def extract_stream(chunks, dest_dir: str) -> list:
+    """Extract a ZIP-file while it is being received, reading its local file headers in order.
+
+    Only the bytes of the member being written are kept in memory; the central directory at the end of
+    the archive is not needed. Stored and deflated members are supported, with or without data descriptors
+    (except stored members with data descriptors, whose end cannot be told from the stream). Encrypted members
+    are not supported.
+
+    Args:
+        chunks (iterator): the archive bytes, in chunks (e.g., response.iter_content(chunk_size)).
+        dest_dir (str): the folder the members are extracted to.
+
+    Returns:
+        names (list): the extracted members' names.
+
+    Raises:
+        BadZipFile: raised when the stream is not a valid ZIP-file or a member fails its CRC check.
+        UnstreamableZipError: raised for members the stream cannot be extracted from (see above). The members
+            before them are already extracted.
+    """
+    reader = _ChunkReader(chunks)
+    names = []
+    while True:
+        signature = reader.read(4)
+        if signature in (CENTRAL_HEADER_SIGNATURE, END_OF_CENTRAL_DIR_SIGNATURE):
+            break
+        if signature != LOCAL_HEADER_SIGNATURE:
+            raise zipfile.BadZipFile("Bad local file header signature")
+        (_, _, flags, method, _, _, crc, compressed_size, file_size,
+         name_length, extra_length) = LOCAL_HEADER.unpack(signature + reader.read(LOCAL_HEADER.size - 4))
+        raw_name = reader.read(name_length)
+        extra = reader.read(extra_length)
+        name = raw_name.decode("utf-8" if flags & 0x800 else "cp437")
+        if flags & 0x1:
+            raise UnstreamableZipError(f"Encrypted member {name} cannot be extracted")
+        zip64_sizes = _zip64_sizes(extra)
+        if zip64_sizes is not None and not flags & 0x08:
+            file_size, compressed_size = zip64_sizes
+        has_descriptor = bool(flags & 0x08)
+        if method not in (zipfile.ZIP_STORED, zipfile.ZIP_DEFLATED):
+            raise UnstreamableZipError(f"Compression method {method} of {name} is not supported")
+        if has_descriptor and method == zipfile.ZIP_STORED:
+            raise UnstreamableZipError(f"Stored member {name} with a data descriptor cannot be streamed")
+
+        path = safe_path(dest_dir, name)
+        is_dir = name.endswith('/')
+        if is_dir:
+            os.makedirs(path, exist_ok=True)
+        else:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        actual_crc = 0
+        with open(os.devnull if is_dir else path, "wb") as member_file:
+            if method == zipfile.ZIP_STORED:
+                remaining = compressed_size
+                while remaining > 0:
+                    data = reader.read_some()
+                    if not data:
+                        raise zipfile.BadZipFile("Unexpected end of the ZIP stream")
+                    data, rest = data[:remaining], data[remaining:]
+                    reader.unread(rest)
+                    remaining -= len(data)
+                    actual_crc = zlib.crc32(data, actual_crc)
+                    member_file.write(data)
+            else:
+                decompressor = zlib.decompressobj(-zlib.MAX_WBITS)
+                remaining = None if has_descriptor else compressed_size
+                while not decompressor.eof:
+                    data = reader.read_some()
+                    if not data:
+                        raise zipfile.BadZipFile("Unexpected end of the ZIP stream")
+                    if remaining is not None:
+                        data, rest = data[:remaining], data[remaining:]
+                        reader.unread(rest)
+                        remaining -= len(data)
+                    output = decompressor.decompress(data)
+                    actual_crc = zlib.crc32(output, actual_crc)
+                    member_file.write(output)
+                    if remaining == 0 and not decompressor.eof:
+                        raise zipfile.BadZipFile(f"Truncated deflate stream in {name}")
+                reader.unread(decompressor.unused_data)
+        if has_descriptor:
+            descriptor = reader.read(4)
+            if descriptor == DATA_DESCRIPTOR_SIGNATURE:
+                descriptor = reader.read(4)
+            crc = struct.unpack("<I", descriptor)[0]
+            reader.read(16 if zip64_sizes is not None else 8)
+        if actual_crc != crc:
+            raise zipfile.BadZipFile(f"Bad CRC-32 for member {name}")
+        names.append(name)
+    return names
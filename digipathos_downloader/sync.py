@@ -0,0 +1,121 @@
+import json
+import os
+
+
+def default_catalog_path(data_dir: str) -> str:
+    """Path of the local catalog of a dataset directory. It sits next to the directory, not inside it,
+    so the dataset folder keeps holding class folders only.
+
+    Args:
+        data_dir (str): the directory where the images are downloaded to.
+
+    Returns:
+        catalog_path (str): '<data_dir>.catalog.json'.
+    """
+    return data_dir.rstrip('/') + '.catalog.json'
+
+
+def shard_catalog_path(data_dir: str, shard_index: int, num_shards: int) -> str:
+    """Path of the catalog written by one node of a sharded download (see get_dataset's num_shards), so that
+    nodes sharing data_dir do not overwrite each other's catalog.
+
+    Args:
+        data_dir (str): the directory where the images are downloaded to.
+        shard_index (int): the node's part.
+        num_shards (int): how many parts the samples are split into.
+
+    Returns:
+        catalog_path (str): '<data_dir>.shard-<shard_index>-of-<num_shards>.catalog.json'.
+    """
+    return data_dir.rstrip('/') + f'.shard-{shard_index:05d}-of-{num_shards:05d}.catalog.json'
+
+
+def load_local_catalog(catalog_path: str) -> dict:
+    """Read the catalog written by the previous run.
+
+    Args:
+        catalog_path (str): path for the catalog file.
+
+    Returns:
+        catalog (dict): the installed samples' metadata keyed by 'bsLink'. Empty if there is no catalog yet.
+    """
+    if not os.path.exists(catalog_path):
+        return {}
+    with open(catalog_path, "r") as catalog_file:
+        return {entry["bsLink"]: entry for entry in json.load(catalog_file)}
+
+
+def save_local_catalog(catalog_path: str, zips_table: list) -> None:
+    """Atomically write the samples currently installed in a dataset directory.
+
+    Args:
+        catalog_path (str): path for the catalog file.
+        zips_table (list): the installed samples' metadata.
+    """
+    tmp_path = catalog_path + '.tmp'
+    with open(tmp_path, "w") as catalog_file:
+        json.dump(sorted(zips_table, key=lambda entry: entry["bsLink"]), catalog_file, indent=1)
+    os.replace(tmp_path, catalog_path)
+
+
+def diff_zips_tables(zips_table: list, catalog: dict) -> tuple:
+    """Compare the remote zips table against the local catalog.
+
+    A sample is new or changed when its 'bsLink' (which carries the bitstream sequence number) is not in
+    the catalog, or when its 'size' differs. A sample is removed when no remote entry has its name anymore;
+    a sample re-uploaded under a new link is reported as changed, not as removed.
+
+    Args:
+        zips_table (list): the remote samples' metadata (i.e., generated by fetch_zips_table).
+        catalog (dict): the installed samples' metadata (i.e., generated by load_local_catalog).
+
+    Returns:
+        (tuple): the remote entries to be downloaded (changed) and the catalog entries gone upstream (removed).
+    """
+    changed = [entry for entry in zips_table
+               if entry["bsLink"] not in catalog or catalog[entry["bsLink"]]["size"] != entry["size"]]
+    remote_names = {entry["name"] for entry in zips_table}
+    removed = [entry for entry in catalog.values() if entry["name"] not in remote_names]
+    return changed, removed
+
+
+def merge_catalogs(catalog_paths: list, catalog_path: str) -> list:
+    """Combine the catalogs of a sharded download into the catalog of the whole dataset directory.
+
+    Args:
+        catalog_paths (list): paths for the nodes' catalogs (see shard_catalog_path).
+        catalog_path (str): path for the merged catalog (e.g., default_catalog_path(data_dir)).
+
+    Raises:
+        FileNotFoundError: if a node has not written its catalog yet.
+        ValueError: if two nodes installed the same sample from different links.
+
+    Returns:
+        zips_table (list): the merged catalog entries.
+    """
+    merged = {}
+    links = {}
+    for path in catalog_paths:
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"{path} is missing: its node has not finished yet.")
+        for link, entry in load_local_catalog(path).items():
+            if links.setdefault(entry["name"], link) != link:
+                raise ValueError(f"{entry['name']} was installed from both {links[entry['name']]} and {link}.")
+            merged[link] = entry
+    save_local_catalog(catalog_path, list(merged.values()))
+    return sorted(merged.values(), key=lambda entry: entry["bsLink"])
+
+
+def merge_shard_catalogs(data_dir: str, num_shards: int) -> list:
+    """Merge the catalogs written by the num_shards nodes of a sharded download of data_dir into its
+    default catalog, so that later runs (e.g., sync) see one dataset.
+
+    Args:
+        data_dir (str): the directory where the images were downloaded to.
+        num_shards (int): how many parts the samples were split into.
+
+    Returns:
+        zips_table (list): the merged catalog entries.
+    """
+    return merge_catalogs([shard_catalog_path(data_dir, index, num_shards) for index in range(num_shards)],
+                          default_catalog_path(data_dir))
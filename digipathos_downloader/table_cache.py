@@ -0,0 +1,79 @@
+import hashlib
+import json
+import os
+import time
+
+
+def table_cache_path(cache_dir: str, url: str) -> str:
+    """Path of the cached zips table of a given list url.
+
+    Args:
+        cache_dir (str): the cache directory.
+        url (str): the full list url (base_url + list_url).
+
+    Returns:
+        path (str): '<cache_dir>/tables/<hash of url>.json'.
+    """
+    return os.path.join(cache_dir, 'tables', hashlib.sha256(url.encode()).hexdigest()[:16] + '.json')
+
+
+def load_cached_table(cache_dir: str, url: str) -> dict:
+    """Read a cached zips table.
+
+    Args:
+        cache_dir (str): the cache directory.
+        url (str): the full list url.
+
+    Returns:
+        cached (dict): the 'bitstreams', when they were fetched ('fetched_at', a unix time) and the validators
+            sent by the server ('etag' and 'last_modified', possibly None). None if nothing is cached.
+    """
+    try:
+        with open(table_cache_path(cache_dir, url), "r") as table_file:
+            return json.load(table_file)
+    except (OSError, ValueError):
+        return None
+
+
+def save_cached_table(cache_dir: str,
+                      url: str,
+                      bitstreams: list,
+                      etag: str = None,
+                      last_modified: str = None,
+                      fetched_at: float = None) -> None:
+    """Atomically write a zips table to the cache.
+
+    Args:
+        cache_dir (str): the cache directory.
+        url (str): the full list url.
+        bitstreams (list): the table entries, as served.
+        etag (str, optional): the 'ETag' header of the response. Defaults to None.
+        last_modified (str, optional): the 'Last-Modified' header of the response. Defaults to None.
+        fetched_at (float, optional): when the table was fetched or revalidated. Defaults to now.
+    """
+    path = table_cache_path(cache_dir, url)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    cached = {'url': url,
+              'fetched_at': time.time() if fetched_at is None else fetched_at,
+              'etag': etag,
+              'last_modified': last_modified,
+              'bitstreams': bitstreams}
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w") as table_file:
+        json.dump(cached, table_file)
+    os.replace(tmp_path, path)
+
+
+def is_fresh(cached: dict, ttl: float) -> bool:
+    """Check whether a cached table can be used without asking the server.
+
+    Args:
+        cached (dict): the cached table (see load_cached_table).
+        ttl (float): how long a table stays fresh, in seconds. None means forever.
+
+    Returns:
+        (bool): True if the table is younger than ttl.
+    """
+    if cached is None:
+        return False
+    return ttl is None or time.time() - cached['fetched_at'] < ttl
@@ -0,0 +1,155 @@
+import io
+import os
+import posixpath
+import zipfile
+
+from digipathos_downloader.streaming import safe_path
+
+
+RESIZE_MODES = ('fit', 'crop', 'shorter')
+FORMAT_EXTENSIONS = {'JPEG': '.jpg', 'PNG': '.png', 'WEBP': '.webp'}
+
+
+class ResizeTransform:
+    """Decode an image, resize it and encode it again, the same way every time.
+
+    Meant for the transform argument of unpack_zip, unpack_zips and get_dataset. Instances only hold plain
+    settings, so they can be sent to worker processes. Needs Pillow, which is an optional extra
+    (pip install 'digipathos-downloader[images]').
+
+    The output only depends on the input bytes and the settings: a fixed resampling filter and encoder options,
+    and no metadata (EXIF, timestamps) copied over.
+
+    The images get the extension of the output format, so two members whose names only differ by their extension
+    (e.g., 'a.png' and 'a.jpg') would be written to the same file. Extraction refuses such archives instead of
+    overwriting one image with the other (see extract_transformed).
+
+    Args:
+        size (int or tuple): the target (width, height), or a single number for a square.
+        mode (str, optional): 'fit' to fit inside size keeping the aspect ratio, 'crop' to fill size and
+            center crop the overflow, or 'shorter' to scale the shorter side to min(size). Defaults to 'crop'.
+        image_format (str, optional): the output format: 'JPEG', 'PNG' or 'WEBP'. Defaults to 'JPEG'.
+        quality (int, optional): the JPEG/WEBP quality. Defaults to 90.
+        on_error (str, optional): what to do with members that cannot be decoded: 'copy' them as they are,
+            'skip' them or 'raise'. Defaults to 'copy'.
+
+    Raises:
+        ValueError: for an unknown mode, format or on_error.
+    """
+
+    def __init__(self,
+                 size,
+                 mode: str = 'crop',
+                 image_format: str = 'JPEG',
+                 quality: int = 90,
+                 on_error: str = 'copy'):
+        if mode not in RESIZE_MODES:
+            raise ValueError(f"mode must be one of {RESIZE_MODES}, not {mode!r}.")
+        if image_format not in FORMAT_EXTENSIONS:
+            raise ValueError(f"image_format must be one of {tuple(FORMAT_EXTENSIONS)}, not {image_format!r}.")
+        if on_error not in ('copy', 'skip', 'raise'):
+            raise ValueError(f"on_error must be 'copy', 'skip' or 'raise', not {on_error!r}.")
+        self.size = (size, size) if isinstance(size, int) else tuple(size)
+        self.mode = mode
+        self.image_format = image_format
+        self.quality = quality
+        self.on_error = on_error
+
+    def __call__(self, name: str, data: bytes) -> tuple:
+        """Transform one image.
+
+        Args:
+            name (str): the member name (e.g., 'IMG_0001.JPG').
+            data (bytes): the member contents.
+
+        Raises:
+            ImportError: if Pillow is not installed.
+            OSError: if the image cannot be decoded and on_error is 'raise'.
+
+        Returns:
+            (tuple): the new name (with the extension of the output format) and contents. None to skip the member.
+        """
+        try:
+            from PIL import Image, ImageOps
+        except ImportError:
+            raise ImportError("ResizeTransform needs Pillow. Install it with: pip install 'digipathos-downloader[images]'")
+        try:
+            with Image.open(io.BytesIO(data)) as image:
+                image = ImageOps.exif_transpose(image)
+                if self.image_format == 'JPEG' or image.mode not in ('RGB', 'RGBA', 'L'):
+                    image = image.convert('RGB')
+                image = self._resize(image)
+                output = io.BytesIO()
+                options = {'quality': self.quality} if self.image_format in ('JPEG', 'WEBP') else {}
+                image.save(output, format=self.image_format, **options)
+        except (OSError, SyntaxError, ValueError):
+            if self.on_error == 'raise':
+                raise
+            return (name, data) if self.on_error == 'copy' else None
+        return posixpath.splitext(name)[0] + FORMAT_EXTENSIONS[self.image_format], output.getvalue()
+
+    def _resize(self, image):
+        from PIL import Image, ImageOps
+        width, height = self.size
+        if self.mode == 'crop':
+            return ImageOps.fit(image, (width, height), method=Image.BICUBIC, centering=(0.5, 0.5))
+        if self.mode == 'fit':
+            scale = min(width / image.width, height / image.height)
+        else:
+            scale = min(width, height) / min(image.width, image.height)
+        new_size = (max(1, round(image.width * scale)), max(1, round(image.height * scale)))
+        return image.resize(new_size, Image.BICUBIC)
+
+    def __repr__(self) -> str:
+        return (f"ResizeTransform(size={self.size}, mode={self.mode!r}, image_format={self.image_format!r}, "
+                f"quality={self.quality}, on_error={self.on_error!r})")
+
+
+def claim_output_path(sources: dict, path: str, member_name: str) -> None:
+    """Record which member a transformed file comes from, so that two members are never written to one path.
+
+    Args:
+        sources (dict): the paths claimed so far for the archive, mapped to their members. Updated in place.
+        path (str): the path the member is about to be written to.
+        member_name (str): the member name.
+
+    Raises:
+        ValueError: if another member of the archive was already transformed into path.
+    """
+    # dict.setdefault is atomic, so extraction threads may share sources
+    source = sources.setdefault(os.path.normcase(path), member_name)
+    if source != member_name:
+        raise ValueError(f"the transform writes both {source} and {member_name} to {path}")
+
+
+def extract_transformed(zip_contents: zipfile.ZipFile, dest_dir: str, transform) -> list:
+    """Extract every member of an archive through a transform, instead of ZipFile.extractall.
+
+    Args:
+        zip_contents (zipfile.ZipFile): the opened archive.
+        dest_dir (str): the folder the members are written to (e.g., the class folder).
+        transform (callable): takes a member name and its bytes, returns the new (name, bytes), or None to
+            leave the member out (see ResizeTransform).
+
+    Raises:
+        ValueError: if two members are transformed into the same file (see claim_output_path).
+
+    Returns:
+        names (list): the paths written.
+    """
+    names = []
+    sources = {}
+    for member in zip_contents.infolist():
+        if member.is_dir():
+            continue
+        transformed = transform(member.filename, zip_contents.read(member))
+        if transformed is None:
+            continue
+        name, data = transformed
+        path = safe_path(dest_dir, name)
+        claim_output_path(sources, path, member.filename)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "wb") as output_file:
+            output_file.write(data)
+        names.append(path)
+    return names
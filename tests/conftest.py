@@ -1,5 +1,7 @@
 import pytest
 
+from stub_server import StubServer, make_zip
+
 @pytest.fixture
 def short_zips_table():
     """an excerpt of zips_table containing metadata from only three sample images.
@@ -42,4 +44,18 @@ def broken_zips_table():
          'bsLink': 'empty_empty',
          'name': 'Abacaxi (Pineapple) - Podridão (Black Rot) - 1.zip',
          'format': 'ZIP'}]
-    return broken_zips
\ No newline at end of file
+    return broken_zips
+
+@pytest.fixture
+def stub_server():
+    """a local stand-in for the digipathos website serving three small synthetic ZIP-files.
+
+    Yields:
+        server (StubServer): the running server. Its base_url, list_url and zips_table mimic the real website.
+    """
+    names = ['Abacaxi (Pineapple) - Broca (Pineapple Fruit Borer) - 1.zip',
+             'Abacaxi (Pineapple) - Fusariose (Fusariose) - 1.zip',
+             'Abacaxi (Pineapple) - Podridão (Black Rot) - 1.zip']
+    archives = {name: make_zip(seed=index) for index, name in enumerate(names)}
+    with StubServer(archives) as server:
+        yield server
@@ -0,0 +1,178 @@
+import hashlib
+import io
+import json
+import random
+import threading
+import time
+import zipfile
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, quote, urlsplit
+
+
+LIST_URL = "/jspui/zipsincollection/123456789/3"
+
+
+def make_zip(n_members: int = 3, member_size: int = 1024, seed: int = 0) -> bytes:
+    """Build an in-memory ZIP-file filled with pseudo-random "images".
+
+    Args:
+        n_members (int, optional): number of members in the archive. Defaults to 3.
+        member_size (int, optional): size in bytes of each member. Defaults to 1024.
+        seed (int, optional): seed for the member contents. Defaults to 0.
+
+    Returns:
+        (bytes): the archive contents.
+    """
+    rng = random.Random(seed)
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, mode="w", compression=zipfile.ZIP_DEFLATED) as zip_contents:
+        for index in range(n_members):
+            zip_contents.writestr(f"IMG_{index:04d}.jpg", rng.randbytes(member_size))
+    return buffer.getvalue()
+
+
+def make_zips_table(names: list, archives: dict) -> list:
+    """Build a zips table resembling the one served by the digipathos website.
+
+    Args:
+        names (list): the ZIP-file names.
+        archives (dict): maps every name to its contents.
+
+    Returns:
+        zips_table (list): a list containing the archives' metadata.
+    """
+    zips_table = []
+    for index, name in enumerate(names):
+        size = len(archives[name])
+        zips_table.append({'size': f"{size / 1024:.2f} kB",
+                           'bsLink': f"/jspui/bitstream/123456789/{index}/1/{quote(name)}",
+                           'name': name,
+                           'format': 'ZIP'})
+    return zips_table
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    """Serves the zips table and the bitstreams held by the server.
+
+    The table honors the 'offset' and 'limit' query parameters (unless the server paging is off, in which case
+    the offset is ignored) and 'If-None-Match' revalidation.
+    Bitstreams honor 'Range: bytes=<start>-[<end>]' and 'Range: bytes=-<length>' requests. Every answer
+    is delayed by the server latency and sent no faster than its bandwidth, and bitstreams fail with a 503
+    at the server failure rate.
+    """
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        parts = urlsplit(self.path)
+        self.server.requests_log.append(self.path)
+        if self.server.latency:
+            time.sleep(self.server.latency)
+        failures = self.server.failures.get(parts.path)
+        if not failures and parts.path in self.server.bitstreams and self.server.should_fail():
+            failures = [(503, {"Retry-After": "0"})]
+        if failures:
+            status, headers = failures.pop(0)
+            self._send(status, b"Injected failure", "text/plain", headers)
+        elif parts.path == self.server.list_url:
+            etag = '"' + hashlib.sha256(json.dumps(self.server.zips_table).encode()).hexdigest()[:16] + '"'
+            if self.headers.get("If-None-Match") == etag:
+                self._send(304, b"", "application/json", {"ETag": etag})
+                return
+            query = parse_qs(parts.query)
+            offset = int(query.get("offset", ["0"])[0]) if self.server.paging else 0
+            limit = int(query.get("limit", ["100000"])[0])
+            body = json.dumps({"bitstreams": self.server.zips_table[offset:offset + limit]}).encode()
+            self._send(200, body, "application/json", {"ETag": etag})
+        elif parts.path in self.server.bitstreams:
+            body = self.server.bitstreams[parts.path]
+            range_header = self.headers.get("Range")
+            self.server.ranges_log.append(range_header)
+            if range_header is None:
+                self._send(200, body, "application/zip")
+                return
+            first, last = range_header.split("=")[1].split("-")
+            if first == "":
+                # suffix range: the last bytes of the body
+                start, end = max(0, len(body) - int(last)), len(body) - 1
+            else:
+                start, end = int(first), min(int(last), len(body) - 1) if last else len(body) - 1
+            if start >= len(body):
+                self._send(416, b"", "application/zip", {"Content-Range": f"bytes */{len(body)}"})
+            else:
+                self._send(206, body[start:end + 1], "application/zip",
+                           {"Content-Range": f"bytes {start}-{end}/{len(body)}"})
+        else:
+            self._send(404, b"Not found", "text/plain")
+
+    def _send(self, status: int, body: bytes, content_type: str, headers: dict = None):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        if not self.server.bandwidth:
+            self.wfile.write(body)
+            return
+        # send 10 slices per second to emulate a slow link
+        step = max(1, int(self.server.bandwidth / 10))
+        for start in range(0, len(body), step):
+            time.sleep(len(body[start:start + step]) / self.server.bandwidth)
+            self.wfile.write(body[start:start + step])
+
+
+class StubServer(ThreadingHTTPServer):
+    """Local stand-in for the digipathos website.
+
+    Args:
+        archives (dict): maps ZIP-file names to their contents.
+        list_url (str, optional): path serving the zips table. Defaults to LIST_URL.
+        latency (float, optional): seconds waited before answering any request. Defaults to 0.
+        bandwidth (float, optional): bytes per second of each response. Defaults to None (unlimited).
+        failure_rate (float, optional): probability of a bitstream request failing with a 503. Defaults to 0.
+        seed (int, optional): seed for the random failures. Defaults to 0.
+    """
+    daemon_threads = True
+
+    def __init__(self,
+                 archives: dict,
+                 list_url: str = LIST_URL,
+                 latency: float = 0,
+                 bandwidth: float = None,
+                 failure_rate: float = 0,
+                 seed: int = 0):
+        super().__init__(("127.0.0.1", 0), StubHandler)
+        self.list_url = list_url
+        self.latency = latency
+        self.bandwidth = bandwidth
+        self.failure_rate = failure_rate
+        # whether the table honors the 'offset' query parameter
+        self.paging = True
+        self._rng = random.Random(seed)
+        self._rng_lock = threading.Lock()
+        self.archives = archives
+        self.zips_table = make_zips_table(list(archives), archives)
+        self.bitstreams = {entry["bsLink"]: archives[entry["name"]] for entry in self.zips_table}
+        self.requests_log = []
+        self.ranges_log = []
+        # maps a path to the (status, headers) answers served before the real contents
+        self.failures = {}
+        self.base_url = f"http://127.0.0.1:{self.server_address[1]}"
+        self._thread = threading.Thread(target=self.serve_forever, daemon=True)
+
+    def should_fail(self) -> bool:
+        """Draw whether the next bitstream request fails, at the failure rate."""
+        if not self.failure_rate:
+            return False
+        with self._rng_lock:
+            return self._rng.random() < self.failure_rate
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.shutdown()
+        self.server_close()
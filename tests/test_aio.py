@@ -0,0 +1,143 @@
+import asyncio
+import threading
+
+import pytest
+
+from digipathos_downloader.download import fetch_zips_table
+from digipathos_downloader.manifest import DownloadManifest
+from digipathos_downloader.session import RetryPolicy
+from digipathos_downloader.sync import default_catalog_path, load_local_catalog
+
+pytest.importorskip("aiohttp")
+from digipathos_downloader import aio, download  # noqa: E402
+from digipathos_downloader.aio import adownload_zips, afetch_zips_table, aget_dataset  # noqa: E402
+
+
+def test_afetch_zips_table(stub_server):
+    """assert the async table matches the blocking one, page by page.
+
+    Args:
+        stub_server (StubServer): local stand-in for the digipathos website.
+    """
+    zips_table = asyncio.run(afetch_zips_table('all', base_url=stub_server.base_url, list_url=stub_server.list_url,
+                                               page_size=1, page_workers=2))
+
+    assert zips_table == fetch_zips_table('all', base_url=stub_server.base_url, list_url=stub_server.list_url)
+
+def test_afetch_zips_table_ignored_offset(stub_server):
+    """assert a server ignoring the offset makes the async table raise instead of paging forever.
+
+    Args:
+        stub_server (StubServer): local stand-in for the digipathos website.
+    """
+    stub_server.paging = False
+    with pytest.raises(aio.aiohttp.ClientError):
+        asyncio.run(afetch_zips_table('all', base_url=stub_server.base_url, list_url=stub_server.list_url,
+                                      page_size=1))
+
+def test_adownload_zips(stub_server, tmp_path):
+    """assert samples are downloaded concurrently, failures retried and reported in table order.
+
+    Args:
+        stub_server (StubServer): local stand-in for the digipathos website.
+        tmp_path (Path): pytest temporary folder.
+    """
+    first, second, third = stub_server.zips_table
+    stub_server.failures[first['bsLink']] = [(503, {})]
+    stub_server.failures[third['bsLink']] = [(404, {})]
+    not_downloaded = asyncio.run(adownload_zips(stub_server.zips_table, str(tmp_path), verbose=False,
+                                                base_url=stub_server.base_url, max_concurrency=2,
+                                                retry_policy=RetryPolicy(backoff_factor=0, jitter=0)))
+
+    assert not_downloaded == [stub_server.base_url + '/' + third['bsLink']]
+    for entry in (first, second):
+        assert (tmp_path / entry['name']).read_bytes() == stub_server.archives[entry['name']]
+
+def test_aget_dataset(stub_server, tmp_path):
+    """assert two jobs share one event loop and extract every sample.
+
+    Args:
+        stub_server (StubServer): local stand-in for the digipathos website.
+        tmp_path (Path): pytest temporary folder.
+    """
+    async def two_jobs():
+        return await asyncio.gather(*(aget_dataset(str(tmp_path / f'dataset_{index}'), str(tmp_path / f'tmp_{index}'),
+                                                   name_filter='all', verbose=False, base_url=stub_server.base_url,
+                                                   list_url=stub_server.list_url, extract_workers=2)
+                                      for index in range(2)))
+
+    for index, info in enumerate(asyncio.run(two_jobs())):
+        assert info['not_downloaded'] is None and info['failed_unzips_list'] is None
+        assert info['validation']['n_zips_in_tmp'] == 3
+        assert sorted(folder.name for folder in (tmp_path / f'dataset_{index}').iterdir()) == \
+            sorted(entry['name'][:-4] for entry in stub_server.zips_table)
+        assert not (tmp_path / f'tmp_{index}').exists()
+
+def test_aget_dataset_timeout(stub_server, tmp_path):
+    """assert a timed out job keeps its partial downloads, and a resumed one finishes them.
+
+    Args:
+        stub_server (StubServer): local stand-in for the digipathos website.
+        tmp_path (Path): pytest temporary folder.
+    """
+    dataset_dir, tmp_dir = str(tmp_path / 'dataset_dir'), str(tmp_path / 'tmp')
+    stub_server.bandwidth = 5000
+    with pytest.raises(asyncio.TimeoutError):
+        asyncio.run(aget_dataset(dataset_dir, tmp_dir, name_filter='all', verbose=False,
+                                 base_url=stub_server.base_url, list_url=stub_server.list_url, timeout=0.2))
+
+    assert any(entry['status'] == 'partial' for entry in DownloadManifest(tmp_dir).entries.values())
+    stub_server.bandwidth = None
+    info = asyncio.run(aget_dataset(dataset_dir, tmp_dir, name_filter='all', verbose=False, resume=True,
+                                    base_url=stub_server.base_url, list_url=stub_server.list_url))
+    assert info['not_downloaded'] is None
+    assert len(list((tmp_path / 'dataset_dir').iterdir())) == 3
+
+def test_aget_dataset_resume_catalog(stub_server, tmp_path):
+    """assert a resumed job catalogs the samples the interrupted one extracted, without downloading them again.
+
+    Args:
+        stub_server (StubServer): local stand-in for the digipathos website.
+        tmp_path (Path): pytest temporary folder.
+    """
+    dataset_dir, tmp_dir = tmp_path / 'dataset_dir', tmp_path / 'tmp'
+    first = stub_server.zips_table[0]
+    (dataset_dir / first['name'][:-4]).mkdir(parents=True)
+    tmp_dir.mkdir()
+    manifest = DownloadManifest(str(tmp_dir))
+    manifest.update(first['bsLink'], name=first['name'], status='extracted', save=True)
+    asyncio.run(aget_dataset(str(dataset_dir), str(tmp_dir), name_filter='all', verbose=False, resume=True,
+                             base_url=stub_server.base_url, list_url=stub_server.list_url))
+
+    assert first['bsLink'] not in stub_server.requests_log
+    assert load_local_catalog(default_catalog_path(str(dataset_dir))) == \
+        {entry['bsLink']: entry for entry in stub_server.zips_table}
+
+def test_aget_dataset_disk_work_off_the_loop(stub_server, tmp_path, mocker):
+    """assert the manifest, the catalog and the tmp_dir removal are handled by executor threads, not by the thread
+    running the event loop.
+
+    Args:
+        stub_server (StubServer): local stand-in for the digipathos website.
+        tmp_path (Path): pytest temporary folder.
+        mocker (_type_): pytest mocker obj.
+    """
+    threads = {}
+
+    def recording(name: str, function):
+        def wrapper(*args, **kwargs):
+            threads.setdefault(name, []).append(threading.current_thread())
+            return function(*args, **kwargs)
+        return wrapper
+
+    mocker.patch.object(DownloadManifest, 'save', recording('save', DownloadManifest.save))
+    mocker.patch("digipathos_downloader.aio.save_local_catalog",
+                 recording('catalog', aio.save_local_catalog))
+    mocker.patch("digipathos_downloader.download.remove_tmp_dir",
+                 recording('cleanup', download.remove_tmp_dir))
+    info = asyncio.run(aget_dataset(str(tmp_path / 'dataset_dir'), str(tmp_path / 'tmp'), name_filter='all',
+                                    verbose=False, base_url=stub_server.base_url, list_url=stub_server.list_url))
+
+    assert info['not_downloaded'] is None
+    assert sorted(threads) == ['catalog', 'cleanup', 'save']
+    assert all(threading.main_thread() not in callers for callers in threads.values())
@@ -0,0 +1,40 @@
+import importlib.util
+import os
+import time
+
+from digipathos_downloader.download import download_zips
+from digipathos_downloader.session import RetryPolicy
+from stub_server import StubServer, make_zip
+
+spec = importlib.util.spec_from_file_location(
+    "run_benchmarks", os.path.join(os.path.dirname(os.path.dirname(__file__)), "benchmarks", "run_benchmarks.py"))
+run_benchmarks = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(run_benchmarks)
+
+
+def test_stub_server_conditions(tmp_path):
+    """assert the stand-in server slows responses down and fails bitstream requests at the configured rate.
+
+    Args:
+        tmp_path (Path): pytest temporary folder.
+    """
+    archives = {f"Bench {index} - 1.zip": make_zip(member_size=4096, seed=index) for index in range(4)}
+    with StubServer(archives, latency=0.05, bandwidth=200000, failure_rate=0.5, seed=1) as server:
+        start = time.monotonic()
+        not_downloaded = download_zips(server.zips_table, str(tmp_path), verbose=False, base_url=server.base_url,
+                                       retry_policy=RetryPolicy(max_attempts=20, backoff_factor=0, jitter=0))
+
+        assert not_downloaded is None
+        assert len(server.requests_log) > len(archives)
+        assert time.monotonic() - start >= 0.05 * len(server.requests_log)
+
+def test_run_benchmarks():
+    """assert the suite measures every benchmark and flags the slower ones against a baseline."""
+    results = run_benchmarks.run_benchmarks(count=2, size=4096, workers=(1, 2), repeats=1)
+
+    assert set(results['timings']) == {'table_fetch', 'download/workers=1', 'download/workers=2',
+                                       'extract/workers=1', 'extract/workers=2', 'get_dataset/phased',
+                                       'get_dataset/pipelined', 'get_dataset/direct'}
+    faster = dict(results, timings={name: seconds / 2 for name, seconds in results['timings'].items()})
+    assert run_benchmarks.compare_results(results, results) == []
+    assert len(run_benchmarks.compare_results(results, faster)) == len(results['timings'])
@@ -0,0 +1,65 @@
+import os
+
+from digipathos_downloader.cache import ZipCache
+from digipathos_downloader.download import download_zips
+
+
+def test_download_zips_uses_cache(stub_server, tmp_path):
+    """assert a second dataset directory is filled from the cache without touching the network.
+
+    Args:
+        stub_server (StubServer): local stand-in for the digipathos website.
+        tmp_path (Path): pytest temporary folder.
+    """
+    cache = ZipCache(str(tmp_path / 'cache'))
+    first_tmp, second_tmp = tmp_path / 'first', tmp_path / 'second'
+    first_tmp.mkdir()
+    second_tmp.mkdir()
+
+    download_zips(stub_server.zips_table, str(first_tmp), False, stub_server.base_url, cache=cache)
+    stub_server.requests_log.clear()
+    not_downloaded = download_zips(stub_server.zips_table, str(second_tmp), False, stub_server.base_url,
+                                   max_workers=2, cache=cache)
+
+    assert not_downloaded == None
+    assert stub_server.requests_log == []
+    for entry in stub_server.zips_table:
+        assert (second_tmp / entry['name']).read_bytes() == stub_server.archives[entry['name']]
+    assert cache.size() == sum(len(contents) for contents in stub_server.archives.values())
+
+def test_cache_refuses_corrupt_archives(tmp_path):
+    """assert only verified archives enter the cache.
+
+    Args:
+        tmp_path (Path): pytest temporary folder.
+    """
+    cache = ZipCache(str(tmp_path / 'cache'))
+    corrupt = tmp_path / 'corrupt.zip'
+    corrupt.write_bytes(b'not a zip')
+
+    assert cache.store('/corrupt', str(corrupt)) == None
+    assert cache.fetch('/corrupt', str(tmp_path / 'copy.zip')) == False
+
+def test_cache_lru_eviction(stub_server, tmp_path):
+    """assert the least recently used blobs are evicted first.
+
+    Args:
+        stub_server (StubServer): local stand-in for the digipathos website.
+        tmp_path (Path): pytest temporary folder.
+    """
+    sizes = [len(contents) for contents in stub_server.archives.values()]
+    cache = ZipCache(str(tmp_path / 'cache'))
+    for index, (name, contents) in enumerate(stub_server.archives.items()):
+        path = tmp_path / name
+        path.write_bytes(contents)
+        cache.store(f'/{index}', str(path))
+        os.utime(cache.lookup(f'/{index}'), (index, index))
+
+    # using the oldest blob makes the second one the least recently used
+    cache.fetch('/0', str(tmp_path / 'copy.zip'))
+    cache.max_size = sum(sizes) - 1
+    cache.evict()
+
+    assert cache.lookup('/0') != None
+    assert cache.lookup('/1') == None
+    assert cache.lookup('/2') != None
@@ -0,0 +1,69 @@
+import json
+import subprocess
+import sys
+
+from digipathos_downloader.cli import main
+from digipathos_downloader.table_cache import save_cached_table
+from stub_server import make_zip
+
+
+def test_list_cached(short_zips_table, tmp_path, capsys):
+    """assert the cached table is listed and filtered without the network.
+
+    Args:
+        short_zips_table (list): mock fetch_zips return.
+        tmp_path (Path): pytest temporary folder.
+        capsys (_type_): pytest output capture.
+    """
+    save_cached_table(str(tmp_path), 'http://digipathos/list', short_zips_table)
+    args = ['list', '--cached', '--cache-dir', str(tmp_path), '--base-url', 'http://digipathos', '--list-url', '/list']
+
+    assert main(args + ['--filter', 'all']) == 0
+    assert capsys.readouterr().out.splitlines() == [f"{entry['size']}\t{entry['name']}" for entry in short_zips_table]
+    assert main(args + ['--filter', 'all', '--disease', 'Fusariose (Fusariose)', '--json']) == 0
+    assert json.loads(capsys.readouterr().out) == [short_zips_table[1]]
+    assert main(args[:3] + ['/nowhere']) == 1
+
+def test_list_cached_startup(short_zips_table, tmp_path):
+    """assert listing the cached table does not load requests nor the download machinery.
+
+    Args:
+        short_zips_table (list): mock fetch_zips return.
+        tmp_path (Path): pytest temporary folder.
+    """
+    save_cached_table(str(tmp_path), 'http://digipathos/list', short_zips_table)
+    script = ("import sys; from digipathos_downloader.cli import main; "
+              f"main(['list', '--cached', '--cache-dir', {str(tmp_path)!r}, '--base-url', 'http://digipathos', "
+              "'--list-url', '/list', '-q']); "
+              "print(sorted(name for name in ('requests', 'digipathos_downloader.download') if name in sys.modules))")
+    output = subprocess.run([sys.executable, '-c', script], capture_output=True, text=True, check=True).stdout
+
+    assert output.splitlines()[-1] == '[]'
+
+def test_fetch(stub_server, tmp_path):
+    """assert fetch downloads the dataset, and that verify and extract work on the kept archives.
+
+    Args:
+        stub_server (StubServer): local stand-in for the digipathos website.
+        tmp_path (Path): pytest temporary folder.
+    """
+    common = ['--base-url', stub_server.base_url, '--list-url', stub_server.list_url, '-q', '--filter', 'all']
+    assert main(['fetch', str(tmp_path / 'zips'), '--format', 'zips', '-j', '2', '--rate-limit', '10 MB'] + common) == 0
+    assert len(list((tmp_path / 'zips').iterdir())) == 3
+
+    assert main(['verify', str(tmp_path / 'zips'), '-q']) == 0
+    assert main(['extract', str(tmp_path / 'zips'), str(tmp_path / 'data'), '-j', '2', '--member-workers', '2', '-q']) == 0
+    assert len(list((tmp_path / 'data').iterdir())) == 3
+
+    (tmp_path / 'zips' / 'broken.zip').write_bytes(make_zip()[:-10])
+    assert main(['verify', str(tmp_path / 'zips'), '-q']) == 1
+
+def test_invalid_arguments(tmp_path, capsys):
+    """assert arguments get_dataset refuses are reported with exit status 2.
+
+    Args:
+        tmp_path (Path): pytest temporary folder.
+        capsys (_type_): pytest output capture.
+    """
+    assert main(['fetch', str(tmp_path / 'data'), '--num-shards', '2', '--shard-index', '2']) == 2
+    assert 'shard_index' in capsys.readouterr().err
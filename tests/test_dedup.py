@@ -0,0 +1,133 @@
+import io
+import os
+import zipfile
+
+import pytest
+
+from digipathos_downloader.dedup import (dedup_files, link_members, plan_member_links, read_remote_members,
+                                         scan_members, skip_present_zips)
+from digipathos_downloader.download import get_dataset
+from stub_server import StubServer, make_zip
+
+
+def test_read_remote_members(stub_server):
+    """assert the member list is read from the end of the archive only.
+
+    Args:
+        stub_server (StubServer): local stand-in for the digipathos website.
+    """
+    entry = stub_server.zips_table[0]
+    members = read_remote_members(stub_server.base_url + entry["bsLink"])
+    with zipfile.ZipFile(io.BytesIO(stub_server.archives[entry["name"]])) as zip_contents:
+        assert members == [(member.filename, member.CRC, member.file_size) for member in zip_contents.infolist()]
+    assert stub_server.ranges_log == ['bytes=-65557']
+
+def test_read_remote_members_large_directory():
+    """assert a central directory larger than the first request is fetched with a second one."""
+    archives = {'Large - 1.zip': make_zip(n_members=2000, member_size=16)}
+    with StubServer(archives) as server:
+        members = read_remote_members(server.base_url + server.zips_table[0]["bsLink"])
+
+        assert len(members) == 2000
+        assert members[-1][0] == 'IMG_1999.jpg'
+        assert len(server.ranges_log) == 2
+
+def test_plan_member_links():
+    """assert samples whose members are all at hand, locally or earlier in the table, are linked."""
+    zips_table = [{'name': 'A - 1.zip'}, {'name': 'A - 2.zip'}, {'name': 'B - 1.zip'}, {'name': 'C - 1.zip'}]
+    remote_members = {'A - 1.zip': [('x.jpg', 1, 10), ('y.jpg', 2, 10)],
+                      'A - 2.zip': [('y.jpg', 2, 10)],
+                      'B - 1.zip': [('z.jpg', 3, 10), ('w.jpg', 4, 10)],
+                      'C - 1.zip': None}
+    local_members = {os.path.join('D - 1', 'z.jpg'): {'size': 10, 'crc': 3, 'sha256': 'z'}}
+    to_download, linked = plan_member_links(zips_table, remote_members, local_members, 'data')
+
+    assert [entry['name'] for entry in to_download] == ['A - 1.zip', 'B - 1.zip', 'C - 1.zip']
+    assert linked == [({'name': 'A - 2.zip'}, [(os.path.join('data', 'A - 1', 'y.jpg'),
+                                                os.path.join('data', 'A - 2', 'y.jpg'))])]
+
+def test_dedup_files(tmp_path):
+    """assert identical files become hardlinks of one another, and that a second pass has nothing left to do.
+
+    Args:
+        tmp_path (Path): pytest temporary folder.
+    """
+    for class_name in ['A - 1', 'A - 2']:
+        (tmp_path / class_name).mkdir()
+        (tmp_path / class_name / 'same.jpg').write_bytes(b'x' * 100)
+        (tmp_path / class_name / 'other.jpg').write_bytes(class_name.encode())
+    index_path = str(tmp_path / 'index.json')
+    stats = dedup_files(str(tmp_path), index_path, verbose=False)
+
+    assert stats == {'n_files': 4, 'n_unique': 3, 'n_linked': 1, 'bytes_saved': 100}
+    assert os.path.samefile(tmp_path / 'A - 1' / 'same.jpg', tmp_path / 'A - 2' / 'same.jpg')
+    assert (tmp_path / 'A - 2' / 'same.jpg').read_bytes() == b'x' * 100
+    assert dedup_files(str(tmp_path), index_path, verbose=False)['n_linked'] == 0
+    assert len(scan_members(str(tmp_path), index_path, exclude={'A - 2'})) == 2
+
+def test_skip_present_zips(tmp_path):
+    """assert a sample whose images are already installed is linked instead of downloaded.
+
+    Args:
+        tmp_path (Path): pytest temporary folder.
+    """
+    archives = {'A - 2.zip': make_zip(seed=0), 'B - 1.zip': make_zip(seed=1)}
+    with StubServer(archives) as server:
+        data_dir = tmp_path / 'data'
+        with zipfile.ZipFile(io.BytesIO(make_zip(seed=0))) as zip_contents:
+            zip_contents.extractall(data_dir / 'A - 1')
+        to_download, linked = skip_present_zips(server.zips_table, str(data_dir), server.base_url, verbose=False)
+
+        assert [entry['name'] for entry in to_download] == ['B - 1.zip']
+        assert [entry['name'] for entry, _ in linked] == ['A - 2.zip']
+        assert link_members(str(data_dir / 'A - 2'), linked[0][1])
+        assert os.path.samefile(data_dir / 'A - 1' / 'IMG_0000.jpg', data_dir / 'A - 2' / 'IMG_0000.jpg')
+
+def test_get_dataset_dedup(mocker, tmp_path):
+    """assert every part is downloaded unless CRC matches are trusted, and identical images are stored once.
+
+    Args:
+        mocker (_type_): pytest mocker obj.
+        tmp_path (Path): pytest temporary folder.
+    """
+    archives = {'A - 1.zip': make_zip(seed=0), 'A - 2.zip': make_zip(seed=0), 'B - 1.zip': make_zip(seed=1)}
+    with StubServer(archives) as server:
+        mocker.patch("digipathos_downloader.download.fetch_zips_table", return_value=server.zips_table)
+        info = get_dataset(str(tmp_path / 'data'),
+                           str(tmp_path / 'tmp'),
+                           verbose=False,
+                           base_url=server.base_url,
+                           dedup=True)
+
+        assert server.ranges_log == [None] * 3
+    assert info['failed_unzips_list'] is None
+    assert info['dedup']['linked'] == []
+    assert info['dedup']['n_linked'] == 3
+    assert os.path.samefile(tmp_path / 'data' / 'A - 1' / 'IMG_0002.jpg', tmp_path / 'data' / 'A - 2' / 'IMG_0002.jpg')
+    with pytest.raises(ValueError):
+        get_dataset(str(tmp_path / 'data'), str(tmp_path / 'tmp'), trust_crc=True)
+
+def test_get_dataset_dedup_trust_crc(mocker, tmp_path):
+    """assert a part repeating another one is linked rather than downloaded, and still installed and cataloged.
+
+    Args:
+        mocker (_type_): pytest mocker obj.
+        tmp_path (Path): pytest temporary folder.
+    """
+    archives = {'A - 1.zip': make_zip(seed=0), 'A - 2.zip': make_zip(seed=0), 'B - 1.zip': make_zip(seed=1)}
+    with StubServer(archives) as server:
+        mocker.patch("digipathos_downloader.download.fetch_zips_table", return_value=server.zips_table)
+        info = get_dataset(str(tmp_path / 'data'),
+                           str(tmp_path / 'tmp'),
+                           verbose=False,
+                           base_url=server.base_url,
+                           dedup=True,
+                           trust_crc=True)
+
+        assert server.ranges_log.count(None) == 2
+    assert info['failed_unzips_list'] is None
+    assert info['dedup']['linked'] == ['A - 2.zip']
+    assert info['dedup']['n_unique'] == 6
+    assert sorted(os.listdir(tmp_path / 'data' / 'A - 2')) == ['IMG_0000.jpg', 'IMG_0001.jpg', 'IMG_0002.jpg']
+    assert os.path.samefile(tmp_path / 'data' / 'A - 1' / 'IMG_0002.jpg', tmp_path / 'data' / 'A - 2' / 'IMG_0002.jpg')
+    assert 'A - 2.zip' in (tmp_path / 'data.catalog.json').read_text()
@@ -1,5 +1,6 @@
 from pathlib import Path
 import shutil
+import zipfile
 
 import pytest
 
@@ -7,12 +8,14 @@ from digipathos_downloader.download import (create_basic_folder_structure,
                                             create_dir, 
                                             download_zip, 
                                             download_zips, 
+                                            extract_zip_members,
                                             fetch_zips_table, 
                                             get_dataset,
                                             remove_tmp_dir,
                                             unpack_zip,
                                             unpack_zips,
                                             validate_downloads)
+from stub_server import make_zip
 
 
 def test_create_dir():
@@ -400,4 +403,120 @@ def test_get_dataset(mocker,short_zips_table):
     
     # clean the mess
     shutil.rmtree(str(dataset_dir))
-    
\ No newline at end of file
+    
+def test_download_zips_concurrent(stub_server, tmp_path):
+    """assert the concurrent mode downloads every sample of the table.
+
+    Args:
+        stub_server (StubServer): local stand-in for the digipathos website.
+        tmp_path (Path): pytest temporary folder.
+    """
+    not_downloaded = download_zips(stub_server.zips_table,
+                                   str(tmp_path),
+                                   False,
+                                   stub_server.base_url,
+                                   max_workers=3)
+
+    assert not_downloaded == None
+    for entry in stub_server.zips_table:
+        downloaded_file = tmp_path / entry['name']
+        assert downloaded_file.read_bytes() == stub_server.archives[entry['name']]
+
+def test_download_zips_concurrent_failures(stub_server, broken_zips_table, tmp_path):
+    """assert the concurrent mode returns the failed urls in table order.
+
+    Args:
+        stub_server (StubServer): local stand-in for the digipathos website.
+        broken_zips_table (list): zips table with unvalid links.
+        tmp_path (Path): pytest temporary folder.
+    """
+    zips_table = stub_server.zips_table[:1] + broken_zips_table
+    not_downloaded = download_zips(zips_table,
+                                   str(tmp_path),
+                                   False,
+                                   stub_server.base_url,
+                                   max_workers=4)
+
+    assert not_downloaded == [stub_server.base_url + '/' + entry['bsLink'] for entry in broken_zips_table]
+
+def test_download_zip_streaming(stub_server, tmp_path):
+    """assert a sample streamed in small chunks is written whole and no '.part' file is left behind.
+
+    Args:
+        stub_server (StubServer): local stand-in for the digipathos website.
+        tmp_path (Path): pytest temporary folder.
+    """
+    sample = stub_server.zips_table[1]
+    ok_url = download_zip(sample["bsLink"],
+                          sample["name"],
+                          str(tmp_path),
+                          stub_server.base_url,
+                          chunk_size=100)
+
+    assert ok_url == None
+    assert [file.name for file in tmp_path.iterdir()] == [sample["name"]]
+    assert (tmp_path / sample["name"]).read_bytes() == stub_server.archives[sample["name"]]
+
+def test_unpack_zips_parallel(stub_server, tmp_path):
+    """assert the process pool extracts every archive and reports the broken ones.
+
+    Args:
+        stub_server (StubServer): local stand-in for the digipathos website.
+        tmp_path (Path): pytest temporary folder.
+    """
+    tmp_folder = tmp_path / 'tmp'
+    plant_disease_folder = tmp_path / 'plant-disease-db'
+    tmp_folder.mkdir()
+    plant_disease_folder.mkdir()
+    for name, contents in stub_server.archives.items():
+        (tmp_folder / name).write_bytes(contents)
+    (tmp_folder / 'broken.zip').touch()
+
+    failed_unpack = unpack_zips(str(tmp_folder),
+                                str(plant_disease_folder),
+                                False,
+                                max_workers=2)
+
+    assert failed_unpack == ['broken.zip']
+    for name in stub_server.archives:
+        assert len(list((plant_disease_folder / name[:-4]).iterdir())) == 3
+
+def test_extract_zip_members_parallel(tmp_path):
+    """assert the threads extract every member once, and skip the members already extracted.
+
+    Args:
+        tmp_path (Path): pytest temporary folder.
+    """
+    zip_path = tmp_path / 'big.zip'
+    zip_path.write_bytes(make_zip(n_members=40, member_size=4096))
+    dest_dir = tmp_path / 'big'
+
+    written = extract_zip_members(str(zip_path), str(dest_dir), max_workers=4)
+
+    assert len(written) == len(set(written)) == 40
+    with zipfile.ZipFile(zip_path) as zip_contents:
+        for member in zip_contents.infolist():
+            assert (dest_dir / member.filename).read_bytes() == zip_contents.read(member)
+    (dest_dir / 'IMG_0003.jpg').write_bytes(b'truncated')
+    (dest_dir / 'IMG_0007.jpg').unlink()
+    assert sorted(extract_zip_members(str(zip_path), str(dest_dir), max_workers=4)) == \
+        [str(dest_dir / 'IMG_0003.jpg'), str(dest_dir / 'IMG_0007.jpg')]
+    assert not list(dest_dir.glob('*.part'))
+
+def test_unpack_zip_member_workers_parallel(stub_server, tmp_path):
+    """assert an interrupted extraction is completed, not refused, when members are extracted in parallel.
+
+    Args:
+        stub_server (StubServer): local stand-in for the digipathos website.
+        tmp_path (Path): pytest temporary folder.
+    """
+    name = stub_server.zips_table[0]['name']
+    (tmp_path / name).write_bytes(stub_server.archives[name])
+    class_dir = tmp_path / 'data' / name[:-4]
+    class_dir.mkdir(parents=True)
+    (class_dir / 'IMG_0000.jpg').write_bytes(b'partial')
+
+    assert unpack_zip(name, str(tmp_path / 'data'), str(tmp_path)) == name
+    assert unpack_zip(name, str(tmp_path / 'data'), str(tmp_path), member_workers=2) is None
+    assert sorted(path.name for path in class_dir.iterdir()) == ['IMG_0000.jpg', 'IMG_0001.jpg', 'IMG_0002.jpg']
+    assert (class_dir / 'IMG_0000.jpg').stat().st_size == 1024
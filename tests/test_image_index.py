@@ -0,0 +1,92 @@
+import pickle
+import struct
+
+import pytest
+
+from digipathos_downloader.download import get_dataset
+from digipathos_downloader.image_index import ImageIndex, build_image_index, image_size
+
+
+def jpeg_header(width: int, height: int) -> bytes:
+    """a JPEG start: SOI, an APP0 segment and a baseline start of frame."""
+    app0 = b'\xff\xe0' + struct.pack('>H', 16) + b'JFIF\x00' + b'\x00' * 9
+    sof0 = b'\xff\xc0' + struct.pack('>HBHHB', 11, 8, height, width, 1) + b'\x01\x11\x00'
+    return b'\xff\xd8' + app0 + sof0
+
+def png_header(width: int, height: int) -> bytes:
+    """a PNG start: signature and IHDR chunk."""
+    return b'\x89PNG\r\n\x1a\n' + struct.pack('>I', 13) + b'IHDR' + struct.pack('>IIBBBBB', width, height, 8, 2, 0, 0, 0)
+
+@pytest.fixture
+def data_dir(tmp_path):
+    """a dataset directory with two classes.
+
+    Returns:
+        data_dir (Path): the directory.
+    """
+    data_dir = tmp_path / 'dataset_dir'
+    (data_dir / 'B').mkdir(parents=True)
+    (data_dir / 'A').mkdir()
+    (data_dir / 'A' / 'IMG_0001.jpg').write_bytes(jpeg_header(640, 480))
+    (data_dir / 'A' / 'IMG_0000.png').write_bytes(png_header(32, 16))
+    (data_dir / 'B' / 'IMG_0000.gif').write_bytes(b'GIF89a' + struct.pack('<HH', 7, 5))
+    (data_dir / 'B' / 'notes.txt').write_bytes(b'not an image')
+    return data_dir
+
+def test_image_size(data_dir):
+    """assert dimensions are read from JPEG, PNG and GIF headers.
+
+    Args:
+        data_dir (Path): dataset directory.
+    """
+    assert image_size(str(data_dir / 'A' / 'IMG_0001.jpg')) == (640, 480)
+    assert image_size(str(data_dir / 'A' / 'IMG_0000.png')) == (32, 16)
+    assert image_size(str(data_dir / 'B' / 'IMG_0000.gif')) == (7, 5)
+    assert image_size(str(data_dir / 'B' / 'notes.txt')) is None
+
+def test_image_index(data_dir):
+    """assert the index lists every image with its class id, size and dimensions, and survives pickling.
+
+    Args:
+        data_dir (Path): dataset directory.
+    """
+    index_path = build_image_index(str(data_dir))
+
+    assert index_path == str(data_dir) + '.index'
+    with ImageIndex(index_path) as index:
+        assert index.classes == ['A', 'B']
+        assert len(index) == 4
+        assert index[0] == (str(data_dir / 'A' / 'IMG_0000.png'), 0, len(png_header(32, 16)), 32, 16)
+        assert index[1][1:] == (0, len(jpeg_header(640, 480)), 640, 480)
+        assert index[-1] == (str(data_dir / 'B' / 'notes.txt'), 1, 12, 0, 0)
+        with pytest.raises(IndexError):
+            index[4]
+        copy = pickle.loads(pickle.dumps(index))
+        assert [copy[position] for position in range(4)] == [index[position] for position in range(4)]
+        copy.close()
+
+def test_image_index_array(data_dir):
+    """assert the records can be viewed as a NumPy array.
+
+    Args:
+        data_dir (Path): dataset directory.
+    """
+    pytest.importorskip("numpy")
+    index = ImageIndex(build_image_index(str(data_dir)))
+
+    assert list(index.as_array()['class_id']) == [0, 0, 1, 1]
+    assert list(index.as_array()['width']) == [32, 640, 7, 0]
+
+def test_get_dataset_index(stub_server, tmp_path):
+    """assert get_dataset indexes the extracted images on request.
+
+    Args:
+        stub_server (StubServer): local stand-in for the digipathos website.
+        tmp_path (Path): pytest temporary folder.
+    """
+    info = get_dataset(str(tmp_path / 'dataset_dir'), str(tmp_path / 'tmp'), name_filter='all', verbose=False,
+                       base_url=stub_server.base_url, list_url=stub_server.list_url, write_index=True)
+
+    with ImageIndex(info['index_path']) as index:
+        assert len(index) == 9
+        assert index.classes == sorted(entry['name'][:-4] for entry in stub_server.zips_table)
@@ -0,0 +1,80 @@
+import hashlib
+
+from digipathos_downloader.download import download_zip, get_dataset
+from digipathos_downloader.integrity import expected_checksum, parse_size, size_matches, verify_zip
+
+
+def test_parse_size():
+    """assert the sizes shown on the website are converted to bytes.
+    """
+    assert parse_size('636.43 kB') == 636.43 * 1024
+    assert parse_size('20.45 MB') == 20.45 * 1024 ** 2
+    assert parse_size('512 bytes') == 512
+    assert parse_size('unknown') == None
+
+def test_size_matches():
+    """assert rounding is tolerated but truncation is not.
+    """
+    assert size_matches(int(20.45 * 1024 ** 2) + 1000, '20.45 MB')
+    assert size_matches(20_450_000, '20.45 MB')
+    assert not size_matches(10 * 1024 ** 2, '20.45 MB')
+    assert size_matches(1, 'n/a')
+
+def test_verify_zip(stub_server, tmp_path):
+    """assert truncated, corrupted and mismatching files are all caught.
+
+    Args:
+        stub_server (StubServer): local stand-in for the digipathos website.
+        tmp_path (Path): pytest temporary folder.
+    """
+    sample = stub_server.zips_table[0]
+    contents = stub_server.archives[sample['name']]
+    good, truncated, flipped = tmp_path / 'good.zip', tmp_path / 'truncated.zip', tmp_path / 'flipped.zip'
+    good.write_bytes(contents)
+    truncated.write_bytes(contents[:len(contents) // 2])
+    # flip a byte of the first member's data, right after its 30-byte header and 12-byte name
+    flipped.write_bytes(contents[:50] + bytes([contents[50] ^ 0xFF]) + contents[51:])
+
+    assert verify_zip(str(good), sample['size'], ('md5', hashlib.md5(contents).hexdigest())) == None
+    assert 'does not match' in verify_zip(str(truncated), sample['size'])
+    assert verify_zip(str(flipped)) != None
+    assert 'checksum' in verify_zip(str(good), checksum=('md5', '0' * 32))
+
+def test_download_zip_checksum(stub_server, tmp_path):
+    """assert the checksum is checked while streaming and a mismatch fails the download.
+
+    Args:
+        stub_server (StubServer): local stand-in for the digipathos website.
+        tmp_path (Path): pytest temporary folder.
+    """
+    sample = dict(stub_server.zips_table[0], checksum={'value': '0' * 32, 'checkSumAlgorithm': 'MD5'})
+
+    not_downloaded = download_zip(sample['bsLink'],
+                                  sample['name'],
+                                  str(tmp_path),
+                                  stub_server.base_url,
+                                  checksum=expected_checksum(sample))
+
+    assert not_downloaded == stub_server.base_url + '/' + sample['bsLink']
+    assert list(tmp_path.iterdir()) == []
+
+def test_get_dataset_requeues_corrupt(mocker, stub_server, tmp_path):
+    """assert a sample served corrupt is downloaded again before extraction.
+
+    Args:
+        mocker (_type_): pytest mocker obj.
+        stub_server (StubServer): local stand-in for the digipathos website.
+        tmp_path (Path): pytest temporary folder.
+    """
+    sample = stub_server.zips_table[1]
+    stub_server.failures[sample['bsLink']] = [(200, {})]
+    mocker.patch("digipathos_downloader.download.fetch_zips_table", return_value=stub_server.zips_table)
+
+    info = get_dataset(str(tmp_path / 'dataset_dir'),
+                       str(tmp_path / 'tmp'),
+                       verbose=False,
+                       base_url=stub_server.base_url)
+
+    assert stub_server.requests_log.count(sample['bsLink']) == 2
+    assert info['validation']['corrupt_files'] == []
+    assert info['failed_unzips_list'] == None
@@ -0,0 +1,79 @@
+from digipathos_downloader.download import download_zip, download_zips, get_dataset
+from digipathos_downloader.manifest import DownloadManifest
+
+
+def test_download_zip_resumes_part_file(stub_server, tmp_path):
+    """assert a leftover '.part' file is continued with a Range request instead of downloaded again.
+
+    Args:
+        stub_server (StubServer): local stand-in for the digipathos website.
+        tmp_path (Path): pytest temporary folder.
+    """
+    sample = stub_server.zips_table[0]
+    contents = stub_server.archives[sample['name']]
+    (tmp_path / (sample['name'] + '.part')).write_bytes(contents[:500])
+    manifest = DownloadManifest(str(tmp_path))
+
+    ok_url = download_zip(sample['bsLink'],
+                          sample['name'],
+                          str(tmp_path),
+                          stub_server.base_url,
+                          manifest=manifest)
+
+    assert ok_url == None
+    assert stub_server.ranges_log == ['bytes=500-']
+    assert (tmp_path / sample['name']).read_bytes() == contents
+    assert not (tmp_path / (sample['name'] + '.part')).exists()
+    entry = DownloadManifest(str(tmp_path)).get(sample['bsLink'])
+    assert entry['status'] == 'complete'
+    assert entry['bytes_received'] == entry['expected_size'] == len(contents)
+
+def test_download_zips_skips_completed(stub_server, tmp_path):
+    """assert a rerun only requests the samples the manifest does not mark as complete.
+
+    Args:
+        stub_server (StubServer): local stand-in for the digipathos website.
+        tmp_path (Path): pytest temporary folder.
+    """
+    download_zips(stub_server.zips_table[:2],
+                  str(tmp_path),
+                  False,
+                  stub_server.base_url,
+                  manifest=DownloadManifest(str(tmp_path)))
+    stub_server.requests_log.clear()
+
+    not_downloaded = download_zips(stub_server.zips_table,
+                                   str(tmp_path),
+                                   False,
+                                   stub_server.base_url,
+                                   manifest=DownloadManifest(str(tmp_path)))
+
+    assert not_downloaded == None
+    assert stub_server.requests_log == [stub_server.zips_table[2]['bsLink']]
+
+def test_get_dataset_resume(mocker, stub_server, tmp_path):
+    """assert get_dataset can be rerun over the directories left by an interrupted run.
+
+    Args:
+        mocker (_type_): pytest mocker obj.
+        stub_server (StubServer): local stand-in for the digipathos website.
+        tmp_path (Path): pytest temporary folder.
+    """
+    dataset_dir = tmp_path / 'dataset_dir'
+    tmp_dir = tmp_path / 'tmp'
+    dataset_dir.mkdir()
+    tmp_dir.mkdir()
+    sample = stub_server.zips_table[0]
+    (tmp_dir / (sample['name'] + '.part')).write_bytes(stub_server.archives[sample['name']][:100])
+
+    mocker.patch("digipathos_downloader.download.fetch_zips_table", return_value=stub_server.zips_table)
+    info = get_dataset(str(dataset_dir),
+                       str(tmp_dir),
+                       verbose=False,
+                       base_url=stub_server.base_url,
+                       resume=True)
+
+    assert info['not_downloaded'] == None
+    assert info['failed_unzips_list'] == None
+    assert 'bytes=100-' in stub_server.ranges_log
+    assert len(list(dataset_dir.iterdir())) == len(stub_server.zips_table)
@@ -0,0 +1,45 @@
+from digipathos_downloader.download import get_dataset
+from digipathos_downloader.metadata import build_metadata_catalog, parse_zip_name, query_metadata_catalog
+
+
+def test_parse_zip_name():
+    """assert crop, disease, part index and variant are parsed from the sample names."""
+    assert parse_zip_name('Abacaxi (Pineapple) - Fusariose (Fusariose) - 1.zip') == {
+        'crop': 'Abacaxi (Pineapple)', 'disease': 'Fusariose (Fusariose)', 'part': 1, 'cropped': False}
+    assert parse_zip_name('Milho (Corn) - Cropped - Ferrugem (Rust) - 12.zip') == {
+        'crop': 'Milho (Corn)', 'disease': 'Ferrugem (Rust)', 'part': 12, 'cropped': True}
+    assert parse_zip_name('Healthy.zip') == {'crop': 'Healthy', 'disease': None, 'part': None, 'cropped': False}
+
+def test_query_metadata_catalog(short_zips_table, tmp_path):
+    """assert samples are selected by crop, disease, variant and size budget.
+
+    Args:
+        short_zips_table (list): mock fetch_zips return.
+        tmp_path (Path): pytest temporary folder.
+    """
+    cropped = dict(short_zips_table[0], name='Milho (Corn) - Cropped - Ferrugem (Rust) - 1.zip', bsLink='/cropped')
+    connection = build_metadata_catalog(short_zips_table + [cropped], str(tmp_path / 'metadata.sqlite'))
+
+    assert query_metadata_catalog(connection) == short_zips_table + [cropped]
+    assert query_metadata_catalog(connection, crop='abacaxi (pineapple)', cropped=False) == short_zips_table
+    assert query_metadata_catalog(connection, cropped=True) == [cropped]
+    assert query_metadata_catalog(connection, disease=['Fusariose (Fusariose)', 'Podridão (Black Rot)']) == short_zips_table[1:]
+    # 636.43 kB + 20.45 MB fit in 22 MiB, the 17.01 MB of the next sample do not
+    assert query_metadata_catalog(connection, crop='Abacaxi (Pineapple)', max_bytes=22 * 1024 ** 2) == short_zips_table[:2]
+    connection.close()
+
+def test_get_dataset_query(stub_server, tmp_path):
+    """assert only the samples matching the query are downloaded.
+
+    Args:
+        stub_server (StubServer): local stand-in for the digipathos website.
+        tmp_path (Path): pytest temporary folder.
+    """
+    dataset_dir = tmp_path / 'dataset_dir'
+    info = get_dataset(str(dataset_dir), str(tmp_path / 'tmp'), name_filter='all', verbose=False,
+                       base_url=stub_server.base_url, list_url=stub_server.list_url,
+                       query={'disease': 'Fusariose (Fusariose)'})
+
+    assert [entry['name'] for entry in info['zips_table']] == [stub_server.zips_table[1]['name']]
+    assert stub_server.requests_log[1:] == [stub_server.zips_table[1]['bsLink']]
+    assert [folder.name for folder in dataset_dir.iterdir()] == [stub_server.zips_table[1]['name'][:-4]]
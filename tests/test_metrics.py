@@ -0,0 +1,47 @@
+import json
+
+from digipathos_downloader.download import download_zips, get_dataset
+from digipathos_downloader.metrics import MetricsRecorder
+from digipathos_downloader.session import RetryPolicy
+
+
+def test_metrics_recorder(stub_server, tmp_path):
+    """assert downloads report their bytes, throughput and retries, and the events are written as JSON lines.
+
+    Args:
+        stub_server (StubServer): local stand-in for the digipathos website.
+        tmp_path (Path): pytest temporary folder.
+    """
+    first, second, third = stub_server.zips_table
+    stub_server.failures[first['bsLink']] = [(503, {})]
+    metrics_path = tmp_path / 'metrics.jsonl'
+    events = []
+    recorder = MetricsRecorder(str(metrics_path), on_event=events.append)
+    download_zips(stub_server.zips_table, str(tmp_path), verbose=False, base_url=stub_server.base_url,
+                  retry_policy=RetryPolicy(backoff_factor=0, jitter=0), on_event=recorder)
+    summary = recorder.summary()
+
+    assert summary['n_downloaded'] == 3 and summary['n_failed'] == 0
+    assert summary['retries'] == 1
+    assert summary['files'][first['name']]['retries'] == 1
+    assert summary['bytes'] == sum(len(archive) for archive in stub_server.archives.values())
+    assert summary['throughput'] > 0
+    lines = [json.loads(line) for line in metrics_path.read_text().splitlines()]
+    assert [line['event'] for line in lines] == [event['event'] for event in events if event['event'] != 'download_progress']
+    assert {'event': 'download_retry', 'name': first['name'], 'attempt': 1, 'status': 503,
+            'cause': 'http'}.items() <= lines[1].items()
+
+def test_get_dataset_metrics(stub_server, tmp_path):
+    """assert get_dataset times each phase and sums the downloads up in info['metrics'].
+
+    Args:
+        stub_server (StubServer): local stand-in for the digipathos website.
+        tmp_path (Path): pytest temporary folder.
+    """
+    info = get_dataset(str(tmp_path / 'dataset_dir'), str(tmp_path / 'tmp'), name_filter='all', verbose=False,
+                       base_url=stub_server.base_url, list_url=stub_server.list_url,
+                       metrics_path=str(tmp_path / 'metrics.jsonl'))
+
+    assert list(info['metrics']['phases']) == ['fetch_table', 'download', 'validate', 'unpack', 'cleanup']
+    assert info['metrics']['n_downloaded'] == 3
+    assert (tmp_path / 'metrics.jsonl').exists()
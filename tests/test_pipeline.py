@@ -0,0 +1,57 @@
+from digipathos_downloader.download import get_dataset
+from digipathos_downloader.manifest import DownloadManifest
+from digipathos_downloader.pipeline import run_pipeline
+
+
+def test_run_pipeline(stub_server, tmp_path):
+    """assert every sample is extracted and its archive deleted right away.
+
+    Args:
+        stub_server (StubServer): local stand-in for the digipathos website.
+        tmp_path (Path): pytest temporary folder.
+    """
+    dataset_dir = tmp_path / 'dataset_dir'
+    tmp_dir = tmp_path / 'tmp'
+    dataset_dir.mkdir()
+    tmp_dir.mkdir()
+    manifest = DownloadManifest(str(tmp_dir))
+
+    results = run_pipeline(stub_server.zips_table + [{'bsLink': '/jurubeba', 'name': 'jurubeba.zip'}],
+                           str(dataset_dir),
+                           str(tmp_dir),
+                           False,
+                           stub_server.base_url,
+                           max_workers=2,
+                           manifest=manifest,
+                           extract_workers=2,
+                           queue_size=1)
+
+    assert results == {'not_downloaded': [stub_server.base_url + '//jurubeba'],
+                       'n_validated': 3,
+                       'corrupt_files': [],
+                       'failed_unzips_list': None}
+    assert sorted(file.name for file in tmp_dir.iterdir()) == ['manifest.json']
+    for entry in stub_server.zips_table:
+        assert len(list((dataset_dir / entry['name'][:-4]).iterdir())) == 3
+        assert manifest.get(entry['bsLink'])['status'] == 'extracted'
+
+def test_get_dataset_pipelined(mocker, stub_server, tmp_path):
+    """assert the pipelined get_dataset installs the same folders as the phased one.
+
+    Args:
+        mocker (_type_): pytest mocker obj.
+        stub_server (StubServer): local stand-in for the digipathos website.
+        tmp_path (Path): pytest temporary folder.
+    """
+    mocker.patch("digipathos_downloader.download.fetch_zips_table", return_value=stub_server.zips_table)
+    info = get_dataset(str(tmp_path / 'dataset_dir'),
+                       str(tmp_path / 'tmp'),
+                       verbose=False,
+                       base_url=stub_server.base_url,
+                       max_workers=3,
+                       pipelined=True)
+
+    assert info['not_downloaded'] == None
+    assert info['validation'] == {'n_zips_in_tmp': 3, 'zero_size_files': [], 'corrupt_files': []}
+    assert len(list((tmp_path / 'dataset_dir').iterdir())) == 3
+    assert not (tmp_path / 'tmp').exists()
@@ -0,0 +1,71 @@
+import pickle
+
+import pytest
+
+from digipathos_downloader.download import get_dataset
+from digipathos_downloader.reader import ZipDataset
+from stub_server import make_zip
+
+
+@pytest.fixture
+def zip_dir(tmp_path):
+    """a folder with two ZIP-files of three members each.
+
+    Returns:
+        zip_dir (Path): the folder.
+    """
+    for seed, name in enumerate(['Abacaxi (Pineapple) - Broca (Pineapple Fruit Borer) - 1.zip',
+                                 'Abacaxi (Pineapple) - Fusariose (Fusariose) - 1.zip']):
+        (tmp_path / name).write_bytes(make_zip(seed=seed))
+    return tmp_path
+
+def test_zip_dataset(zip_dir):
+    """assert images are indexed with their archive as label and read by index, as bytes or files.
+
+    Args:
+        zip_dir (Path): folder with ZIP-files.
+    """
+    with ZipDataset(str(zip_dir)) as dataset:
+        assert len(dataset) == 6
+        assert dataset.classes == ['Abacaxi (Pineapple) - Broca (Pineapple Fruit Borer) - 1',
+                                   'Abacaxi (Pineapple) - Fusariose (Fusariose) - 1']
+        label, data = dataset[4]
+        assert label == dataset.classes[1]
+        assert len(data) == 1024
+        with dataset.open(4) as image_file:
+            assert image_file.read() == data
+        assert [label for label, _ in dataset] == [dataset.classes[0]] * 3 + [dataset.classes[1]] * 3
+        assert len(ZipDataset(str(zip_dir), extensions=('.png',))) == 0
+
+def test_zip_dataset_shard(zip_dir):
+    """assert shards are disjoint, cover the dataset, and survive pickling.
+
+    Args:
+        zip_dir (Path): folder with ZIP-files.
+    """
+    dataset = ZipDataset(str(zip_dir))
+    dataset[0]
+    shards = [pickle.loads(pickle.dumps(dataset.shard(4, index))) for index in range(4)]
+
+    assert [len(shard) for shard in shards] == [2, 2, 1, 1]
+    assert sorted(sample for shard in shards for sample in shard.samples) == sorted(dataset.samples)
+    assert shards[1][1] == dataset[5]
+    assert shards[1].class_to_idx == dataset.class_to_idx
+    with pytest.raises(ValueError):
+        dataset.shard(4, 4)
+
+def test_get_dataset_zips(stub_server, tmp_path):
+    """assert the zips output format keeps the verified archives in data_dir, ready for ZipDataset.
+
+    Args:
+        stub_server (StubServer): local stand-in for the digipathos website.
+        tmp_path (Path): pytest temporary folder.
+    """
+    dataset_dir = tmp_path / 'dataset_dir'
+    get_dataset(str(dataset_dir), str(tmp_path / 'tmp'), name_filter='all', verbose=False,
+                base_url=stub_server.base_url, list_url=stub_server.list_url, output_format='zips')
+
+    assert sorted(path.name for path in dataset_dir.iterdir()) == sorted(entry['name'] for entry in stub_server.zips_table)
+    assert len(ZipDataset(str(dataset_dir))) == 9
+    with pytest.raises(ValueError):
+        get_dataset(str(dataset_dir), str(tmp_path / 'tmp'), output_format='zips', pipelined=True)
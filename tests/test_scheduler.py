@@ -0,0 +1,217 @@
+import threading
+import time
+
+from digipathos_downloader.download import download_zips, get_dataset
+from digipathos_downloader.integrity import parse_size
+from digipathos_downloader.scheduler import (PARTITION_SLACK, AdaptiveConcurrency, TokenBucket, apply_byte_budget,
+                                             order_zips_table, partition_zips_table)
+from digipathos_downloader.session import RetryPolicy
+from stub_server import StubServer, make_zip
+
+
+def test_order_zips_table(short_zips_table):
+    """assert samples are ordered by size, unknown sizes last.
+
+    Args:
+        short_zips_table (list): mock fetch_zips return.
+    """
+    broca, fusariose, podridao = short_zips_table
+    unknown = dict(broca, size='', bsLink='/unknown')
+    zips_table = short_zips_table + [unknown]
+
+    assert order_zips_table(zips_table) == [fusariose, podridao, broca, unknown]
+    assert order_zips_table(zips_table, 'smallest') == [broca, podridao, fusariose, unknown]
+    assert order_zips_table(zips_table, 'table') == zips_table
+
+def test_apply_byte_budget(short_zips_table):
+    """assert the budget is filled first fit and the rest is deferred.
+
+    Args:
+        short_zips_table (list): mock fetch_zips return.
+    """
+    broca, fusariose, podridao = short_zips_table
+    # 20.45 MB does not fit in 18 MiB, but 17.01 MB and 636.43 kB do
+    scheduled, deferred = apply_byte_budget(order_zips_table(short_zips_table), 18 * 1024 ** 2)
+
+    assert scheduled == [podridao, broca]
+    assert deferred == [fusariose]
+    assert apply_byte_budget(short_zips_table, None) == (short_zips_table, [])
+
+def test_token_bucket():
+    """assert the bucket lets a burst through and then holds the throughput at its rate."""
+    bucket = TokenBucket(rate=100000, burst=10000)
+
+    assert bucket.consume(10000) == 0
+    start = time.monotonic()
+    for _ in range(5):
+        bucket.consume(10000)
+    assert 0.45 <= time.monotonic() - start < 1.5
+
+def test_download_zips_rate_limit(stub_server, tmp_path):
+    """assert downloads sharing a rate limiter do not go faster than its rate.
+
+    Args:
+        stub_server (StubServer): local stand-in for the digipathos website.
+        tmp_path (Path): pytest temporary folder.
+    """
+    total = sum(len(archive) for archive in stub_server.archives.values())
+    rate = total / 0.5
+    start = time.monotonic()
+    not_downloaded = download_zips(stub_server.zips_table, str(tmp_path), verbose=False, base_url=stub_server.base_url,
+                                   max_workers=3, chunk_size=1024, rate_limiter=TokenBucket(rate, burst=1024))
+
+    assert not_downloaded is None
+    assert time.monotonic() - start >= 0.45
+
+def test_get_dataset_byte_budget(stub_server, tmp_path):
+    """assert only the samples within the byte budget are downloaded, largest first.
+
+    Args:
+        stub_server (StubServer): local stand-in for the digipathos website.
+        tmp_path (Path): pytest temporary folder.
+    """
+    by_size = order_zips_table(stub_server.zips_table)
+    budget = parse_size(by_size[0]['size']) + parse_size(by_size[1]['size'])
+    info = get_dataset(str(tmp_path / 'dataset_dir'), str(tmp_path / 'tmp'), name_filter='all', verbose=False,
+                       base_url=stub_server.base_url, list_url=stub_server.list_url, byte_budget=budget)
+
+    assert stub_server.requests_log[1:] == [entry['bsLink'] for entry in by_size[:2]]
+    assert info['deferred'] == [by_size[2]['name']]
+
+def test_partition_zips_table():
+    """assert the parts cover the table once, are balanced by size and do not depend on the table order."""
+    sizes = [100, 90, 80, 70, 60, 50, 40, 30, 20, 10]
+    zips_table = [{'name': f'Sample {index} - 1.zip', 'bsLink': f'/{index}', 'size': f'{size}.00 kB'}
+                  for index, size in enumerate(sizes)]
+    parts = [partition_zips_table(zips_table, 3, index) for index in range(3)]
+
+    assert sorted(entry['name'] for part in parts for entry in part) == sorted(entry['name'] for entry in zips_table)
+    loads = [sum(parse_size(entry['size']) for entry in part) for part in parts]
+    assert max(loads) <= (1 + PARTITION_SLACK) * sum(loads) / 3 + 100 * 1024
+    assert parts[0] == [entry for entry in zips_table if entry in parts[0]]
+    assert partition_zips_table(list(reversed(zips_table)), 3, 0) == list(reversed(parts[0]))
+    assert partition_zips_table(zips_table, 1, 0) == zips_table
+
+def test_partition_zips_table_stable():
+    """assert the samples keep their part when the table changes."""
+    zips_table = [{'name': f'Sample {index} - 1.zip', 'bsLink': f'/{index}', 'size': f'{10 + index % 7 * 90}.00 kB'}
+                  for index in range(100)]
+    changed_table = zips_table[5:] + [{'name': 'New - 1.zip', 'bsLink': '/new', 'size': '500.00 kB'}]
+
+    def assignment(table: list) -> dict:
+        return {entry['bsLink']: index for index in range(4) for entry in partition_zips_table(table, 4, index)}
+
+    before, after = assignment(zips_table), assignment(changed_table)
+    moved = [link for link in after if link in before and after[link] != before[link]]
+    assert len(moved) <= 2
+
+def test_adaptive_concurrency(mocker):
+    """assert the limit grows while throughput does, shrinks by one on queueing and is halved on failures.
+
+    Args:
+        mocker (_type_): pytest mocker obj.
+    """
+    clock = mocker.patch("digipathos_downloader.scheduler.time.monotonic", return_value=0.0)
+    events = []
+    controller = AdaptiveConcurrency(8, initial=2, on_event=events.append)
+
+    def window(seconds: float, busy: float, status: str = 'complete') -> None:
+        clock.return_value += seconds
+        for index in range(controller.limit):
+            controller.observe({'event': 'download_end', 'name': f"{index}.zip", 'status': status,
+                                'bytes': 1024 ** 2, 'elapsed': busy})
+
+    window(1.0, 1.0)
+    assert controller.limit == 3
+    # more bytes in the same time: probe further
+    window(1.0, 1.0)
+    assert controller.limit == 4
+    # same throughput, but every download is slower: back off by one
+    window(4 / 3, 2.0)
+    assert controller.limit == 3
+    controller.observe({'event': 'download_retry', 'name': '0.zip', 'status': 503, 'cause': 'http'})
+    window(1.0, 1.0)
+    assert controller.limit == 1
+    assert [event['reason'] for event in events] == ['probe', 'probe', 'latency', 'errors']
+    assert events[-1]['previous'] == 3 and events[-1]['error_rate'] == 1 / 3
+
+def test_adaptive_concurrency_ignores_client_errors(mocker):
+    """assert missing samples and corrupt bodies leave the limit growing, and a failing download counts once.
+
+    Args:
+        mocker (_type_): pytest mocker obj.
+    """
+    clock = mocker.patch("digipathos_downloader.scheduler.time.monotonic", return_value=0.0)
+    controller = AdaptiveConcurrency(8, initial=4)
+
+    def end(name: str, status: str = 'complete', cause: str = None, http_status: int = None) -> None:
+        controller.observe({'event': 'download_end', 'name': name, 'status': status, 'bytes': 1024 ** 2,
+                            'elapsed': 1.0, 'cause': cause, 'http_status': http_status})
+
+    for _ in range(3):
+        clock.return_value += 1.0
+        n_others = controller.limit - 4
+        controller.observe({'event': 'download_retry', 'name': 'b.zip', 'status': None, 'cause': 'checksum'})
+        end('a.zip', 'failed', 'http', 404)
+        end('b.zip')
+        end('c.zip', 'failed', 'http', 416)
+        end('d.zip', 'failed', 'incomplete')
+        for index in range(n_others):
+            end(f"{index}.zip")
+    assert [(decision['limit'], decision['reason']) for decision in controller.decisions] == \
+        [(5, 'probe'), (6, 'probe'), (7, 'probe')]
+
+    clock.return_value += 1.0
+    n_others = controller.limit - 1
+    for attempt in (1, 2):
+        controller.observe({'event': 'download_retry', 'name': 'a.zip', 'attempt': attempt, 'status': 503,
+                            'cause': 'http'})
+    end('a.zip', 'failed', 'http', 503)
+    for index in range(n_others):
+        end(f"{index}.zip")
+    assert controller.decisions[-1]['reason'] == 'errors'
+    assert controller.decisions[-1]['limit'] == 3
+    assert controller.decisions[-1]['error_rate'] == 1 / 7
+
+def test_adaptive_concurrency_slots():
+    """assert no more downloads than the limit hold a slot at the same time."""
+    controller = AdaptiveConcurrency(8, initial=2)
+    in_flight = []
+    lock = threading.Lock()
+    peak = [0]
+
+    def download() -> None:
+        with controller.slot():
+            with lock:
+                in_flight.append(1)
+                peak[0] = max(peak[0], len(in_flight))
+            time.sleep(0.02)
+            with lock:
+                in_flight.pop()
+
+    threads = [threading.Thread(target=download) for _ in range(6)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert peak[0] == 2
+
+def test_get_dataset_adaptive(mocker, tmp_path):
+    """assert an adaptive download backs off on server errors and records its decisions in the metrics.
+
+    Args:
+        mocker (_type_): pytest mocker obj.
+        tmp_path (Path): pytest temporary folder.
+    """
+    archives = {f"Sample {index} - 1.zip": make_zip(seed=index) for index in range(12)}
+    with StubServer(archives, failure_rate=0.2, seed=3) as server:
+        mocker.patch("digipathos_downloader.download.fetch_zips_table", return_value=server.zips_table)
+        info = get_dataset(str(tmp_path / 'data'), str(tmp_path / 'tmp'), verbose=False, base_url=server.base_url,
+                           max_workers=6, adaptive=True,
+                           retry_policy=RetryPolicy(max_attempts=20, backoff_factor=0, jitter=0))
+
+    decisions = info['metrics']['concurrency']
+    assert info['not_downloaded'] is None
+    assert len(decisions) > 0
+    assert 'errors' in [decision['reason'] for decision in decisions]
+    assert all(1 <= decision['limit'] <= 6 for decision in decisions)
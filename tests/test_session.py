@@ -0,0 +1,81 @@
+import pytest
+
+from digipathos_downloader.download import download_zip, fetch_zips_table, get_dataset
+from digipathos_downloader.session import RetryPolicy, create_session, parse_retry_after
+
+
+def test_retry_policy_delay():
+    """assert the delays grow exponentially, are capped and follow 'Retry-After'.
+    """
+    policy = RetryPolicy(backoff_factor=1, backoff_max=5, jitter=0)
+
+    assert [policy.delay(attempt) for attempt in range(1, 5)] == [1, 2, 4, 5]
+    assert parse_retry_after("3") == 3
+    assert parse_retry_after("Wed, 21 Oct 2015 07:28:00 GMT") == 0
+    assert parse_retry_after("soon") == None
+
+def test_download_zip_retries_with_session(stub_server, tmp_path):
+    """assert retryable statuses are retried through the shared session.
+
+    Args:
+        stub_server (StubServer): local stand-in for the digipathos website.
+        tmp_path (Path): pytest temporary folder.
+    """
+    sample = stub_server.zips_table[0]
+    stub_server.failures[sample['bsLink']] = [(503, {"Retry-After": "0"}), (429, {})]
+
+    with create_session(2) as session:
+        ok_url = download_zip(sample['bsLink'],
+                              sample['name'],
+                              str(tmp_path),
+                              stub_server.base_url,
+                              session=session,
+                              retry_policy=RetryPolicy(backoff_factor=0.01))
+
+    assert ok_url == None
+    assert stub_server.requests_log == [sample['bsLink']] * 3
+    assert (tmp_path / sample['name']).read_bytes() == stub_server.archives[sample['name']]
+
+def test_download_zip_does_not_retry_client_errors(stub_server, tmp_path):
+    """assert a missing sample fails on the first attempt.
+
+    Args:
+        stub_server (StubServer): local stand-in for the digipathos website.
+        tmp_path (Path): pytest temporary folder.
+    """
+    not_downloaded = download_zip('/jurubeba', 'jurubeba.zip', str(tmp_path), stub_server.base_url)
+
+    assert not_downloaded == stub_server.base_url + '//jurubeba'
+    assert stub_server.requests_log == ['/jurubeba']
+
+def test_fetch_zips_table_retries(stub_server):
+    """assert the table request is retried too.
+
+    Args:
+        stub_server (StubServer): local stand-in for the digipathos website.
+    """
+    stub_server.failures[stub_server.list_url] = [(502, {})]
+
+    zips_table = fetch_zips_table('all',
+                                  base_url=stub_server.base_url,
+                                  list_url=stub_server.list_url,
+                                  retry_policy=RetryPolicy(backoff_factor=0.01))
+
+    assert zips_table == stub_server.zips_table
+
+def test_get_dataset_closes_its_session(mocker, tmp_path):
+    """assert the session get_dataset creates is closed when the run fails.
+
+    Args:
+        mocker (_type_): pytest mocker obj.
+        tmp_path (Path): pytest temporary folder.
+    """
+    session = create_session(1)
+    close = mocker.spy(session, "close")
+    mocker.patch("digipathos_downloader.download.create_session", return_value=session)
+    mocker.patch("digipathos_downloader.download.fetch_zips_table", side_effect=RuntimeError("no table"))
+
+    with pytest.raises(RuntimeError):
+        get_dataset(str(tmp_path / 'data'), str(tmp_path / 'tmp'), verbose=False)
+
+    assert close.call_count == 1
@@ -0,0 +1,53 @@
+import json
+import tarfile
+
+from digipathos_downloader.download import get_dataset
+from digipathos_downloader.reader import ZipDataset
+from digipathos_downloader.shards import class_balanced_order, write_shards
+from stub_server import make_zip
+
+
+def test_write_shards(tmp_path):
+    """assert images are packed class-balanced into shards of bounded size, identically on every run.
+
+    Args:
+        tmp_path (Path): pytest temporary folder.
+    """
+    zip_dir = tmp_path / 'zips'
+    zip_dir.mkdir()
+    (zip_dir / 'A - 1.zip').write_bytes(make_zip(n_members=4, seed=0))
+    (zip_dir / 'B - 1.zip').write_bytes(make_zip(n_members=2, seed=1))
+    dataset = ZipDataset(str(zip_dir))
+
+    assert [dataset.samples[index][2] for index in class_balanced_order(dataset)] == ['A - 1', 'B - 1'] * 2 + ['A - 1'] * 2
+
+    digests = []
+    for run in range(2):
+        output_dir = tmp_path / f'shards_{run}'
+        output_dir.mkdir()
+        manifest = write_shards(dataset, str(output_dir), shard_size=5 * 1024, verbose=False)
+        digests.append([shard['sha256'] for shard in manifest['shards']])
+
+    assert digests[0] == digests[1]
+    assert manifest['n_samples'] == 6 and len(manifest['shards']) == 3
+    assert json.loads((output_dir / 'shards.json').read_text()) == manifest
+    with tarfile.open(output_dir / 'shard-000000.tar') as shard:
+        assert shard.getnames() == ['000000000.jpg', '000000000.cls', '000000000.json',
+                                    '000000001.jpg', '000000001.cls', '000000001.json']
+        assert shard.extractfile('000000001.cls').read() == b'1'
+        assert shard.extractfile('000000001.jpg').read() == dataset[4][1]
+
+def test_get_dataset_shards(stub_server, tmp_path):
+    """assert the shards output format packs every downloaded image.
+
+    Args:
+        stub_server (StubServer): local stand-in for the digipathos website.
+        tmp_path (Path): pytest temporary folder.
+    """
+    dataset_dir = tmp_path / 'dataset_dir'
+    get_dataset(str(dataset_dir), str(tmp_path / 'tmp'), name_filter='all', verbose=False,
+                base_url=stub_server.base_url, list_url=stub_server.list_url, output_format='shards')
+
+    manifest = json.loads((dataset_dir / 'shards.json').read_text())
+    assert manifest['n_samples'] == 9
+    assert sorted(path.name for path in dataset_dir.iterdir()) == ['shard-000000.tar', 'shards.json']
@@ -0,0 +1,156 @@
+import io
+import zipfile
+
+import pytest
+
+from digipathos_downloader.download import download_and_extract_zip, get_dataset
+from digipathos_downloader.metrics import MetricsRecorder
+from digipathos_downloader.streaming import UnstreamableZipError, extract_stream
+
+
+class NonSeekableBuffer(io.RawIOBase):
+    """a write-only stream, which makes ZipFile write data descriptors after each member."""
+
+    def __init__(self):
+        self.contents = bytearray()
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self.contents += data
+        return len(data)
+
+
+@pytest.mark.parametrize("with_descriptors", [False, True])
+def test_extract_stream(stub_server, tmp_path, with_descriptors):
+    """assert an archive fed in small chunks is extracted member by member.
+
+    Args:
+        stub_server (StubServer): local stand-in for the digipathos website.
+        tmp_path (Path): pytest temporary folder.
+        with_descriptors (bool): whether the member sizes come after the data.
+    """
+    archive = next(iter(stub_server.archives.values()))
+    if with_descriptors:
+        buffer = NonSeekableBuffer()
+        with zipfile.ZipFile(io.BytesIO(archive)) as source, zipfile.ZipFile(buffer, mode="w") as target:
+            for info in source.infolist():
+                target.writestr(info.filename, source.read(info), compress_type=zipfile.ZIP_DEFLATED)
+        archive = bytes(buffer.contents)
+
+    names = extract_stream((archive[index:index + 50] for index in range(0, len(archive), 50)), str(tmp_path))
+
+    with zipfile.ZipFile(io.BytesIO(archive)) as zip_contents:
+        assert names == zip_contents.namelist()
+        for name in names:
+            assert (tmp_path / name).read_bytes() == zip_contents.read(name)
+
+def stored_with_descriptors(archive: bytes) -> bytes:
+    """rewrite an archive with stored members followed by data descriptors.
+
+    Args:
+        archive (bytes): the archive contents.
+
+    Returns:
+        (bytes): the new archive contents.
+    """
+    buffer = NonSeekableBuffer()
+    with zipfile.ZipFile(io.BytesIO(archive)) as source, zipfile.ZipFile(buffer, mode="w") as target:
+        for info in source.infolist():
+            target.writestr(info.filename, source.read(info), compress_type=zipfile.ZIP_STORED)
+    return bytes(buffer.contents)
+
+def test_extract_stream_unstreamable(stub_server, tmp_path):
+    """assert a stored member with a data descriptor raises the dedicated exception.
+
+    Args:
+        stub_server (StubServer): local stand-in for the digipathos website.
+        tmp_path (Path): pytest temporary folder.
+    """
+    archive = stored_with_descriptors(next(iter(stub_server.archives.values())))
+
+    with pytest.raises(UnstreamableZipError):
+        extract_stream([archive], str(tmp_path))
+
+def test_extract_stream_bad_crc(tmp_path):
+    """assert a corrupted member is detected.
+
+    Args:
+        tmp_path (Path): pytest temporary folder.
+    """
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, mode="w") as zip_contents:
+        zip_contents.writestr('IMG_0000.jpg', b'a' * 100)
+    archive = buffer.getvalue().replace(b'a' * 100, b'b' + b'a' * 99, 1)
+
+    with pytest.raises(zipfile.BadZipFile):
+        extract_stream([archive], str(tmp_path))
+
+@pytest.mark.parametrize("spool_threshold", [0, 10 ** 6])
+def test_download_and_extract_zip(stub_server, tmp_path, spool_threshold):
+    """assert a sample is extracted straight into its class folder, streamed or spooled.
+
+    Args:
+        stub_server (StubServer): local stand-in for the digipathos website.
+        tmp_path (Path): pytest temporary folder.
+        spool_threshold (int): the largest sample buffered in memory.
+    """
+    sample = stub_server.zips_table[0]
+
+    ok_url = download_and_extract_zip(sample['bsLink'],
+                                      sample['name'],
+                                      str(tmp_path),
+                                      stub_server.base_url,
+                                      chunk_size=64,
+                                      spool_threshold=spool_threshold)
+
+    assert ok_url == None
+    assert [folder.name for folder in tmp_path.iterdir()] == [sample['name'][:-4]]
+    assert len(list((tmp_path / sample['name'][:-4]).iterdir())) == 3
+
+def test_download_and_extract_zip_unstreamable(stub_server, tmp_path):
+    """assert a sample that cannot be streamed is downloaded to a file and unpacked with zipfile instead.
+
+    Args:
+        stub_server (StubServer): local stand-in for the digipathos website.
+        tmp_path (Path): pytest temporary folder.
+    """
+    sample = stub_server.zips_table[0]
+    archive = stored_with_descriptors(stub_server.archives[sample['name']])
+    stub_server.bitstreams[sample['bsLink']] = archive
+    recorder = MetricsRecorder()
+
+    ok_url = download_and_extract_zip(sample['bsLink'], sample['name'], str(tmp_path), stub_server.base_url,
+                                      chunk_size=64, spool_threshold=0, on_event=recorder)
+
+    assert ok_url == None
+    assert [folder.name for folder in tmp_path.iterdir()] == [sample['name'][:-4]]
+    with zipfile.ZipFile(io.BytesIO(archive)) as zip_contents:
+        for name in zip_contents.namelist():
+            assert (tmp_path / sample['name'][:-4] / name).read_bytes() == zip_contents.read(name)
+    summary = recorder.summary()
+    assert (summary['n_downloaded'], summary['n_failed']) == (1, 0)
+    assert summary['bytes'] >= len(archive)
+
+def test_get_dataset_direct(mocker, stub_server, tmp_path):
+    """assert direct mode never creates the tmp folder.
+
+    Args:
+        mocker (_type_): pytest mocker obj.
+        stub_server (StubServer): local stand-in for the digipathos website.
+        tmp_path (Path): pytest temporary folder.
+    """
+    mocker.patch("digipathos_downloader.download.fetch_zips_table", return_value=stub_server.zips_table)
+    info = get_dataset(str(tmp_path / 'dataset_dir'),
+                       str(tmp_path / 'tmp'),
+                       verbose=False,
+                       base_url=stub_server.base_url,
+                       max_workers=2,
+                       direct=True,
+                       spool_threshold=0)
+
+    assert info['not_downloaded'] == None
+    assert info['validation']['n_zips_in_tmp'] == 3
+    assert not (tmp_path / 'tmp').exists()
+    assert len(list((tmp_path / 'dataset_dir').iterdir())) == 3
@@ -0,0 +1,92 @@
+import pytest
+
+from digipathos_downloader.download import get_dataset
+from digipathos_downloader.sync import (diff_zips_tables, load_local_catalog, merge_catalogs, merge_shard_catalogs,
+                                        save_local_catalog, shard_catalog_path)
+
+
+def test_diff_zips_tables(short_zips_table):
+    """assert new, resized, re-uploaded and removed samples are told apart.
+
+    Args:
+        short_zips_table (list): mock fetch_zips return.
+    """
+    catalog = {entry['bsLink']: entry for entry in short_zips_table}
+    reuploaded = dict(short_zips_table[0], bsLink=short_zips_table[0]['bsLink'].replace('/871/4/', '/871/5/'))
+    resized = dict(short_zips_table[1], size='20.46 MB')
+    new = dict(short_zips_table[2], name='Acerola (Barbados Cherry) - Verrugose (Scab) - 1.zip', bsLink='/new')
+
+    changed, removed = diff_zips_tables([reuploaded, resized, new], catalog)
+
+    assert changed == [reuploaded, resized, new]
+    assert removed == [short_zips_table[2]]
+
+def test_get_dataset_sync(mocker, stub_server, tmp_path):
+    """assert a sync run only downloads the new samples and prunes the removed ones.
+
+    Args:
+        mocker (_type_): pytest mocker obj.
+        stub_server (StubServer): local stand-in for the digipathos website.
+        tmp_path (Path): pytest temporary folder.
+    """
+    dataset_dir = tmp_path / 'dataset_dir'
+    tmp_dir = tmp_path / 'tmp'
+    first, second, third = stub_server.zips_table
+    fetch = mocker.patch("digipathos_downloader.download.fetch_zips_table", return_value=[first, second])
+    get_dataset(str(dataset_dir), str(tmp_dir), verbose=False, base_url=stub_server.base_url)
+
+    fetch.return_value = [second, third]
+    stub_server.requests_log.clear()
+    info = get_dataset(str(dataset_dir), str(tmp_dir), verbose=False, base_url=stub_server.base_url,
+                       sync=True, prune=True)
+
+    assert stub_server.requests_log == [third['bsLink']]
+    assert info['sync'] == {'changed': [third['name']], 'removed': [first['name']]}
+    assert sorted(folder.name for folder in dataset_dir.iterdir()) == sorted([second['name'][:-4], third['name'][:-4]])
+    assert set(load_local_catalog(str(dataset_dir) + '.catalog.json')) == {second['bsLink'], third['bsLink']}
+
+def test_merge_catalogs(short_zips_table, tmp_path):
+    """assert shard catalogs are combined, and that a missing or conflicting one is refused.
+
+    Args:
+        short_zips_table (list): mock fetch_zips return.
+        tmp_path (Path): pytest temporary folder.
+    """
+    paths = [str(tmp_path / f'{index}.json') for index in range(3)]
+    save_local_catalog(paths[0], short_zips_table[:1])
+    save_local_catalog(paths[1], short_zips_table[1:])
+    with pytest.raises(FileNotFoundError):
+        merge_catalogs(paths, str(tmp_path / 'merged.json'))
+    save_local_catalog(paths[2], [])
+
+    merged = merge_catalogs(paths, str(tmp_path / 'merged.json'))
+
+    assert merged == sorted(short_zips_table, key=lambda entry: entry['bsLink'])
+    assert load_local_catalog(str(tmp_path / 'merged.json')) == {entry['bsLink']: entry for entry in short_zips_table}
+    save_local_catalog(paths[2], [dict(short_zips_table[0], bsLink='/reuploaded')])
+    with pytest.raises(ValueError):
+        merge_catalogs(paths, str(tmp_path / 'merged.json'))
+
+def test_get_dataset_sharded(mocker, stub_server, tmp_path):
+    """assert two nodes sharing a dataset directory download disjoint parts that merge into the whole dataset.
+
+    Args:
+        mocker (_type_): pytest mocker obj.
+        stub_server (StubServer): local stand-in for the digipathos website.
+        tmp_path (Path): pytest temporary folder.
+    """
+    dataset_dir = tmp_path / 'dataset_dir'
+    mocker.patch("digipathos_downloader.download.fetch_zips_table", return_value=stub_server.zips_table)
+    infos = [get_dataset(str(dataset_dir), str(tmp_path / f'tmp{index}'), verbose=False,
+                         base_url=stub_server.base_url, num_shards=2, shard_index=index) for index in range(2)]
+
+    names = [{entry['name'] for entry in info['zips_table']} for info in infos]
+    assert names[0] | names[1] == {entry['name'] for entry in stub_server.zips_table}
+    assert names[0] & names[1] == set()
+    assert infos[1]['shard']['catalog_path'] == shard_catalog_path(str(dataset_dir), 1, 2)
+    assert len(stub_server.requests_log) == 3
+    assert len(merge_shard_catalogs(str(dataset_dir), 2)) == 3
+    assert set(load_local_catalog(str(dataset_dir) + '.catalog.json')) == {entry['bsLink'] for entry in stub_server.zips_table}
+    assert len(list(dataset_dir.iterdir())) == 3
+    with pytest.raises(ValueError):
+        get_dataset(str(dataset_dir), str(tmp_path / 'tmp'), num_shards=2, shard_index=2)
@@ -0,0 +1,72 @@
+import time
+
+import pytest
+
+from digipathos_downloader.download import fetch_zips_table
+from digipathos_downloader.table_cache import load_cached_table, save_cached_table
+
+
+def test_fetch_zips_table_pages(stub_server):
+    """assert the table is assembled from several pages, sequentially or in parallel.
+
+    Args:
+        stub_server (StubServer): local stand-in for the digipathos website.
+    """
+    for page_workers in (1, 2):
+        zips_table = fetch_zips_table('all',
+                                      base_url=stub_server.base_url,
+                                      list_url=stub_server.list_url,
+                                      page_size=1,
+                                      page_workers=page_workers)
+
+        assert zips_table == stub_server.zips_table
+
+def test_fetch_zips_table_ignored_offset(stub_server, tmp_path):
+    """assert a server ignoring the offset stops the paging, falling back to the cached table if there is one.
+
+    Args:
+        stub_server (StubServer): local stand-in for the digipathos website.
+        tmp_path (Path): pytest temporary folder.
+    """
+    cache_dir = str(tmp_path)
+    url = stub_server.base_url + stub_server.list_url
+    stub_server.paging = False
+    with pytest.raises(SystemExit):
+        fetch_zips_table('all', base_url=stub_server.base_url, list_url=stub_server.list_url, page_size=1)
+    assert len(stub_server.requests_log) == 2
+
+    save_cached_table(cache_dir, url, stub_server.zips_table, fetched_at=0)
+    zips_table = fetch_zips_table('all', base_url=stub_server.base_url, list_url=stub_server.list_url,
+                                  page_size=1, page_workers=2, cache_dir=cache_dir)
+    assert zips_table == stub_server.zips_table
+
+def test_fetch_zips_table_cache(stub_server, tmp_path):
+    """assert a fresh cache skips the network, a stale one is revalidated and an unreachable site falls back to it.
+
+    Args:
+        stub_server (StubServer): local stand-in for the digipathos website.
+        tmp_path (Path): pytest temporary folder.
+    """
+    cache_dir = str(tmp_path)
+    url = stub_server.base_url + stub_server.list_url
+    fetch_zips_table('all', base_url=stub_server.base_url, list_url=stub_server.list_url, cache_dir=cache_dir)
+    assert load_cached_table(cache_dir, url)['bitstreams'] == stub_server.zips_table
+
+    stub_server.requests_log.clear()
+    fetch_zips_table('all', base_url=stub_server.base_url, list_url=stub_server.list_url, cache_dir=cache_dir)
+    assert stub_server.requests_log == []
+
+    cached = load_cached_table(cache_dir, url)
+    save_cached_table(cache_dir, url, cached['bitstreams'], cached['etag'], fetched_at=time.time() - 7200)
+    zips_table = fetch_zips_table('all', base_url=stub_server.base_url, list_url=stub_server.list_url,
+                                  cache_dir=cache_dir)
+    assert len(stub_server.requests_log) == 1
+    assert zips_table == stub_server.zips_table
+    assert time.time() - load_cached_table(cache_dir, url)['fetched_at'] < 60
+
+    stub_server.failures[stub_server.list_url] = [(404, {})]
+    save_cached_table(cache_dir, url, cached['bitstreams'], cached['etag'], fetched_at=0)
+    zips_table = fetch_zips_table('all', base_url=stub_server.base_url, list_url=stub_server.list_url,
+                                  cache_dir=cache_dir)
+    assert stub_server.failures[stub_server.list_url] == []
+    assert zips_table == stub_server.zips_table
@@ -0,0 +1,134 @@
+import io
+import os
+import pickle
+import zipfile
+
+import pytest
+
+from digipathos_downloader.download import get_dataset, unpack_zip, unpack_zips
+from digipathos_downloader.transforms import ResizeTransform
+
+Image = pytest.importorskip("PIL.Image")
+
+
+def make_image(width: int, height: int, color: tuple) -> bytes:
+    """encode a plain JPEG image.
+
+    Args:
+        width (int): width in pixels.
+        height (int): height in pixels.
+        color (tuple): the RGB fill.
+
+    Returns:
+        (bytes): the JPEG contents.
+    """
+    buffer = io.BytesIO()
+    Image.new('RGB', (width, height), color).save(buffer, format='JPEG')
+    return buffer.getvalue()
+
+@pytest.fixture
+def image_zips(tmp_path):
+    """a folder with two ZIP-files of images, plus a text member that is not an image.
+
+    Returns:
+        tmp_dir (Path): the folder.
+    """
+    tmp_dir = tmp_path / 'tmp'
+    tmp_dir.mkdir()
+    for seed, name in enumerate(['Abacaxi (Pineapple) - Broca (Pineapple Fruit Borer) - 1.zip',
+                                 'Abacaxi (Pineapple) - Fusariose (Fusariose) - 1.zip']):
+        with zipfile.ZipFile(tmp_dir / name, mode="w") as zip_contents:
+            zip_contents.writestr('IMG_0000.JPG', make_image(640, 480, (seed * 100, 50, 50)))
+            zip_contents.writestr('sub/IMG_0001.JPG', make_image(300, 600, (50, seed * 100, 50)))
+            zip_contents.writestr('notes.txt', b'not an image')
+    return tmp_dir
+
+def test_resize_transform():
+    """assert every mode gives the expected dimensions and the output only depends on the input."""
+    data = make_image(640, 480, (10, 20, 30))
+    name, crop = ResizeTransform(224)('IMG_0000.JPG', data)
+    assert name == 'IMG_0000.jpg'
+    assert Image.open(io.BytesIO(crop)).size == (224, 224)
+    assert ResizeTransform(224)('IMG_0000.JPG', data)[1] == crop
+    _, fit = ResizeTransform(224, mode='fit', image_format='PNG')('IMG_0000.JPG', data)
+    assert Image.open(io.BytesIO(fit)).size == (224, 168)
+    assert Image.open(io.BytesIO(fit)).format == 'PNG'
+    _, shorter = ResizeTransform(224, mode='shorter')('IMG_0000.JPG', data)
+    assert Image.open(io.BytesIO(shorter)).size == (299, 224)
+    assert pickle.loads(pickle.dumps(ResizeTransform(224))).size == (224, 224)
+    with pytest.raises(ValueError):
+        ResizeTransform(224, mode='stretch')
+
+def test_resize_transform_errors():
+    """assert members that cannot be decoded are copied, skipped or raise, as asked."""
+    assert ResizeTransform(224)('notes.txt', b'not an image') == ('notes.txt', b'not an image')
+    assert ResizeTransform(224, on_error='skip')('notes.txt', b'not an image') is None
+    with pytest.raises(OSError):
+        ResizeTransform(224, on_error='raise')('notes.txt', b'not an image')
+
+def test_unpack_zip_transform(image_zips, tmp_path):
+    """assert the transformed images keep the archive layout, under the class folder.
+
+    Args:
+        image_zips (Path): folder with ZIP-files of images.
+        tmp_path (Path): temporary directory.
+    """
+    data_dir = str(tmp_path / 'data')
+    os.mkdir(data_dir)
+    name = 'Abacaxi (Pineapple) - Broca (Pineapple Fruit Borer) - 1.zip'
+    assert unpack_zip(name, data_dir, str(image_zips), transform=ResizeTransform(64, on_error='skip')) is None
+    class_dir = os.path.join(data_dir, name[:-4])
+    assert sorted(os.listdir(class_dir)) == ['IMG_0000.jpg', 'sub']
+    with Image.open(os.path.join(class_dir, 'sub', 'IMG_0001.jpg')) as image:
+        assert image.size == (64, 64)
+
+def test_unpack_zips_transform_parallel(image_zips, tmp_path):
+    """assert worker processes give the same bytes as the calling process.
+
+    Args:
+        image_zips (Path): folder with ZIP-files of images.
+        tmp_path (Path): temporary directory.
+    """
+    transform = ResizeTransform(96, mode='fit')
+    (tmp_path / 'sequential').mkdir()
+    (tmp_path / 'parallel').mkdir()
+    assert unpack_zips(str(image_zips), str(tmp_path / 'sequential'), verbose=False, transform=transform) is None
+    assert unpack_zips(str(image_zips), str(tmp_path / 'parallel'), verbose=False, max_workers=2,
+                       transform=transform) is None
+    for root, _, files in os.walk(tmp_path / 'sequential'):
+        for name in files:
+            path = os.path.join(root, name)
+            other_path = os.path.join(tmp_path / 'parallel', os.path.relpath(path, tmp_path / 'sequential'))
+            with open(path, "rb") as first, open(other_path, "rb") as second:
+                assert first.read() == second.read()
+    class_dir = tmp_path / 'parallel' / 'Abacaxi (Pineapple) - Fusariose (Fusariose) - 1'
+    assert (class_dir / 'notes.txt').read_bytes() == b'not an image'
+    with Image.open(class_dir / 'IMG_0000.jpg') as image:
+        assert image.size == (96, 72)
+
+def test_get_dataset_transform_needs_folders(tmp_path):
+    """assert a transform is refused where there is no extraction step to run it in.
+
+    Args:
+        tmp_path (Path): temporary directory.
+    """
+    with pytest.raises(ValueError):
+        get_dataset(str(tmp_path / 'data'), str(tmp_path / 'tmp'), output_format='zips', transform=ResizeTransform(64))
+    with pytest.raises(ValueError):
+        get_dataset(str(tmp_path / 'data'), str(tmp_path / 'tmp'), direct=True, transform=ResizeTransform(64))
+
+def test_unpack_zip_transform_name_collision(tmp_path):
+    """assert an archive whose members the transform would write to the same file is reported as failed.
+
+    Args:
+        tmp_path (Path): temporary directory.
+    """
+    (tmp_path / 'tmp').mkdir()
+    (tmp_path / 'data').mkdir()
+    name = 'Abacaxi (Pineapple) - Broca (Pineapple Fruit Borer) - 1.zip'
+    with zipfile.ZipFile(tmp_path / 'tmp' / name, mode="w") as zip_contents:
+        zip_contents.writestr('IMG_0000.jpg', make_image(64, 64, (0, 0, 0)))
+        zip_contents.writestr('IMG_0000.png', make_image(64, 64, (255, 255, 255)))
+    for member_workers in (1, 2):
+        assert unpack_zip(name, str(tmp_path / 'data'), str(tmp_path / 'tmp'), overwrite=True,
+                          transform=ResizeTransform(32), member_workers=member_workers) == name